@@ -0,0 +1 @@
+"""Offline benchmarks: a mock CoinGecko/ChangeNOW server and the timing runner (python -m benchmarks.run)"""
@@ -0,0 +1,225 @@
+"""CoinGecko and ChangeNOW payloads for the benchmarks
+
+Payloads recorded from the live APIs are replayed from benchmarks/fixtures/ when
+present (record them with `python -m benchmarks.fixtures --record`). Anything not
+recorded - or more coins than were recorded - is generated deterministically in
+the same shape, so the benchmarks also run on a fresh checkout without network.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from crypto_engine.config import (
+    CHANGENOW_API, CHANGENOW_MAPPING, COINGECKO_API, COINS, DAY_MS, MARKETS_PAGE_SIZE
+)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Coins recorded from /coins/markets and the pair recorded from ChangeNOW
+RECORD_COINS = 2500
+RECORD_PAIR = 'btc_eth'
+# Pause between recorded requests, keeping under CoinGecko's free-tier limit
+RECORD_PAUSE = 2.5
+
+HOUR_MS = 60 * 60 * 1000
+
+
+def _iso(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def _load(name):
+    path = os.path.join(FIXTURE_DIR, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthetic_coin(rank, coin_id, symbol, name, rng, now_ms):
+    """One /coins/markets entry with every field CoinGecko returns"""
+    price = 60000 / rank ** 1.6 * rng.uniform(0.5, 2)
+    supply = rng.uniform(1e6, 1e10) if rank > 1 else 19.6e6
+    market_cap = 1.2e12 / rank ** 1.3 if rank > 1 else price * supply
+    volume = market_cap * rng.uniform(0.01, 0.3)
+    change = rng.gauss(0, 4)
+    ath = price * rng.uniform(1, 20)
+    atl = price * rng.uniform(0.001, 0.9)
+    return {
+        'id': coin_id,
+        'symbol': symbol.lower(),
+        'name': name,
+        'image': f'https://assets.coingecko.com/coins/images/{rank}/large/{coin_id}.png',
+        'current_price': round(price, 8),
+        'market_cap': round(market_cap),
+        'market_cap_rank': rank,
+        'fully_diluted_valuation': round(market_cap * rng.uniform(1, 1.5)),
+        'total_volume': round(volume),
+        'high_24h': round(price * (1 + abs(change) / 100), 8),
+        'low_24h': round(price * (1 - abs(change) / 100), 8),
+        'price_change_24h': round(price * change / 100, 8),
+        'price_change_percentage_24h': round(change, 5),
+        'market_cap_change_24h': round(market_cap * change / 100, 2),
+        'market_cap_change_percentage_24h': round(change * rng.uniform(0.9, 1.1), 5),
+        'circulating_supply': round(supply, 2),
+        'total_supply': round(supply * rng.uniform(1, 1.2), 2),
+        'max_supply': round(supply * 2, 2) if rng.random() < 0.4 else None,
+        'ath': round(ath, 8),
+        'ath_change_percentage': round((price / ath - 1) * 100, 5),
+        'ath_date': _iso(now_ms - rng.randrange(30, 2000) * DAY_MS),
+        'atl': round(atl, 8),
+        'atl_change_percentage': round((price / atl - 1) * 100, 5),
+        'atl_date': _iso(now_ms - rng.randrange(30, 3000) * DAY_MS),
+        'roi': None,
+        'last_updated': _iso(now_ms - rng.randrange(0, 60000)),
+        'price_change_percentage_24h_in_currency': round(change, 5),
+    }
+
+
+def markets(count, seed=0):
+    """At least the top `count` coins by market cap, recorded ones first
+
+    The tracked default coins missing from the recording are always appended, so
+    the 'default' universe and the ChangeNOW pairs resolve against the replayed data.
+    """
+    coins = list(_load('markets.json') or [])[:count]
+    known = {coin['id'] for coin in coins}
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    defaults = [c for c in COINS if c[0] not in known]
+    rank = len(coins)
+    while len(coins) < count or defaults:
+        rank += 1
+        if defaults:
+            coin_id, symbol, name = defaults.pop(0)
+        else:
+            coin_id, symbol, name = f'coin-{rank:05d}', f'C{rank:05d}', f'Coin {rank}'
+        coins.append(synthetic_coin(rank, coin_id, symbol, name, rng, now_ms))
+    return coins
+
+
+def market_chart(coin_id, days, interval=None, seed=0):
+    """/coins/{id}/market_chart for the last `days`, ending now
+
+    A recorded chart is replayed with its timestamps shifted to end now; otherwise
+    a random walk is generated (hourly points up to 90 days, like CoinGecko).
+    """
+    days = int(days)
+    hourly = interval == 'hourly' or (interval is None and days <= 90)
+    now_ms = int(time.time() * 1000)
+    step = HOUR_MS if hourly else DAY_MS
+    points = days * 24 if hourly else days + 1
+
+    recorded = _load('market_chart_hourly.json' if hourly else 'market_chart_daily.json')
+    if recorded and len(recorded['prices']) >= points:
+        shift = now_ms - recorded['prices'][-1][0]
+        return {key: [[ts + shift, value] for ts, value in recorded[key][-points:]]
+                for key in ('prices', 'market_caps', 'total_volumes')}
+
+    rng = random.Random(f'{seed}:{coin_id}')
+    price = rng.uniform(0.1, 1000)
+    supply = rng.uniform(1e6, 1e9)
+    prices, caps, volumes = [], [], []
+    start = now_ms - (points - 1) * step
+    for i in range(points):
+        price *= math.exp(rng.gauss(0, 0.01 if hourly else 0.04))
+        ts = start + i * step
+        prices.append([ts, price])
+        caps.append([ts, price * supply])
+        volumes.append([ts, price * supply * rng.uniform(0.02, 0.2)])
+    return {'prices': prices, 'market_caps': caps, 'total_volumes': volumes}
+
+
+def _ticker_prices(coins):
+    prices = {coin['id']: coin['current_price'] for coin in coins}
+    return {ticker: prices[coin_id] for coin_id, ticker in CHANGENOW_MAPPING.items() if prices.get(coin_id)}
+
+
+def changenow(path, coins):
+    """ChangeNOW v1 response for min-amount/PAIR, exchange-range/PAIR or exchange-amount/AMOUNT/PAIR
+
+    Rates follow the replayed market prices less a 0.5% spread. Returns (status, body).
+    """
+    parts = path.strip('/').split('/')
+    endpoint, pair = parts[0], parts[-1]
+    from_ticker, _, to_ticker = pair.partition('_')
+    prices = _ticker_prices(coins)
+    if from_ticker not in prices or to_ticker not in prices:
+        return 400, {'error': 'pair_is_inactive', 'message': f'Pair {pair} is inactive'}
+
+    min_amount = round(20 / prices[from_ticker], 8)
+    if endpoint == 'min-amount':
+        return 200, _load('changenow_min_amount.json') or {'minAmount': min_amount}
+    if endpoint == 'exchange-range':
+        return 200, _load('changenow_exchange_range.json') or {
+            'minAmount': min_amount, 'maxAmount': round(2e6 / prices[from_ticker], 8)
+        }
+    if endpoint == 'exchange-amount' and len(parts) == 3:
+        amount = float(parts[1])
+        estimated = amount * prices[from_ticker] / prices[to_ticker] * 0.995
+        recorded = _load('changenow_exchange_amount.json') or {}
+        return 200, dict(recorded, estimatedAmount=round(estimated, 8),
+                         transactionSpeedForecast=recorded.get('transactionSpeedForecast', '10-60'),
+                         warningMessage=None)
+    return 404, {'error': 'not_found'}
+
+
+def record(coins=RECORD_COINS, pair=RECORD_PAIR):
+    """Save live CoinGecko and ChangeNOW payloads into FIXTURE_DIR"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+    def save(name, data):
+        with open(os.path.join(FIXTURE_DIR, name), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        print(f'Recorded {name}')
+
+    def get(url, params=None):
+        response = requests.get(url, params=params, timeout=30)
+        response.raise_for_status()
+        time.sleep(RECORD_PAUSE)
+        return response.json()
+
+    recorded = []
+    for page in range(1, -(-coins // MARKETS_PAGE_SIZE) + 1):
+        recorded += get(f'{COINGECKO_API}/coins/markets', {
+            'vs_currency': 'usd', 'order': 'market_cap_desc', 'per_page': MARKETS_PAGE_SIZE,
+            'page': page, 'sparkline': False, 'price_change_percentage': '24h'
+        })
+    save('markets.json', recorded[:coins])
+    save('market_chart_hourly.json', get(f'{COINGECKO_API}/coins/bitcoin/market_chart',
+                                         {'vs_currency': 'usd', 'days': 90, 'interval': 'hourly'}))
+    save('market_chart_daily.json', get(f'{COINGECKO_API}/coins/bitcoin/market_chart',
+                                        {'vs_currency': 'usd', 'days': 365, 'interval': 'daily'}))
+    save('changenow_min_amount.json', get(f'{CHANGENOW_API}/min-amount/{pair}'))
+    save('changenow_exchange_range.json', get(f'{CHANGENOW_API}/exchange-range/{pair}'))
+    save('changenow_exchange_amount.json', get(f'{CHANGENOW_API}/exchange-amount/1/{pair}'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.fixtures',
+                                     description='Record live API payloads for the benchmarks.')
+    parser.add_argument('--record', action='store_true', help='fetch and save live payloads')
+    parser.add_argument('--coins', type=int, default=RECORD_COINS,
+                        help=f'coins to record from /coins/markets (default: {RECORD_COINS})')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if not args.record:
+        parser.print_help()
+        return 0
+    try:
+        record(args.coins)
+    except requests.RequestException as e:
+        print(f'Recording failed: {e}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Local HTTP server replaying CoinGecko and ChangeNOW payloads
+
+    python -m benchmarks.mock_server --port 8765 --coins 2500 --latency 50
+
+serves the CoinGecko API under /api/v3 and the ChangeNOW API under /v1, so the
+app can be pointed at it too:
+
+    CRYPTO_TRACKER_PROVIDERS=coingecko=http://127.0.0.1:8765/api/v3 \\
+    CRYPTO_TRACKER_CHANGENOW_API=http://127.0.0.1:8765/v1 python crypto_gui.py
+
+Bodies are rendered once and replayed from memory, so the server adds as little
+as possible to the measured time beyond the simulated latency.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import fixtures
+
+
+class MockApi:
+    """Routes a request path to (status, JSON body bytes)"""
+
+    def __init__(self, coins, latency=0.0):
+        self.coins = fixtures.markets(coins)
+        self.by_id = {coin['id']: coin for coin in self.coins}
+        self.latency = latency
+        self.requests = 0
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def respond(self, url):
+        with self._lock:
+            self.requests += 1
+            cached = self._bodies.get(url)
+        if cached is None:
+            status, data = self.render(url)
+            cached = status, json.dumps(data).encode('utf-8')
+            with self._lock:
+                self._bodies[url] = cached
+        return cached
+
+    def render(self, url):
+        parts = urlsplit(url)
+        path = parts.path
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+        if path == '/api/v3/coins/markets':
+            per_page = int(query.get('per_page', 100))
+            page = int(query.get('page', 1))
+            if 'ids' in query:
+                coins = [self.by_id[i] for i in query['ids'].split(',') if i in self.by_id]
+            else:
+                coins = self.coins
+            return 200, coins[(page - 1) * per_page:page * per_page]
+        if path.startswith('/api/v3/coins/') and path.endswith('/market_chart'):
+            coin_id = path.split('/')[4]
+            if coin_id not in self.by_id:
+                return 404, {'error': 'coin not found'}
+            return 200, fixtures.market_chart(coin_id, query.get('days', 1), query.get('interval'))
+        if path.startswith('/v1/'):
+            return fixtures.changenow(path[len('/v1'):], self.coins)
+        return 404, {'error': 'not found'}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; Nagle would hold the body back ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        api = self.server.api
+        if api.latency:
+            time.sleep(api.latency)
+        status, body = api.respond(self.path)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(coins, port=0, latency=0.0):
+    """Start the server on a daemon thread; returns it (server.server_port is the bound port)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.api = MockApi(coins, latency)
+    threading.Thread(target=server.serve_forever, name='mock-api', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.mock_server',
+                                     description='Replay CoinGecko and ChangeNOW payloads locally.')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on, 0 = any (default: 8765)')
+    parser.add_argument('--coins', type=int, default=2500, help='coins in the markets list (default: 2500)')
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every response')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    server = serve(args.coins, args.port, args.latency / 1000)
+    # The first line is read by the benchmark runner to find the port
+    print(f'Listening on {server.server_port}', flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
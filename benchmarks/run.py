@@ -0,0 +1,442 @@
+"""Time the refresh, parsing, table, chart, exchange and analysis paths offline
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 100,1000 --repeat 10 --latency 50
+    python -m benchmarks.run --compare latest
+
+Everything runs against benchmarks/mock_server.py in a child process, so results
+do not depend on the network or on API rate limits. Per universe size (top N coins):
+
+- refresh         MarketEngine.refresh_prices end to end: HTTP, streamed decoding, MarketSnapshot
+- parse           /coins/markets pages through json.loads (response.json()), picking the used fields
+- parse.BACKEND   the same through crypto_engine.decoding
+- table.populate  PriceTableModel filling an empty table
+- table.update    PriceTableModel applying a refresh in which every price changed
+- analysis        MarketEngine.analyze over 90 days of stored daily history
+
+and once per chart period / pair:
+
+- chart.redraw    PriceChart.set_series plus a full canvas draw
+- exchange.quote  MarketEngine.get_exchange_quote end to end
+- chart.parse     a 90-day hourly market_chart through json.loads or each decoding backend
+- alerts.check    AlertBook.check of a refresh that moved every price, with ALERT_COUNT
+                  level, move and volume alerts spread over the largest universe
+- portfolio.update   Portfolio.update of a refresh that moved every price, with LOT_COUNT
+                     lots spread over the largest universe
+- portfolio.history  the 90-day value curve of those lots from their stored daily history
+                     (already loaded; loading it is the same query analysis makes)
+
+The refresh and parse benchmarks also record the peak memory allocated while decoding.
+Results are saved as JSON under benchmarks/results/; --compare reports the change
+in median time against an earlier run and exits with status 1 when anything got
+slower than --threshold percent.
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from crypto_engine import AlertBook, MarketEngine, MarketSnapshot, Portfolio, PriceSeries
+from crypto_engine.config import DAY_MS, MARKETS_PAGE_SIZE, PERIOD_DAYS, history_interval
+from crypto_engine.decoding import iter_array, orjson, read_market_chart
+from crypto_engine.history import PriceHistoryStore
+from crypto_engine.indicators import INDICATOR_DAYS
+from crypto_engine.network import ResponseCache
+from crypto_engine.providers import CoinGeckoProvider
+
+from . import fixtures
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+DEFAULT_SIZES = (100, 250, 1000, 2500)
+DEFAULT_REPEAT = 5
+# Median slowdown (%) reported as a regression by --compare
+DEFAULT_THRESHOLD = 15
+EXCHANGE_PAIR = ('bitcoin', 'ethereum')
+ALERT_COUNT = 50000
+LOT_COUNT = 5000
+
+
+def measure(fn, repeat, items=None, memory=False):
+    """Run fn once to warm up, then `repeat` timed runs; returns the timing summary
+
+    With memory=True the warm-up run is traced and its peak allocation recorded.
+    """
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    else:
+        fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    result = {
+        'median_ms': statistics.median(times),
+        'min_ms': min(times),
+        'max_ms': max(times),
+        'runs': repeat,
+    }
+    if items:
+        result['items'] = items
+        result['items_per_s'] = items / (result['median_ms'] / 1000) if result['median_ms'] else None
+    if memory:
+        result['peak_kb'] = peak_kb
+    return result
+
+
+def decode_backends():
+    return ('stream', 'orjson') if orjson is not None else ('stream',)
+
+
+def as_response(body):
+    """A requests.Response carrying body, as the decoders receive it"""
+    return ResponseCache.to_response({'status': 200, 'url': '', 'headers': {}, 'content': body})
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide the engine's debug prints while timing"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def start_mock_server(coins, latency_ms):
+    """Launch the mock API in a child process; returns (process, base URL)"""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.mock_server', '--port', '0',
+         '--coins', str(coins), '--latency', str(latency_ms)],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()
+    if not line.startswith('Listening on '):
+        process.kill()
+        raise RuntimeError('Mock API server did not start')
+    return process, f'http://127.0.0.1:{int(line.split()[-1])}'
+
+
+def make_engine(base_url, data_dir, universe):
+    return MarketEngine(data_dir=data_dir, universe=universe,
+                        providers=f'coingecko={base_url}/api/v3', changenow_api=f'{base_url}/v1')
+
+
+def store_history(data_dir, coins):
+    """Stored daily history for every coin, as analysis reads it"""
+    store = PriceHistoryStore(os.path.join(data_dir, 'history.db'))
+    try:
+        for coin in coins:
+            chart = fixtures.market_chart(coin['id'], INDICATOR_DAYS, 'daily')
+            store.merge(coin['id'], 'daily', PriceSeries.from_market_chart(chart), INDICATOR_DAYS)
+    finally:
+        store.close()
+
+
+def changed_snapshot(snapshot):
+    """A new snapshot of the same coins, as a refresh builds it, with every price and 24h change moved"""
+    return MarketSnapshot(list(snapshot.ids), list(snapshot.symbols), list(snapshot.names),
+                          snapshot.prices * 1.01, snapshot.changes + 0.1, snapshot.market_caps.copy(),
+                          snapshot.volumes.copy(), list(snapshot.last_updated))
+
+
+def bench_universe(results, base_url, data_dir, coins, size, repeat, table_model):
+    engine = make_engine(base_url, data_dir, f'top:{size}')
+    statuses = []
+    engine.status.connect(statuses.append)
+    try:
+        def refresh():
+            with quiet():
+                engine.refresh_prices().result()
+            if len(engine.snapshot) != size:
+                raise RuntimeError(f'Refresh returned {len(engine.snapshot)}/{size} coins: {statuses[-1:]}')
+
+        # Same cache rules and streamed decoding as production; the peak is the whole refresh's
+        results[f'refresh/{size}'] = measure(refresh, repeat, size, memory=True)
+
+        pages = [json.dumps(coins[start:start + MARKETS_PAGE_SIZE]).encode('utf-8')
+                 for start in range(0, size, MARKETS_PAGE_SIZE)]
+        rows = CoinGeckoProvider.market_rows
+        results[f'parse/{size}'] = measure(
+            lambda: [rows(json.loads(page)) for page in pages], repeat, size, memory=True
+        )
+        for backend in decode_backends():
+            results[f'parse.{backend}/{size}'] = measure(
+                lambda: [rows(iter_array(as_response(page), backend)) for page in pages], repeat, size, memory=True
+            )
+
+        if table_model is not None:
+            snapshots = [engine.snapshot, changed_snapshot(engine.snapshot)]
+            results[f'table.populate/{size}'] = measure(
+                lambda: table_model().update_snapshot(snapshots[0]), repeat, size
+            )
+            model = table_model()
+            model.update_snapshot(snapshots[0])
+            # Alternating snapshots so every run changes every price
+            alternating = itertools.cycle(reversed(snapshots))
+            results[f'table.update/{size}'] = measure(
+                lambda: model.update_snapshot(next(alternating)), repeat, size
+            )
+
+        suggestions = []
+        engine.suggestions.connect(suggestions.append)
+
+        def analyze():
+            with quiet():
+                engine.analyze(announce=False).result()
+            if not suggestions:
+                raise RuntimeError(f'Analysis produced no suggestions: {statuses[-1:]}')
+
+        results[f'analysis/{size}'] = measure(analyze, repeat, size)
+    finally:
+        engine.close()
+
+
+def bench_exchange(results, base_url, data_dir, repeat):
+    engine = make_engine(base_url, data_dir, 'default')
+    quotes = []
+    engine.exchange.connect(lambda *args: quotes.append(args))
+    # A new amount each run: the estimate is requested while the pair limits come from
+    # the cache, as after the Exchange tab's prefetch
+    amounts = itertools.count(1)
+    try:
+        def quote():
+            del quotes[:]
+            with quiet():
+                engine.get_exchange_quote(*EXCHANGE_PAIR, custom_amount=float(next(amounts))).result()
+            if not quotes:
+                raise RuntimeError('Exchange quote failed')
+
+        results['exchange.quote'] = measure(quote, repeat)
+    finally:
+        engine.close()
+
+
+def bench_chart_parse(results, repeat):
+    body = json.dumps(fixtures.market_chart('bitcoin', 90, 'hourly')).encode('utf-8')
+    results['chart.parse/json'] = measure(
+        lambda: PriceSeries.from_market_chart(json.loads(body)), repeat, memory=True
+    )
+    for backend in decode_backends():
+        results[f'chart.parse/{backend}'] = measure(
+            lambda: read_market_chart(as_response(body), backend), repeat, memory=True
+        )
+
+
+def bench_alerts(results, data_dir, coins, repeat):
+    snapshot = MarketSnapshot.from_rows(CoinGeckoProvider.market_rows(coins))
+    specs = []
+    for n in range(ALERT_COUNT):
+        coin_id, price = snapshot.ids[n % len(snapshot)], snapshot.prices[n % len(snapshot)]
+        step = 1 + n // len(snapshot) % 20  # 1..20 % away from the price
+        kind = ('above', 'below', 'move', 'volume')[n % 4]
+        if kind == 'above':
+            specs.append((coin_id, kind, price * (1 + step / 100), None, True))
+        elif kind == 'below':
+            specs.append((coin_id, kind, price * (1 - step / 100), None, True))
+        elif kind == 'move':
+            specs.append((coin_id, kind, step if n % 8 < 4 else -step, 3600, True))
+        else:
+            specs.append((coin_id, kind, 1 + step / 4, 3600, True))
+
+    book = AlertBook(os.path.join(data_dir, 'alerts.db'))
+    try:
+        book.add_many(specs)
+        snapshots = itertools.cycle([changed_snapshot(snapshot), snapshot])
+        clock = itertools.count(step=60)
+        book.check(snapshot, next(clock))
+        results[f'alerts.check/{ALERT_COUNT}'] = measure(
+            lambda: book.check(next(snapshots), next(clock)), repeat, ALERT_COUNT
+        )
+    finally:
+        book.close()
+
+
+def bench_portfolio(results, data_dir, coins, repeat):
+    snapshot = MarketSnapshot.from_rows(CoinGeckoProvider.market_rows(coins))
+    now_ms = int(time.time() * 1000)
+    specs = []
+    for n in range(LOT_COUNT):
+        coin_id, price = snapshot.ids[n % len(snapshot)], snapshot.prices[n % len(snapshot)]
+        # Half the lots bought on a date inside the charted window
+        acquired = now_ms - (n % 80) * DAY_MS if n % 2 else None
+        specs.append((coin_id, 1 + n % 7, price * (0.8 + n % 5 / 10), acquired))
+
+    portfolio = Portfolio(os.path.join(data_dir, 'portfolio.db'))
+    store = PriceHistoryStore(os.path.join(data_dir, 'history.db'))
+    try:
+        portfolio.add_lots(specs)
+        snapshots = itertools.cycle([changed_snapshot(snapshot), snapshot])
+        results[f'portfolio.update/{LOT_COUNT}'] = measure(
+            lambda: portfolio.update(next(snapshots)), repeat, LOT_COUNT
+        )
+
+        history = store.load_many(portfolio.coin_ids(), 'daily', INDICATOR_DAYS, now_ms)
+        results[f'portfolio.history/{LOT_COUNT}'] = measure(
+            lambda: portfolio.value_history(history, now_ms - INDICATOR_DAYS * DAY_MS, now_ms, DAY_MS),
+            repeat, LOT_COUNT
+        )
+    finally:
+        store.close()
+        portfolio.close()
+
+
+def bench_chart(results, repeat):
+    from price_chart import PriceChart
+
+    chart = PriceChart()
+    chart.canvas.resize(1200, 600)
+    for period, days in PERIOD_DAYS.items():
+        series = PriceSeries.from_market_chart(fixtures.market_chart('bitcoin', days, history_interval(days)))
+
+        def redraw():
+            chart.set_series(series, f'Bitcoin Price History ({period})')
+            chart.canvas.draw()
+
+        results[f'chart.redraw/{period}'] = measure(redraw, repeat, len(series))
+
+
+def qt_table_model():
+    """PriceTableModel with an offscreen QApplication, or None without PyQt5"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtWidgets import QApplication
+        from crypto_gui import PriceTableModel
+    except ImportError as e:
+        print(f'Skipping table and chart benchmarks: {e}')
+        return None, None
+    return QApplication.instance() or QApplication([]), PriceTableModel
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, latency_ms, gui=True):
+    app, table_model = qt_table_model() if gui else (None, None)
+    coins = fixtures.markets(max(sizes))
+    results = {}
+    server, base_url = start_mock_server(max(sizes), latency_ms)
+    try:
+        with tempfile.TemporaryDirectory(prefix='crypto-bench-') as data_dir:
+            store_history(data_dir, coins)
+            for size in sizes:
+                print(f'Universe of {size} coins...')
+                bench_universe(results, base_url, data_dir, coins, size, repeat, table_model)
+            bench_exchange(results, base_url, data_dir, repeat)
+            bench_alerts(results, data_dir, coins, repeat)
+            bench_portfolio(results, data_dir, coins, repeat)
+        bench_chart_parse(results, repeat)
+    finally:
+        server.kill()
+        server.wait()
+    if app is not None:
+        bench_chart(results, repeat)
+
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'sizes': list(sizes),
+            'repeat': repeat,
+            'latency_ms': latency_ms,
+        },
+        'results': results,
+    }
+
+
+def print_results(report, baseline=None, threshold=DEFAULT_THRESHOLD):
+    """Print a results table; returns the names slower than the baseline by over threshold %"""
+    regressions = []
+    previous = baseline['results'] if baseline else {}
+    for name, result in report['results'].items():
+        line = f"{name:<26} {result['median_ms']:10.2f} ms  (min {result['min_ms']:.2f})"
+        if result.get('items_per_s'):
+            line += f"  {result['items_per_s']:>12,.0f}/s"
+        if 'peak_kb' in result:
+            line += f"  peak {result['peak_kb']:,.0f} KiB"
+        if name in previous:
+            change = (result['median_ms'] / previous[name]['median_ms'] - 1) * 100
+            line += f"  {change:+6.1f}% vs {previous[name]['median_ms']:.2f} ms"
+            if change > threshold:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print(line)
+    return regressions
+
+
+def latest_result(exclude=None):
+    paths = sorted(p for p in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if p != exclude)
+    return paths[-1] if paths else None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Benchmark refresh, parsing, table, chart, exchange and analysis offline.'
+    )
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated universe sizes (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='timed runs per benchmark (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='milliseconds the mock API adds to every response (default: 0)')
+    parser.add_argument('--no-gui', action='store_true', help='skip the table and chart benchmarks')
+    parser.add_argument('--output', help='where to save the results (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', help="earlier results file to compare against, or 'latest'")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='slowdown in %% reported as a regression (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    sizes = sorted({int(size) for size in args.sizes.split(',') if size.strip()})
+    baseline_path = latest_result() if args.compare == 'latest' else args.compare
+    baseline = None
+    if args.compare:
+        if not baseline_path or not os.path.exists(baseline_path):
+            print(f'No results to compare against: {args.compare}')
+            return 2
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    report = run(sizes, args.repeat, args.latency, gui=not args.no_gui)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    if baseline:
+        print(f"Compared with {baseline_path} (commit {baseline['meta'].get('commit')})")
+    regressions = print_results(report, baseline, args.threshold)
+    print(f'Saved {output}')
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""GUI-free data engine behind the Crypto Currency Price Tracker"""
+
+from .alerts import Alert, AlertBook
+from .analysis import analyze_coin_data, analyze_market
+from .config import CHANGENOW_MAPPING, COINS, DATA_DIR, DAY_MS, PERIOD_DAYS
+from .decoding import PayloadError
+from .engine import MarketEngine
+from .events import Signal
+from .feeds import PollingFeed, PriceFeed, StreamingFeed
+from .history import PriceHistoryStore
+from .indicators import coin_signals, latest_indicators
+from .metrics import MetricsRegistry, MetricsServer
+from .portfolio import Lot, Portfolio
+from .profiling import Profiler
+from .providers import CoinGeckoProvider, CoinPaprikaProvider, MarketProvider, ProviderError, ProviderPool
+from .series import PriceSeries
+from .snapshot import MarketSnapshot
+from .network import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RateLimited, RateLimiter, RequestExecutor,
+    ResponseCache
+)
+
+__all__ = [
+    'CHANGENOW_MAPPING', 'COINS', 'DATA_DIR', 'DAY_MS', 'PERIOD_DAYS',
+    'Alert', 'AlertBook', 'CoinGeckoProvider', 'CoinPaprikaProvider', 'Lot', 'MarketEngine', 'MarketProvider',
+    'MarketSnapshot', 'MetricsRegistry', 'MetricsServer', 'PayloadError', 'PollingFeed', 'Portfolio',
+    'PriceFeed', 'PriceHistoryStore', 'PriceSeries', 'Profiler', 'ProviderError', 'ProviderPool',
+    'RateLimited', 'RateLimiter', 'RequestExecutor', 'ResponseCache', 'Signal', 'StreamingFeed',
+    'PRIORITY_BACKGROUND', 'PRIORITY_INTERACTIVE',
+    'analyze_coin_data', 'analyze_market', 'coin_signals', 'latest_indicators',
+]
@@ -0,0 +1,564 @@
+"""User-defined price alerts, indexed per coin and checked against every market snapshot
+
+Kinds of alert:
+
+- above / below  the price crosses a level (fires on the snapshot that crosses it)
+- move           the price moves by THRESHOLD % or more within WINDOW seconds
+                 (a negative threshold means a drop)
+- volume         the 24h volume grows THRESHOLD times or more within WINDOW seconds
+
+Alerts are indexed per coin in sorted threshold lists. Checking a snapshot is a
+few array operations over the coins with alerts (per window length for move and
+volume alerts), plus a bisection for each coin that passed its nearest threshold,
+however many alerts are set; only the alerts that fire are touched. One-shot
+alerts are retired when they fire; repeating level alerts fire on every crossing,
+repeating move/volume alerts rest for one window before they are armed again.
+
+Alerts live in SQLite (DATA_DIR/alerts.db), so they survive restarts.
+"""
+
+import bisect
+import heapq
+import ipaddress
+import math
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ALERT_KINDS = ('above', 'below', 'move', 'volume')
+# Kinds measured over a time window, and the window used when none is given
+WINDOW_KINDS = ('move', 'volume')
+DEFAULT_WINDOW = 60 * 60
+# Snapshots kept per move/volume window: at most one every SAMPLE_SPACING seconds and
+# about WINDOW_SAMPLES per window, so a window's start is known to within 1/60 of it
+SAMPLE_SPACING = 5
+WINDOW_SAMPLES = 60
+
+
+def check_webhook_url(url):
+    """Return url if it is an http(s) URL on this machine, else raise ValueError
+
+    Alert webhooks only ever go to a local endpoint (a notifier, home automation
+    bridge, ...), never to a remote host.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ''
+    if parts.scheme not in ('http', 'https') or not host:
+        raise ValueError(f'Alert webhook must be an http(s) URL, got {url!r}')
+    if host != 'localhost':
+        try:
+            local = ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            local = False
+        if not local:
+            raise ValueError(f'Alert webhook must point at localhost or a loopback address, got {host!r}')
+    return url
+
+
+WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_window(text):
+    """Seconds in a window like '90', '30m', '4h' or '1d'"""
+    text = str(text).strip().lower()
+    unit = WINDOW_UNITS.get(text[-1:]) if text else None
+    try:
+        return int(float(text[:-1] if unit else text) * (unit or 1))
+    except ValueError:
+        raise ValueError(f'Invalid alert window {text!r} (e.g. 300, 30m, 4h, 1d)') from None
+
+
+def format_window(seconds):
+    if seconds % 86400 == 0:
+        return f'{seconds // 86400}d'
+    if seconds % 3600 == 0:
+        return f'{seconds // 3600}h'
+    if seconds % 60 == 0:
+        return f'{seconds // 60}m'
+    return f'{seconds}s'
+
+
+class Alert:
+    """One stored alert; `window` is None for level alerts"""
+
+    __slots__ = ('id', 'coin_id', 'kind', 'threshold', 'window', 'repeat', 'created', 'last_fired')
+
+    def __init__(self, id, coin_id, kind, threshold, window=None, repeat=False, created=None, last_fired=None):
+        self.id = id
+        self.coin_id = coin_id
+        self.kind = kind
+        self.threshold = threshold
+        self.window = window
+        self.repeat = repeat
+        self.created = created
+        self.last_fired = last_fired
+
+    def describe(self, symbol=None):
+        """e.g. 'BTC above $70,000.00' or 'ETH down 5% within 1h'"""
+        name = symbol or self.coin_id
+        if self.kind in ('above', 'below'):
+            return f'{name} {self.kind} ${self.threshold:,.{2 if self.threshold >= 1 else 6}f}'
+        within = format_window(self.window)
+        if self.kind == 'move':
+            direction = 'up' if self.threshold > 0 else 'down'
+            return f'{name} {direction} {abs(self.threshold):g}% within {within}'
+        return f'{name} volume x{self.threshold:g} within {within}'
+
+
+def validate_alert(coin_id, kind, threshold, window=None):
+    """(kind, threshold, window) normalised, or ValueError for an alert that can never fire"""
+    if not coin_id:
+        raise ValueError('Alert needs a coin')
+    if kind not in ALERT_KINDS:
+        raise ValueError(f"Unknown alert kind {kind!r} (use {', '.join(ALERT_KINDS)})")
+    try:
+        threshold = float(threshold)
+    except (TypeError, ValueError):
+        raise ValueError(f'Alert threshold must be a number, got {threshold!r}') from None
+    if not math.isfinite(threshold):
+        raise ValueError('Alert threshold must be a finite number')
+    if kind in WINDOW_KINDS:
+        window = int(window or DEFAULT_WINDOW)
+        if window <= 0:
+            raise ValueError('Alert window must be positive')
+        if kind == 'move' and threshold == 0:
+            raise ValueError('Move alerts need a non-zero percentage')
+        if kind == 'volume' and threshold <= 1:
+            raise ValueError('Volume alerts need a growth factor above 1')
+    else:
+        window = None
+        if threshold <= 0:
+            raise ValueError('Price level must be positive')
+    return kind, threshold, window
+
+
+class _Thresholds:
+    """Sorted thresholds with the ids of the alerts behind them"""
+
+    __slots__ = ('values', 'ids')
+
+    def __init__(self):
+        self.values = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value, alert_id):
+        i = bisect.bisect_right(self.values, value)
+        self.values.insert(i, value)
+        self.ids.insert(i, alert_id)
+
+    def remove(self, value, alert_id):
+        lo = bisect.bisect_left(self.values, value)
+        i = self.ids.index(alert_id, lo, bisect.bisect_right(self.values, value))
+        del self.values[i], self.ids[i]
+
+    def between(self, low, high, include_low=False):
+        """Ids with low < threshold <= high (low <= threshold < high with include_low)"""
+        if include_low:
+            return self.ids[bisect.bisect_left(self.values, low):bisect.bisect_left(self.values, high)]
+        return self.ids[bisect.bisect_right(self.values, low):bisect.bisect_right(self.values, high)]
+
+    def up_to(self, value):
+        """Ids with threshold <= value"""
+        return self.ids[:bisect.bisect_right(self.values, value)]
+
+
+class _Window:
+    """Move and volume alerts sharing one window length
+
+    Keeps the market's prices and volumes over the last window, at most one sample
+    per `spacing` seconds, as arrays in AlertBook coin order, and the thresholds of
+    each (kind, direction) per coin. A check compares every coin with the sample one
+    window ago in a few array operations and only bisects the coins whose move
+    reaches their lowest threshold.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.spacing = max(SAMPLE_SPACING, seconds / WINDOW_SAMPLES)
+        self.times = []
+        self.prices = []
+        self.volumes = []
+        self.groups = {}   # (kind, direction) -> {coin_id: _Thresholds}
+        self._floors = None  # (kind, direction) -> lowest threshold per coin, rebuilt after changes
+
+    def add(self, coin_id, kind, direction, value, alert_id):
+        self.groups.setdefault((kind, direction), {}).setdefault(coin_id, _Thresholds()).add(value, alert_id)
+        self._floors = None
+
+    def remove(self, coin_id, kind, direction, value, alert_id):
+        """Raises ValueError if the alert is not armed here"""
+        coins = self.groups.get((kind, direction), {})
+        thresholds = coins.get(coin_id)
+        if thresholds is None:
+            raise ValueError(alert_id)
+        thresholds.remove(value, alert_id)
+        if not thresholds:
+            del coins[coin_id]
+            if not coins:
+                del self.groups[(kind, direction)]
+        self._floors = None
+
+    def seed(self, now, prices, volumes):
+        """Start an empty window from the market as last seen"""
+        if not self.times:
+            self.times.append(now)
+            self.prices.append(prices)
+            self.volumes.append(volumes)
+
+    def realign(self, take):
+        """Reorder the samples for a new coin order (take: old position per coin, -1 if new)"""
+        self.prices = [np.append(prices, np.nan)[take] for prices in self.prices]
+        self.volumes = [np.append(volumes, np.nan)[take] for volumes in self.volumes]
+        self._floors = None
+
+    def check(self, prices, volumes, now, coins, position):
+        """(coin_id, kind, direction, value) for every coin whose move over the window
+        reaches the lowest threshold of one of its groups"""
+        if not self.times or now - self.times[-1] >= self.spacing:
+            self.times.append(now)
+            self.prices.append(prices)
+            self.volumes.append(volumes)
+        # Keep the newest sample at or before the start of the window as the reference
+        start = bisect.bisect_right(self.times, now - self.seconds) - 1
+        if start > 0:
+            del self.times[:start], self.prices[:start], self.volumes[:start]
+        if self.prices[0] is prices:
+            return []
+
+        if self._floors is None:
+            self._floors = {}
+            for key, thresholds in self.groups.items():
+                floor = np.full(len(coins), np.inf)
+                floor[[position[coin_id] for coin_id in thresholds]] = [t.values[0] for t in thresholds.values()]
+                self._floors[key] = floor
+        with np.errstate(divide='ignore', invalid='ignore'):
+            moves = (prices / self.prices[0] - 1) * 100
+            spikes = volumes / self.volumes[0]
+
+        hits = []
+        for (kind, direction), floor in self._floors.items():
+            values = moves if kind == 'move' else spikes
+            # NaN (a coin missing from either sample) never reaches a threshold
+            with np.errstate(invalid='ignore'):
+                reached = np.flatnonzero(values * direction >= floor)
+            hits += ((coins[k], kind, direction, float(values[k])) for k in reached)
+        return hits
+
+
+class AlertBook:
+    """Persistent set of alerts, checked against each new MarketSnapshot
+
+    Every coin with alerts has a slot in a few arrays: the last price seen and, for
+    level alerts, the nearest levels below and above it on either side. A snapshot
+    is compared with those brackets in one pass; only coins whose price left its
+    bracket are bisected (to find the crossed levels) and re-bracketed.
+
+    Thread-safe: snapshots may be checked from the refresh workers and the price
+    feeds while alerts are added or removed from the GUI thread.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    coin_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    threshold REAL NOT NULL,
+                    window_s INTEGER,
+                    repeat INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL,
+                    last_fired REAL,
+                    active INTEGER NOT NULL DEFAULT 1
+                )
+            ''')
+
+        self._alerts = {}    # id -> Alert, every active alert
+        self._levels = {}    # coin_id -> {'above': _Thresholds, 'below': _Thresholds}
+        self._windows = {}   # window seconds -> _Window
+        self._resting = []   # heap of (rearm_at, id): repeating window alerts that just fired
+        # Coins with alerts, in the order of the per-coin arrays
+        self._coins = []
+        self._position = {}
+        self._last = np.empty(0)           # last price seen, NaN until the coin is seen
+        self._brackets = np.empty((4, 0))  # see _bracket
+        self._rows = (None, None)          # (snapshot ids, rows of self._coins in that snapshot)
+        self._latest = None                # (snapshot, time) of the last check, to start new alerts from
+        self._regroup = False              # coins were added; rebuild the arrays
+        self._seed = False                 # alerts were armed; start them from self._latest
+        self._dirty = set()                # coins whose brackets are out of date
+        self.checked = 0
+        self.fired = 0
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, coin_id, kind, threshold, window_s, repeat, created, last_fired '
+                'FROM alerts WHERE active = 1 ORDER BY threshold'
+            ).fetchall()
+            # Sorted by threshold, so the level indexes are built by appends
+            for row in rows:
+                alert = Alert(row[0], row[1], row[2], row[3], row[4], bool(row[5]), row[6], row[7])
+                self._alerts[alert.id] = alert
+                self._arm(alert)
+
+    def __len__(self):
+        return len(self._alerts)
+
+    # Index maintenance; callers hold the lock
+
+    def _arm(self, alert):
+        self._seed = True
+        if alert.coin_id not in self._position:
+            self._regroup = True
+        if alert.kind in WINDOW_KINDS:
+            window = self._windows.get(alert.window)
+            if window is None:
+                window = self._windows[alert.window] = _Window(alert.window)
+            window.add(alert.coin_id, alert.kind, -1 if alert.threshold < 0 else 1, abs(alert.threshold), alert.id)
+        else:
+            sides = self._levels.setdefault(alert.coin_id, {'above': _Thresholds(), 'below': _Thresholds()})
+            sides[alert.kind].add(alert.threshold, alert.id)
+            self._dirty.add(alert.coin_id)
+
+    def _disarm(self, alert):
+        # The coin keeps its array slot until the next regroup
+        if alert.kind in WINDOW_KINDS:
+            window = self._windows.get(alert.window)
+            try:
+                window.remove(alert.coin_id, alert.kind, -1 if alert.threshold < 0 else 1,
+                              abs(alert.threshold), alert.id)
+            except (AttributeError, ValueError):
+                return  # resting after firing
+            if not window.groups:
+                del self._windows[alert.window]
+        else:
+            sides = self._levels[alert.coin_id]
+            sides[alert.kind].remove(alert.threshold, alert.id)
+            if not sides['above'] and not sides['below']:
+                del self._levels[alert.coin_id]
+                # Its last price is no longer kept current; a new level starts from the latest check
+                k = self._position.get(alert.coin_id)
+                if k is not None:
+                    self._last[k] = np.nan
+                    self._seed = True
+            self._dirty.add(alert.coin_id)
+
+    def _bracket(self, k, coin_id):
+        """Nearest levels around the last price of coin k
+
+        Rows: the highest 'above' level <= price and the lowest one > price, the
+        highest 'below' level < price and the lowest one >= price. While a new price
+        stays inside both brackets no level alert can fire, and the brackets still
+        hold for it.
+        """
+        price = self._last[k]
+        sides = self._levels.get(coin_id)
+        if sides is None:
+            self._brackets[:, k] = (-np.inf, np.inf, -np.inf, np.inf)
+        elif price != price:
+            # Not seen yet: the first price always leaves the bracket
+            self._brackets[:, k] = (np.inf, np.inf, -np.inf, np.inf)
+        else:
+            above, below = sides['above'].values, sides['below'].values
+            i = bisect.bisect_right(above, price)
+            j = bisect.bisect_left(below, price)
+            self._brackets[:, k] = (above[i - 1] if i else -np.inf, above[i] if i < len(above) else np.inf,
+                                    below[j - 1] if j else -np.inf, below[j] if j < len(below) else np.inf)
+
+    def _sync(self):
+        if self._regroup:
+            coins = sorted(set(self._levels).union(*(thresholds for window in self._windows.values()
+                                                    for thresholds in window.groups.values())))
+            take = np.array([self._position.get(coin_id, -1) for coin_id in coins], dtype=np.intp)
+            self._last = np.append(self._last, np.nan)[take]
+            for window in self._windows.values():
+                window.realign(take)
+            self._coins = coins
+            self._position = {coin_id: k for k, coin_id in enumerate(coins)}
+            self._brackets = np.empty((4, len(coins)))
+            self._rows = (None, None)
+            self._dirty = set(coins)
+            self._regroup = False
+        if self._seed and self._latest is not None:
+            # New alerts start from the last prices checked, so the next snapshot can already fire them
+            snapshot, checked_at = self._latest
+            prices, volumes = self._columns(snapshot)
+            unseen = np.isnan(self._last)
+            self._last[unseen] = prices[unseen]
+            for window in self._windows.values():
+                window.seed(checked_at, prices, volumes)
+        self._seed = False
+        for coin_id in self._dirty:
+            self._bracket(self._position[coin_id], coin_id)
+        self._dirty.clear()
+
+    def _columns(self, snapshot):
+        """Prices and volumes of the coins in snapshot, NaN where missing or not positive"""
+        ids, rows = self._rows
+        # Refreshes mostly list the coins in the same order as last time
+        if ids is not snapshot.ids and ids != snapshot.ids:
+            rows = snapshot.rows(self._coins)
+        self._rows = (snapshot.ids, rows)
+        known = rows >= 0
+        prices, volumes = snapshot.prices[rows], snapshot.volumes[rows]
+        with np.errstate(invalid='ignore'):
+            return (np.where(known & (prices > 0), prices, np.nan),
+                    np.where(known & (volumes > 0), volumes, np.nan))
+
+    # Public API
+
+    def add(self, coin_id, kind, threshold, window=None, repeat=False):
+        """Store and arm an alert; returns it. Raises ValueError for invalid alerts."""
+        return self.add_many([(coin_id, kind, threshold, window, repeat)])[0]
+
+    def add_many(self, specs):
+        """Store and arm (coin_id, kind, threshold[, window[, repeat]]) alerts in one transaction"""
+        now = time.time()
+        rows = []
+        for spec in specs:
+            coin_id, kind, threshold, window, repeat = (tuple(spec) + (None, False))[:5]
+            kind, threshold, window = validate_alert(coin_id, kind, threshold, window)
+            rows.append((coin_id, kind, threshold, window, bool(repeat)))
+        added = []
+        with self._lock:
+            with self._conn:
+                for coin_id, kind, threshold, window, repeat in rows:
+                    cursor = self._conn.execute(
+                        'INSERT INTO alerts (coin_id, kind, threshold, window_s, repeat, created) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (coin_id, kind, threshold, window, int(repeat), now)
+                    )
+                    added.append(Alert(cursor.lastrowid, coin_id, kind, threshold, window, repeat, now))
+            for alert in added:
+                self._alerts[alert.id] = alert
+                self._arm(alert)
+        return added
+
+    def remove(self, alert_id):
+        """Delete an alert; returns False if there was no such active alert"""
+        with self._lock:
+            alert = self._alerts.pop(alert_id, None)
+            if alert is None:
+                return False
+            self._disarm(alert)
+            with self._conn:
+                self._conn.execute('DELETE FROM alerts WHERE id = ?', (alert_id,))
+        return True
+
+    def alerts(self):
+        """Every active alert, oldest first"""
+        with self._lock:
+            return sorted(self._alerts.values(), key=lambda alert: alert.id)
+
+    def check(self, snapshot, now=None):
+        """Fire the alerts triggered by the move to `snapshot`
+
+        Level alerts fire when the price crosses them between the previous snapshot
+        and this one. Returns one event dict per fired alert: id, coin_id, symbol,
+        kind, threshold, window, value (price, % move or volume factor), price, time
+        and message.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if not len(snapshot):
+                return []
+            if not self._alerts:
+                self._latest = (snapshot, now)
+                return []
+            self.checked += 1
+            while self._resting and self._resting[0][0] <= now:
+                alert = self._alerts.get(heapq.heappop(self._resting)[1])
+                if alert is not None:
+                    self._arm(alert)
+            self._sync()
+            self._latest = (snapshot, now)
+
+            prices, volumes = self._columns(snapshot)
+            fired = []
+            if self._levels:
+                fired += self._check_levels(prices)
+            # Every coin's last price stays current, with level alerts or not; coins inside
+            # their brackets keep valid brackets at the new price
+            seen = ~np.isnan(prices)
+            self._last[seen] = prices[seen]
+            if self._windows:
+                for window in self._windows.values():
+                    for coin_id, kind, direction, value in window.check(prices, volumes, now, self._coins,
+                                                                         self._position):
+                        ids = window.groups[(kind, direction)][coin_id].up_to(value * direction)
+                        fired += ((self._alerts[alert_id], value) for alert_id in ids)
+            if not fired:
+                self._sync()
+                return []
+
+            events, updates, retired = [], [], []
+            for alert, value in fired:
+                i = snapshot.index[alert.coin_id]
+                symbol = snapshot.symbols[i]
+                alert.last_fired = now
+                if not alert.repeat:
+                    self._disarm(alert)
+                    del self._alerts[alert.id]
+                    retired.append((now, alert.id))
+                else:
+                    if alert.kind in WINDOW_KINDS:
+                        self._disarm(alert)
+                        heapq.heappush(self._resting, (now + alert.window, alert.id))
+                    updates.append((now, alert.id))
+                events.append({
+                    'id': alert.id, 'coin_id': alert.coin_id, 'symbol': symbol, 'kind': alert.kind,
+                    'threshold': alert.threshold, 'window': alert.window, 'value': value,
+                    'price': float(snapshot.prices[i]), 'time': now, 'message': alert.describe(symbol),
+                })
+            self._sync()
+            with self._conn:
+                self._conn.executemany('UPDATE alerts SET last_fired = ? WHERE id = ?', updates)
+                self._conn.executemany('UPDATE alerts SET last_fired = ?, active = 0 WHERE id = ?', retired)
+            self.fired += len(events)
+        return events
+
+    def _check_levels(self, prices):
+        low_above, high_above, low_below, high_below = self._brackets
+        with np.errstate(invalid='ignore'):
+            # NaN (coin missing or without a price) stays inside every bracket
+            moved = np.flatnonzero((prices < low_above) | (prices >= high_above) |
+                                   (prices <= low_below) | (prices > high_below))
+        fired = []
+        for k in moved:
+            coin_id = self._coins[k]
+            before, after = self._last[k], float(prices[k])
+            self._last[k] = after
+            self._dirty.add(coin_id)
+            if before != before:
+                continue
+            sides = self._levels[coin_id]
+            if after > before:
+                ids = sides['above'].between(before, after)
+            else:
+                ids = sides['below'].between(after, before, include_low=True)
+            fired += ((self._alerts[alert_id], after) for alert_id in ids)
+        return fired
+
+    def stats(self):
+        with self._lock:
+            coins = set(self._levels).union(*(thresholds for window in self._windows.values()
+                                              for thresholds in window.groups.values()))
+            return {'alerts': len(self._alerts), 'coins': len(coins), 'windows': len(self._windows),
+                    'resting': len(self._resting), 'checked': self.checked, 'fired': self.fired}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,216 @@
+"""Rule-based trade suggestions from market data"""
+
+# Thresholds and confidence points of the 24h rules in analyze_coin_data; backtest.py
+# replays the same rules (backtest.rule_signals) and sweeps over these
+DEFAULT_THRESHOLDS = {
+    'strong_gain': 15,         # % 24h change: take profit above this
+    'gain': 5,                 # % 24h change: momentum above this
+    'strong_drop': -15,        # % 24h change: oversold below this
+    'drop': -5,                # % 24h change: dip below this
+    'momentum_volume': 0.1,    # volume / market cap needed to buy momentum
+    'high_volume': 0.2,        # volume / market cap counted as high
+    'low_volume': 0.05,        # volume / market cap counted as low
+    'large_cap': 50_000_000_000,
+    'small_cap': 1_000_000_000,
+    # Confidence (%) to start from, and the points each rule adds when it applies
+    'base_confidence': 50,
+    'strong_gain_confidence': 20,
+    'momentum_confidence': 15,
+    'strong_drop_confidence': 25,
+    'drop_confidence': 10,
+    'high_volume_confidence': 10,
+    'low_volume_confidence': -5,
+    'large_cap_confidence': 5,
+    'small_cap_confidence': -5,
+    'major_confidence': 10,      # BTC and ETH
+    'stablecoin_confidence': 90,  # replaces the confidence of USDT and USDC
+}
+
+
+def analyze_market(coins, snapshot, signals=None, limit=10):
+    """Return the `limit` most confident suggestions for the tracked coins
+
+    snapshot is the engine's MarketSnapshot, read in place; signals optionally maps
+    coin ids to the indicator values from indicators.coin_signals.
+    """
+    suggestions = []
+    signals = signals or {}
+    index = snapshot.index
+    prices, changes = snapshot.prices, snapshot.changes
+    market_caps, volumes = snapshot.market_caps, snapshot.volumes
+
+    # Analyze each coin
+    for coin_id, symbol, name in coins:
+        i = index.get(coin_id)
+        if i is not None:
+            current_price = float(prices[i])
+
+            # Skip if no valid price data
+            if current_price <= 0:
+                continue
+
+            # Simple technical analysis
+            suggestion = analyze_coin_data(
+                name, symbol, current_price, float(changes[i]),
+                float(market_caps[i]), float(volumes[i]), signals.get(coin_id)
+            )
+            if suggestion:
+                suggestions.append(suggestion)
+
+    # Sort by confidence
+    suggestions.sort(key=lambda x: x['confidence'], reverse=True)
+    return suggestions[:limit]
+
+
+def analyze_coin_data(name, symbol, price, change_24h, market_cap, volume, signals=None, thresholds=None):
+    """Analyze individual coin data and return suggestion"""
+    t = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    try:
+        # Technical indicators analysis
+        confidence = t['base_confidence']
+        action = "HOLD"
+        reasoning = []
+        target_price = price
+
+        # Price momentum analysis
+        if change_24h > t['strong_gain']:
+            action = "SELL"
+            confidence += t['strong_gain_confidence']
+            reasoning.append(f"Strong upward momentum (+{change_24h:.1f}%)")
+            target_price = price * 0.95  # Take profit
+
+        elif change_24h > t['gain']:
+            if volume > market_cap * t['momentum_volume']:  # High volume
+                action = "BUY"
+                confidence += t['momentum_confidence']
+                reasoning.append(f"Good momentum with high volume")
+                target_price = price * 1.1
+            else:
+                action = "HOLD"
+                reasoning.append(f"Moderate gain (+{change_24h:.1f}%)")
+
+        elif change_24h < t['strong_drop']:
+            action = "BUY"
+            confidence += t['strong_drop_confidence']
+            reasoning.append(f"Oversold condition ({change_24h:.1f}%)")
+            target_price = price * 1.2  # Recovery target
+
+        elif change_24h < t['drop']:
+            action = "BUY"
+            confidence += t['drop_confidence']
+            reasoning.append(f"Dip buying opportunity ({change_24h:.1f}%)")
+            target_price = price * 1.15
+
+        else:
+            reasoning.append(f"Sideways movement ({change_24h:.1f}%)")
+
+        # Volume analysis
+        if market_cap > 0:
+            volume_ratio = volume / market_cap if market_cap > 0 else 0
+            if volume_ratio > t['high_volume']:
+                confidence += t['high_volume_confidence']
+                reasoning.append("High trading volume")
+            elif volume_ratio < t['low_volume']:
+                confidence += t['low_volume_confidence']
+                reasoning.append("Low trading volume")
+
+        # Market cap considerations
+        if market_cap > t['large_cap']:  # Large cap
+            reasoning.append("Large-cap stability")
+            confidence += t['large_cap_confidence']
+        elif market_cap < t['small_cap']:  # Small cap
+            reasoning.append("Small-cap volatility")
+            confidence += t['small_cap_confidence']
+
+        # Indicators from stored history (NaN until there are enough points)
+        if signals:
+            action, confidence, target_price = apply_indicator_signals(
+                signals, action, confidence, target_price, price, reasoning
+            )
+
+        # Special crypto considerations
+        if symbol in ['BTC', 'ETH']:
+            confidence += t['major_confidence']
+            reasoning.append("Major cryptocurrency")
+        elif symbol in ['USDT', 'USDC']:
+            action = "HOLD"
+            confidence = t['stablecoin_confidence']
+            reasoning = ["Stablecoin - hold for stability"]
+            target_price = price
+
+        confidence = min(95, max(5, confidence))  # Clamp between 5-95%
+
+        return {
+            'name': name,
+            'symbol': symbol,
+            'action': action,
+            'confidence': confidence,
+            'current_price': price,
+            'target_price': target_price,
+            'reasoning': ' | '.join(reasoning)
+        }
+
+    except Exception as e:
+        print(f"Error analyzing {name}: {str(e)}")
+        return None
+
+
+def _known(signals, key):
+    value = signals.get(key)
+    return value is not None and value == value  # NaN != NaN
+
+
+def apply_indicator_signals(signals, action, confidence, target_price, price, reasoning):
+    """Adjust a suggestion with RSI, MACD, Bollinger, moving-average and ATR readings"""
+    if _known(signals, 'rsi'):
+        rsi = signals['rsi']
+        if rsi < 30:
+            reasoning.append(f"RSI oversold ({rsi:.0f})")
+            if action == "SELL":
+                action = "HOLD"
+                target_price = price
+            else:
+                confidence += 10
+                if action == "HOLD":
+                    action = "BUY"
+                    target_price = price * 1.1
+        elif rsi > 70:
+            reasoning.append(f"RSI overbought ({rsi:.0f})")
+            if action == "BUY":
+                confidence -= 10
+            else:
+                confidence += 5
+                if action == "HOLD":
+                    action = "SELL"
+                    target_price = price * 0.95
+
+    if _known(signals, 'macd_hist') and action != "HOLD":
+        bullish = signals['macd_hist'] > 0
+        if bullish == (action == "BUY"):
+            confidence += 5
+            reasoning.append("MACD confirms" if bullish else "MACD bearish")
+        else:
+            confidence -= 5
+            reasoning.append("MACD diverges")
+
+    if _known(signals, 'bb_percent'):
+        if signals['bb_percent'] < 0:
+            reasoning.append("Below lower Bollinger band")
+            confidence += 5 if action == "BUY" else 0
+        elif signals['bb_percent'] > 1:
+            reasoning.append("Above upper Bollinger band")
+            confidence += 5 if action == "SELL" else 0
+
+    if _known(signals, 'sma_50'):
+        if price > signals['sma_50']:
+            reasoning.append("Above 50-day average")
+            confidence += 5 if action == "BUY" else 0
+        else:
+            reasoning.append("Below 50-day average")
+            confidence += 5 if action == "SELL" else 0
+
+    if _known(signals, 'atr_pct') and signals['atr_pct'] > 8:
+        reasoning.append(f"High volatility (ATR {signals['atr_pct']:.1f}%)")
+        confidence -= 5
+
+    return action, confidence, target_price
@@ -0,0 +1,285 @@
+"""Replay the trade-suggestion rules over stored daily history and sweep their thresholds
+
+    python -m crypto_engine.backtest --days 365
+    python -m crypto_engine.backtest --days 365 --sweep --workers 8
+    python -m crypto_engine.backtest --grid high_volume=0.1,0.2,0.3 --grid drop_confidence=5,10,15
+
+History is collected with `python -m crypto_engine --history "1 year"`, which
+downloads at most the last 365 days; older days are only in the store if the
+collector has been running that long, so a longer --days replays what is there.
+
+Every stored coin is replayed at once over a (coins, days) matrix. At each daily
+close the 24h rules of analyze_coin_data decide BUY (go long), SELL (go flat) or
+HOLD (keep the position); a signal only counts when its confidence reaches
+min_confidence. Indicator signals are not replayed.
+"""
+
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .analysis import DEFAULT_THRESHOLDS
+from .config import COINS, DATA_DIR, PERIOD_DAYS
+from .history import PriceHistoryStore
+from .indicators import price_matrix
+
+HOLD, BUY, SELL = 0, 1, -1
+
+# Backtest-only knobs, swept alongside the rule thresholds
+DEFAULT_OPTIONS = {
+    'min_confidence': 50,   # ignore BUY/SELL signals below this confidence
+    'horizon': 7,           # days ahead a signal is judged on for the hit rate
+    'fee': 0.001,           # fraction of the position paid on every entry or exit
+}
+
+DEFAULT_GRID = {
+    'gain': [3, 5, 7],
+    'strong_gain': [10, 15, 20],
+    'drop': [-3, -5, -7],
+    'strong_drop': [-10, -15, -20],
+    'high_volume': [0.1, 0.2, 0.3],
+    'low_volume': [0.02, 0.05],
+    'min_confidence': [50, 60, 70],
+}
+
+
+def load_matrices(store, days, coin_ids=None):
+    """Stored daily history as (coin_ids, closes, market_caps, volumes) matrices"""
+    coin_ids = coin_ids if coin_ids is not None else store.coin_ids('daily')
+    history = store.load_many(coin_ids, 'daily', days)
+    coin_ids = [coin_id for coin_id in coin_ids if coin_id in history]
+    series_list = [history[coin_id] for coin_id in coin_ids]
+    # One column per day from the oldest stored point, so every coin lines up by date
+    return (
+        coin_ids,
+        price_matrix(series_list),
+        price_matrix(series_list, field='market_caps'),
+        price_matrix(series_list, field='volumes'),
+    )
+
+
+def rule_signals(closes, market_caps, volumes, symbols, thresholds=None):
+    """Vectorised analyze_coin_data over every (coin, day): returns (actions, confidence)
+
+    Mirrors the 24h rules of analyze_coin_data, including the BTC/ETH bonus and the
+    stablecoin override; keep the two in step when the rules change.
+    """
+    t = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = (closes[:, 1:] / closes[:, :-1] - 1) * 100
+    change = np.concatenate((np.full((len(closes), 1), np.nan), change), axis=1)
+    caps = np.nan_to_num(market_caps)
+    volume = np.nan_to_num(volumes)
+
+    strong_gain = change > t['strong_gain']
+    gain = ~strong_gain & (change > t['gain'])
+    momentum = gain & (volume > caps * t['momentum_volume'])
+    strong_drop = ~strong_gain & ~gain & (change < t['strong_drop'])
+    drop = ~strong_gain & ~gain & ~strong_drop & (change < t['drop'])
+
+    actions = np.full(closes.shape, HOLD, dtype=np.int8)
+    actions[strong_gain] = SELL
+    actions[momentum | strong_drop | drop] = BUY
+
+    confidence = np.full(closes.shape, float(t['base_confidence']))
+    confidence += (t['strong_gain_confidence'] * strong_gain + t['momentum_confidence'] * momentum +
+                   t['strong_drop_confidence'] * strong_drop + t['drop_confidence'] * drop)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_ratio = np.where(caps > 0, volume / caps, 0)
+    high_volume = volume_ratio > t['high_volume']
+    low_volume = ~high_volume & (volume_ratio < t['low_volume'])
+    confidence += np.where(caps > 0, t['high_volume_confidence'] * high_volume +
+                           t['low_volume_confidence'] * low_volume, 0)
+    large_cap = caps > t['large_cap']
+    small_cap = ~large_cap & (caps < t['small_cap'])
+    confidence += t['large_cap_confidence'] * large_cap + t['small_cap_confidence'] * small_cap
+
+    symbols = np.asarray(symbols)
+    confidence[np.isin(symbols, ['BTC', 'ETH'])] += t['major_confidence']
+    stable = np.isin(symbols, ['USDT', 'USDC'])
+    actions[stable] = HOLD
+    confidence[stable] = t['stablecoin_confidence']
+
+    # No signal without a 24h change
+    actions[np.isnan(change)] = HOLD
+    return actions, np.clip(confidence, 5, 95)
+
+
+def evaluate(closes, actions, confidence, options=None):
+    """Per-coin results of trading the signals: return, drawdown, trades and hit rate"""
+    o = dict(DEFAULT_OPTIONS, **(options or {}))
+    taken = np.where(confidence >= o['min_confidence'], actions, HOLD)
+
+    # BUY opens a long position, SELL closes it, HOLD keeps whatever is held
+    decided = np.where(taken == BUY, 1.0, np.where(taken == SELL, 0.0, np.nan))
+    index = np.where(~np.isnan(decided), np.arange(decided.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    position = np.nan_to_num(np.take_along_axis(decided, index, axis=1))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.nan_to_num(closes[:, 1:] / closes[:, :-1] - 1)
+    changes = np.abs(np.diff(position, axis=1, prepend=0))
+    strategy = position[:, :-1] * returns - o['fee'] * changes[:, :-1]
+    equity = np.cumprod(1 + strategy, axis=1)
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1
+
+    # A signal is a hit when the price moved its way over the horizon
+    horizon = int(o['horizon'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        forward = closes[:, horizon:] / closes[:, :-horizon] - 1
+    signals = taken[:, :-horizon]
+    judged = (signals != HOLD) & ~np.isnan(forward)
+    hits = judged & (((signals == BUY) & (forward > 0)) | ((signals == SELL) & (forward < 0)))
+
+    first = np.argmax(~np.isnan(closes), axis=1)
+    last = closes.shape[1] - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        buy_and_hold = closes[:, last] / closes[np.arange(len(closes)), first] - 1
+    return {
+        'total_return': equity[:, -1] - 1 if equity.shape[1] else np.zeros(len(closes)),
+        'buy_and_hold': buy_and_hold,
+        'max_drawdown': drawdown.min(axis=1) if drawdown.shape[1] else np.zeros(len(closes)),
+        'trades': changes.sum(axis=1),
+        'signals': judged.sum(axis=1),
+        'hits': hits.sum(axis=1),
+    }
+
+
+def summarize(results):
+    """Aggregate per-coin results into one row"""
+    signals = int(results['signals'].sum())
+    return {
+        'coins': len(results['total_return']),
+        'mean_return': float(np.nanmean(results['total_return'])) if len(results['total_return']) else 0.0,
+        'median_return': float(np.nanmedian(results['total_return'])) if len(results['total_return']) else 0.0,
+        'buy_and_hold': float(np.nanmean(results['buy_and_hold'])) if len(results['buy_and_hold']) else 0.0,
+        'mean_drawdown': float(np.nanmean(results['max_drawdown'])) if len(results['max_drawdown']) else 0.0,
+        'worst_drawdown': float(np.nanmin(results['max_drawdown'])) if len(results['max_drawdown']) else 0.0,
+        'trades': int(results['trades'].sum()),
+        'signals': signals,
+        'hit_rate': float(results['hits'].sum()) / signals if signals else 0.0,
+    }
+
+
+def run(closes, market_caps, volumes, symbols, params=None):
+    """Backtest one parameter set (rule thresholds and/or DEFAULT_OPTIONS keys)"""
+    params = params or {}
+    thresholds = {k: v for k, v in params.items() if k in DEFAULT_THRESHOLDS}
+    options = {k: v for k, v in params.items() if k in DEFAULT_OPTIONS}
+    actions, confidence = rule_signals(closes, market_caps, volumes, symbols, thresholds)
+    return summarize(evaluate(closes, actions, confidence, options))
+
+
+# Worker processes receive the matrices once, through the pool initializer
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def _run_worker(params):
+    return params, run(*_worker_data, params)
+
+
+def sweep(closes, market_caps, volumes, symbols, grid=None, workers=None):
+    """Backtest every combination of the grid on a process pool, best mean return first"""
+    grid = grid or DEFAULT_GRID
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    data = (closes, market_caps, volumes, list(symbols))
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        results = [(params, run(*data, params)) for params in combos]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as pool:
+            results = list(pool.map(_run_worker, combos, chunksize=max(1, len(combos) // (workers * 4))))
+    results.sort(key=lambda item: item[1]['mean_return'], reverse=True)
+    return results
+
+
+def parse_grid(specs):
+    """{name: [values]} from 'name=v1,v2,...' specs; ValueError for unknown names or values"""
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_THRESHOLDS and name not in DEFAULT_OPTIONS:
+            raise ValueError(f'Unknown parameter {name!r} in --grid {spec!r}')
+        try:
+            grid[name] = [float(value) for value in values.split(',') if value.strip()]
+            grid[name] = [int(value) if value.is_integer() else value for value in grid[name]]
+        except ValueError:
+            raise ValueError(f'Invalid values in --grid {spec!r} (use name=v1,v2,...)') from None
+        if not grid[name]:
+            raise ValueError(f'No values in --grid {spec!r} (use name=v1,v2,...)')
+    return grid
+
+
+def format_row(params, summary):
+    settings = ' '.join(f'{k}={v}' for k, v in params.items()) or 'defaults'
+    return (f"{settings:<60} return {summary['mean_return'] * 100:+7.1f}%  "
+            f"hold {summary['buy_and_hold'] * 100:+7.1f}%  "
+            f"drawdown {summary['mean_drawdown'] * 100:6.1f}%  "
+            f"hit {summary['hit_rate'] * 100:5.1f}%  trades {summary['trades']}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m crypto_engine.backtest',
+        description='Replay the trade-suggestion rules over the stored daily price history.'
+    )
+    parser.add_argument('--days', type=int, default=365,
+                        help='days of history to replay (default: 365, the most one --history download covers)')
+    parser.add_argument('--coins', help='comma-separated coin ids (default: every stored coin)')
+    parser.add_argument('--sweep', action='store_true', help='sweep the default threshold grid')
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2,...',
+                        help='sweep these values of a threshold, confidence point or option instead '
+                             'of the default grid (repeatable; implies --sweep)')
+    parser.add_argument('--workers', type=int, help='processes for --sweep (default: CPU count)')
+    parser.add_argument('--top', type=int, default=10, help='sweep results to show (default: 10)')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='directory holding history.db')
+    args = parser.parse_args(argv)
+    try:
+        args.grid = parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    store = PriceHistoryStore(os.path.join(args.data_dir, 'history.db'))
+    try:
+        coin_ids = args.coins.split(',') if args.coins else None
+        coin_ids, closes, market_caps, volumes = load_matrices(store, args.days, coin_ids)
+    finally:
+        store.close()
+    if not coin_ids:
+        print('No stored daily history - collect some with: python -m crypto_engine --history "1 year"')
+        return 1
+
+    known = {coin_id: symbol for coin_id, symbol, name in COINS}
+    symbols = [known.get(coin_id, coin_id.upper()) for coin_id in coin_ids]
+    if closes.shape[1] < args.days:
+        print(f'Warning: only {closes.shape[1]} of the {args.days} days asked for are stored '
+              f'(a --history download covers at most {max(PERIOD_DAYS.values())} days)')
+    print(f'Replaying {len(coin_ids)} coins over {closes.shape[1]} days')
+
+    if args.sweep or args.grid:
+        results = sweep(closes, market_caps, volumes, symbols, grid=args.grid or None, workers=args.workers)
+        for params, summary in results[:args.top]:
+            print(format_row(params, summary))
+    else:
+        print(format_row({}, run(closes, market_caps, volumes, symbols)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Static configuration shared by the GUI and the headless collector"""
+
+import os
+
+# Local state (price history database, caches) lives here unless overridden
+DATA_DIR = os.environ.get('CRYPTO_TRACKER_HOME', os.path.join(os.path.expanduser('~'), '.crypto_tracker'))
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+COINGECKO_API = 'https://api.coingecko.com/api/v3'
+# Overridable so the app and the benchmarks can run against a local mock (benchmarks/mock_server.py)
+CHANGENOW_API = os.environ.get('CRYPTO_TRACKER_CHANGENOW_API', 'https://api.changenow.io/v1')
+COINPAPRIKA_API = 'https://api.coinpaprika.com/v1'
+
+# Market data sources, fastest healthy first with hedging: comma-separated names
+# ('coingecko', 'coinpaprika'), each optionally with a base URL, e.g.
+# 'coingecko,coingecko=https://mirror.example/api/v3,coinpaprika'
+MARKET_PROVIDERS = os.environ.get('CRYPTO_TRACKER_PROVIDERS', 'coingecko')
+
+# Port for the Prometheus-style /metrics endpoint on 127.0.0.1; unset or 0 = disabled
+METRICS_PORT = int(os.environ.get('CRYPTO_TRACKER_METRICS_PORT') or 0)
+
+# Profile refresh/history/exchange/analysis with cProfile + tracemalloc into DATA_DIR/profiles
+PROFILE = os.environ.get('CRYPTO_TRACKER_PROFILE', '').lower() in ('1', 'true', 'yes', 'on')
+
+# Decoder for large API payloads: 'stream' (incremental stdlib json), 'orjson' (whole body,
+# needs the orjson package) or 'auto' (orjson where it is faster, when installed)
+JSON_BACKEND = os.environ.get('CRYPTO_TRACKER_JSON', 'auto')
+
+# Local endpoint (http://localhost:PORT/...) that fired price alerts are POSTed to as JSON; unset = off
+ALERT_WEBHOOK = os.environ.get('CRYPTO_TRACKER_ALERT_WEBHOOK', '')
+
+# Famous cryptocurrencies with their CoinGecko IDs
+COINS = [
+    ('bitcoin', 'BTC', 'Bitcoin'),
+    ('ethereum', 'ETH', 'Ethereum'),
+    ('binancecoin', 'BNB', 'BNB'),
+    ('cardano', 'ADA', 'Cardano'),
+    ('solana', 'SOL', 'Solana'),
+    ('xrp', 'XRP', 'XRP'),
+    ('dogecoin', 'DOGE', 'Dogecoin'),
+    ('monero', 'XMR', 'Monero'),
+    ('tether', 'USDT', 'Tether'),
+    ('polygon', 'MATIC', 'Polygon'),
+    ('litecoin', 'LTC', 'Litecoin'),
+    ('chainlink', 'LINK', 'Chainlink'),
+    ('avalanche-2', 'AVAX', 'Avalanche'),
+    ('tron', 'TRX', 'TRON'),
+    ('shiba-inu', 'SHIB', 'Shiba Inu'),
+    ('uniswap', 'UNI', 'Uniswap'),
+    ('the-open-network', 'TON', 'Toncoin'),
+]
+
+# ChangeNOW currency mapping (CoinGecko ID to ChangeNOW ticker)
+CHANGENOW_MAPPING = {
+    'bitcoin': 'btc',
+    'ethereum': 'eth',
+    'binancecoin': 'bnb',
+    'cardano': 'ada',
+    'solana': 'sol',
+    'xrp': 'xrp',
+    'dogecoin': 'doge',
+    'monero': 'xmr',
+    'tether': 'usdt',
+    'polygon': 'matic',
+    'litecoin': 'ltc',
+    'chainlink': 'link',
+    'avalanche-2': 'avax',
+    'tron': 'trx',
+    'shiba-inu': 'shib',
+    'uniswap': 'uni',
+    'the-open-network': 'ton',
+}
+
+# Chart periods offered in the UI, mapped to days of history
+PERIOD_DAYS = {
+    '7 days': 7,
+    '30 days': 30,
+    '90 days': 90,
+    '1 year': 365
+}
+
+
+# Largest page CoinGecko's /coins/markets will return
+MARKETS_PAGE_SIZE = 250
+
+# Which coins the market overview tracks: 'default' (the list above), 'top:N' (top N by
+# market cap), 'category:ID[:N]' (a CoinGecko category) or 'ids:ID,ID,...'
+UNIVERSE = os.environ.get('CRYPTO_TRACKER_UNIVERSE', 'default')
+
+# Optional WebSocket ticker stream (Binance-style mini-tickers) for push price updates,
+# e.g. wss://stream.binance.com:9443/ws/!miniTicker@arr; empty = polling only
+PRICE_STREAM_URL = os.environ.get('CRYPTO_TRACKER_STREAM', '')
+
+
+def parse_universe(spec):
+    """Turn a universe spec into (kind, value, limit) where kind is 'ids', 'top' or 'category'"""
+    spec = (spec or 'default').strip()
+    kind, _, rest = spec.partition(':')
+    if kind == 'default':
+        return 'ids', [c[0] for c in COINS], len(COINS)
+    if kind == 'ids':
+        ids = [i.strip() for i in rest.split(',') if i.strip()]
+        if not ids:
+            raise ValueError(f'No coin ids given in universe {spec!r}')
+        return 'ids', ids, len(ids)
+    if kind == 'top':
+        limit = int(rest or MARKETS_PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError(f'Universe size must be positive: {spec!r}')
+        return 'top', None, limit
+    if kind == 'category':
+        category, _, limit = rest.partition(':')
+        if not category:
+            raise ValueError(f'No category given in universe {spec!r}')
+        return 'category', category, int(limit or MARKETS_PAGE_SIZE)
+    raise ValueError(f'Unknown universe {spec!r} (use default, top:N, category:ID[:N] or ids:A,B)')
+
+
+def markets_pages(universe):
+    """Query params for each /coins/markets page needed to cover a parsed universe"""
+    kind, value, limit = universe
+    if kind == 'ids':
+        return [
+            {'ids': ','.join(value[i:i + MARKETS_PAGE_SIZE]), 'per_page': MARKETS_PAGE_SIZE, 'page': 1}
+            for i in range(0, len(value), MARKETS_PAGE_SIZE)
+        ]
+    pages = []
+    for page in range(1, -(-limit // MARKETS_PAGE_SIZE) + 1):
+        params = {'per_page': MARKETS_PAGE_SIZE, 'page': page}
+        if kind == 'category':
+            params['category'] = value
+        pages.append(params)
+    return pages
+
+
+def history_interval(days):
+    """CoinGecko market_chart interval used for a window of `days`"""
+    return 'daily' if days > 7 else 'hourly'
@@ -0,0 +1,222 @@
+"""Incremental decoding of the large CoinGecko/CoinPaprika payloads
+
+response.json() holds the whole body plus a dict for every coin (or a list for
+every price point) before the few fields the engine uses are picked out. The
+readers here decode straight from the response's byte chunks instead:
+
+- iter_array yields the elements of an array body (/coins/markets, /tickers) one
+  at a time, so only the current coin's dict is ever alive
+- read_market_chart parses the [timestamp, value] pairs of a market_chart body
+  straight into float64 arrays without creating per-point Python objects
+
+With stream=True requests the body is parsed as it arrives and never held whole.
+
+Backends (CRYPTO_TRACKER_JSON): 'stream' is the incremental stdlib decoder above;
+'orjson' decodes the whole body at once with orjson, which is faster but needs
+the full body and object tree in memory; 'auto' picks orjson when installed for
+the array bodies and always streams market_chart pairs, which is the faster path
+for them with either library.
+"""
+
+import codecs
+import json
+import re
+
+import numpy as np
+import requests
+
+from .config import JSON_BACKEND
+from .series import PriceSeries
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+# Bytes read from the response per step
+CHUNK_SIZE = 64 * 1024
+# market_chart keys holding [timestamp, value] pairs
+CHART_KEYS = ('prices', 'market_caps', 'total_volumes')
+
+BACKENDS = ('auto', 'stream', 'orjson')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Characters that may follow a complete value
+_DELIMITERS = frozenset(',]}: \t\n\r')
+_KEY = re.compile(r'"((?:[^"\\]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*')
+# The outer ']' of a pairs array follows the ']' of its last pair
+_PAIRS_END = re.compile(r'\][ \t\n\r]*\]')
+_PAIR_BRACKETS = str.maketrans('[]', '  ')
+_DECODER = json.JSONDecoder()
+
+
+class PayloadError(requests.RequestException, ValueError):
+    """A response body that is not the JSON the reader expected"""
+
+
+def resolve_backend(name=None, auto='orjson'):
+    """'stream' or 'orjson' for a backend name (default JSON_BACKEND); 'auto' means `auto`
+
+    Falls back to 'stream' when orjson is not installed.
+    """
+    name = (name or JSON_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {name!r} (use {', '.join(BACKENDS)})")
+    if name == 'auto':
+        name = auto
+    return 'orjson' if name == 'orjson' and orjson is not None else 'stream'
+
+
+class _TextStream:
+    """Text buffer over a response's byte chunks, decoded as UTF-8 and compacted as it is consumed"""
+
+    def __init__(self, response):
+        self._chunks = response.iter_content(CHUNK_SIZE)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def more(self):
+        """Append the next chunk, dropping what was consumed; False at the end of the body"""
+        while not self.eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                text = self._decoder.decode(b'', final=True)
+            else:
+                text = self._decoder.decode(chunk)
+            if text:
+                self.buffer = self.buffer[self.pos:] + text
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self):
+        """Next non-whitespace character (not consumed), or '' at the end of the body"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.more():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise PayloadError(f"Expected {' or '.join(repr(c) for c in chars)} in JSON body, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the JSON value at the cursor, reading more of the body until it is complete
+
+        A number cut by a chunk boundary ('12' of '1234', '-0' of '-0.5') still
+        decodes, so a value is only taken once a delimiter follows it or the body ends.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if not self.more():
+                    raise PayloadError(f'Invalid JSON body: {e}') from None
+                continue
+            if (end < len(self.buffer) and self.buffer[end] in _DELIMITERS) or not self.more():
+                self.pos = end
+                return value
+
+    def key(self):
+        self.peek()
+        while True:
+            match = _KEY.match(self.buffer, self.pos)
+            if match and match.end() < len(self.buffer):
+                self.pos = match.end()
+                return json.loads(f'"{match.group(1)}"')
+            if not self.more():
+                raise PayloadError('Truncated JSON object')
+
+
+def _load(response):
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError as e:
+        raise PayloadError(f'Invalid JSON body: {e}') from None
+
+
+def iter_array(response, backend=None):
+    """Elements of a JSON array body, in order"""
+    if resolve_backend(backend) == 'orjson':
+        data = _load(response)
+        if not isinstance(data, list):
+            raise PayloadError('Expected a JSON array body')
+        yield from data
+        return
+
+    stream = _TextStream(response)
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+    while True:
+        yield stream.value()
+        if stream.expect(',]') == ']':
+            return
+
+
+def _read_pairs(stream):
+    """The [[ts, value], ...] array at the cursor as an (n, 2) float64 array"""
+    stream.expect('[')
+    parts = []
+    while True:
+        if stream.peek() == ']':
+            stream.pos += 1
+            break
+        buffer, start = stream.buffer, stream.pos
+        end = _PAIRS_END.search(buffer, start)
+        if end is not None:
+            stop, stream.pos = end.start() + 1, end.end()
+        else:
+            # Parse the complete pairs so far and wait for the rest
+            stop = buffer.rfind(']', start) + 1
+            if not stop:
+                if not stream.more():
+                    raise PayloadError('Truncated price array')
+                continue
+            stream.pos = stop
+        segment = buffer[start:stop]
+        text = segment.translate(_PAIR_BRACKETS).replace('null', 'nan').lstrip(' \t\n\r,')
+        try:
+            values = np.fromstring(text, sep=',')
+        except ValueError:
+            values = None
+        if values is None or len(values) != 2 * segment.count('['):
+            raise PayloadError('Malformed price array')
+        parts.append(values)
+        if end is not None:
+            break
+    if not parts:
+        return np.empty((0, 2))
+    return np.concatenate(parts).reshape(-1, 2)
+
+
+def read_market_chart(response, backend=None):
+    """PriceSeries of a /coins/{id}/market_chart body"""
+    if resolve_backend(backend, auto='stream') == 'orjson':
+        data = _load(response)
+        if not isinstance(data, dict):
+            raise PayloadError('Expected a JSON object body')
+        return PriceSeries.from_market_chart(data)
+
+    stream = _TextStream(response)
+    pairs = {}
+    stream.expect('{')
+    if stream.peek() != '}':
+        while True:
+            key = stream.key()
+            if key in CHART_KEYS and stream.peek() == '[':
+                pairs[key] = _read_pairs(stream)
+            else:
+                stream.value()
+            if stream.expect(',}') == '}':
+                break
+    return PriceSeries.from_pairs(pairs.get('prices'), pairs.get('market_caps'), pairs.get('total_volumes'))
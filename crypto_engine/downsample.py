@@ -0,0 +1,63 @@
+"""Reduce long price series to roughly one point per pixel while keeping peaks and troughs"""
+
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: keep the point of each bucket spanning the biggest triangle
+
+    x must be increasing. Returns (x, y) unchanged if there is nothing to reduce.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    # n_out - 2 buckets over the points between the fixed first and last ones
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return x[selected], y[selected]
+
+
+def minmax(x, y, n_buckets):
+    """Keep the minimum and maximum of each of n_buckets equal-count buckets (fully vectorised)"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= 2 * n_buckets or n_buckets < 1:
+        return x, y
+
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    buckets = np.repeat(np.arange(n_buckets), np.diff(edges))
+    # Sorted by bucket, then by value: each bucket's first entry is its min, last its max
+    order = np.lexsort((y, buckets))
+    firsts = edges[:-1]
+    lasts = edges[1:] - 1
+    selected = np.unique(np.concatenate(([0, n - 1], order[firsts], order[lasts])))
+    return x[selected], y[selected]
+
+
+def downsample(x, y, n_out, method='lttb'):
+    """Reduce a series to about n_out points with the given method ('lttb' or 'minmax')"""
+    if method == 'minmax':
+        return minmax(x, y, max(1, n_out // 2))
+    return lttb(x, y, n_out)
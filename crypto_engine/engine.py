@@ -0,0 +1,599 @@
+"""Market, history, exchange and analysis logic, independent of any GUI toolkit"""
+
+import os
+import time
+
+import numpy as np
+import requests
+
+from .alerts import AlertBook, check_webhook_url
+from .analysis import analyze_market
+from .config import (
+    ALERT_WEBHOOK, CHANGENOW_API, CHANGENOW_MAPPING, COINS, DATA_DIR, DAY_MS, MARKET_PROVIDERS, METRICS_PORT,
+    PERIOD_DAYS, PRICE_STREAM_URL, PROFILE, UNIVERSE, history_interval, parse_universe
+)
+from .events import Signal
+from .feeds import PollingFeed, StreamingFeed
+from .history import PriceHistoryStore
+from .indicators import ANALYSIS_FETCH_MAX, INDICATOR_DAYS, coin_signals
+from .metrics import MetricsRegistry, MetricsServer
+from .portfolio import HISTORY_FETCH_MAX, PORTFOLIO_ID, Portfolio
+from .profiling import Profiler
+from .providers import ProviderError, ProviderPool, build_providers
+from .routes import QUOTE_NOTIONAL_USD, RATE_MAX_AGE, RATE_SWEEP_PAIRS, RateMatrix
+from .snapshot import MarketSnapshot
+from .network import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RequestExecutor, ResponseCache
+)
+
+
+class MarketEngine:
+    """Fetches and analyses market data on a shared worker pool, publishing results via signals"""
+
+    def __init__(self, data_dir=DATA_DIR, max_workers=4, universe=UNIVERSE, providers=MARKET_PROVIDERS,
+                 changenow_api=CHANGENOW_API, metrics_port=METRICS_PORT, profile=PROFILE,
+                 alert_webhook=ALERT_WEBHOOK):
+        self.coins = list(COINS)
+        self.universe = parse_universe(universe)
+        # (id, symbol, name) of every coin in the last market snapshot
+        self.tracked_coins = list(self.coins)
+        self.changenow_api = changenow_api.rstrip('/')
+        self.changenow_mapping = dict(CHANGENOW_MAPPING)
+        self.rate_matrix = RateMatrix(sorted(set(self.changenow_mapping.values())))
+        # Latest MarketSnapshot; replaced (never modified) by refreshes and pushed prices
+        self.snapshot = MarketSnapshot.empty()
+        self.proxy = None
+        # Fired alerts are also POSTed here when set (local endpoints only)
+        self.alert_webhook = check_webhook_url(alert_webhook) if alert_webhook else ''
+
+        self.session = requests.Session()
+        self.metrics = MetricsRegistry()
+        self.executor = RequestExecutor(
+            self.session, max_workers=max_workers,
+            cache=ResponseCache(disk_dir=os.path.join(data_dir, 'http_cache')), metrics=self.metrics
+        )
+        # Off unless asked for; can be toggled at runtime
+        self.profiler = Profiler(os.path.join(data_dir, 'profiles'), enabled=profile)
+        self.metrics_server = None
+        if metrics_port:
+            self.start_metrics_server(metrics_port)
+        self.history_store = PriceHistoryStore(os.path.join(data_dir, 'history.db'))
+        self.alert_book = AlertBook(os.path.join(data_dir, 'alerts.db'))
+        self.portfolio = Portfolio(os.path.join(data_dir, 'portfolio.db'))
+        self.providers = ProviderPool(build_providers(providers, self.executor))
+
+        # Latest-wins token for chart history: only the response matching it is published
+        self.history_token = None
+        self.history_future = None
+
+        # Live price feeds, started with start_feeds()
+        self.feeds = []
+
+        self.status = Signal()       # (message)
+        self.markets = Signal()      # (snapshot)
+        self.history = Signal()      # (series, coin_id, period)
+        self.exchange = Signal()     # (from_ticker, to_ticker, exchange_info)
+        self.suggestions = Signal()  # (suggestions)
+        self.rates = Signal()        # (rate_matrix)
+        self.alerts = Signal()       # (fired alert events)
+        self.valuation = Signal()    # (portfolio summary)
+
+    def start_metrics_server(self, port):
+        """Serve the metrics on http://127.0.0.1:PORT/metrics; returns the bound port or None"""
+        if self.metrics_server is None:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, port)
+            except OSError as e:
+                print(f"Metrics endpoint not started on port {port}: {e}")  # Debug
+                return None
+        return self.metrics_server.port
+
+    def coin_name(self, coin_id):
+        return next((name for cid, symbol, name in self.coins if cid == coin_id), coin_id)
+
+    def load_env_proxy(self):
+        """Use the HTTP_PROXY environment variable if set; returns the proxy in use"""
+        env_proxy = os.environ.get('HTTP_PROXY') or os.environ.get('http_proxy')
+        if env_proxy:
+            self.proxy = env_proxy
+            self.session.proxies = {'http': env_proxy, 'https': env_proxy}
+        return self.proxy
+
+    def set_proxy(self, proxy_url):
+        """Route all requests through proxy_url, or clear the proxy when empty"""
+        if proxy_url:
+            if proxy_url.startswith(('socks5h://', 'socks5://', 'socks4://')):
+                try:
+                    import socks
+                    self.session.proxies = {'http': proxy_url, 'https': proxy_url}
+                    self.status.emit(f'SOCKS proxy set: {proxy_url}')
+                except ImportError:
+                    self.status.emit('requests[socks] required for SOCKS proxy. Install with: pip install requests[socks]')
+                    return
+            else:
+                self.session.proxies = {'http': proxy_url, 'https': proxy_url}
+                self.status.emit(f'HTTP proxy set: {proxy_url}')
+            self.proxy = proxy_url
+        else:
+            self.session.proxies = {}
+            self.proxy = None
+            self.status.emit('Proxy cleared.')
+
+    def refresh_prices(self, priority=PRIORITY_INTERACTIVE):
+        """Fetch current prices and market data for every coin in the universe"""
+        self.status.emit('Fetching latest prices...')
+
+        def fetch_data():
+            try:
+                known_coins = self.coins + self.tracked_coins
+                (snapshot, errors), provider = self.providers.call(
+                    'fetch_markets', self.universe, priority, known_coins
+                )
+                self.snapshot = snapshot
+                self.tracked_coins = snapshot.coins()
+                self.markets.emit(snapshot)
+                self.check_alerts(snapshot)
+                self.value_portfolio(snapshot)
+                source = '' if provider is self.providers.providers[0] else f' from {provider.label}'
+                if errors:
+                    self.status.emit(f'Prices updated for {len(snapshot)} coins{source} ({errors[0]})')
+                else:
+                    self.status.emit(f'Prices updated successfully{source}')
+
+            except requests.RequestException as e:
+                # Covers rate limiting: the previous prices stay on screen
+                self.status.emit(f'{e} - keeping previous prices')
+            except Exception as e:
+                self.status.emit(f'Error fetching data: {str(e)}')
+
+        return self.executor.submit(self.profiler.wrap('refresh', fetch_data), key=('refresh', priority))
+
+    def fetch_history(self, coin_id, period, priority=PRIORITY_INTERACTIVE, latest_wins=True):
+        """Fetch price history for a coin, superseding any outstanding chart request"""
+        days = PERIOD_DAYS.get(period, 30)
+        interval = history_interval(days)
+
+        token = (coin_id, period)
+        if latest_wins:
+            # Supersede whatever history request is outstanding
+            self.history_token = token
+            if self.history_future is not None:
+                self.history_future.cancel()
+
+        self.status.emit(f'Loading {period} price history...')
+
+        def is_stale():
+            return latest_wins and self.history_token != token
+
+        def emit_stored(status):
+            if is_stale():
+                return True
+            series = self.history_store.load(coin_id, interval, days)
+            if not len(series):
+                return False
+            self.history.emit(series, coin_id, period)
+            self.status.emit(status)
+            return True
+
+        def fetch_history():
+            if is_stale():
+                return
+            try:
+                fetch_days = self.history_store.plan_fetch(coin_id, interval, days)
+                if fetch_days == 0:
+                    print(f"Serving {coin_id} {period} history from disk")  # Debug
+                    if emit_stored('Price history loaded from local store'):
+                        return
+                    fetch_days = days
+
+                print(f"Fetching {fetch_days} days of {interval} history for {coin_id}")  # Debug
+                try:
+                    series, provider = self.providers.call(
+                        'fetch_history', coin_id, fetch_days, interval, priority, history=True
+                    )
+                except ProviderError as e:
+                    error_msg = f'Error loading history: {e}'
+                    if e.status_code == 429:
+                        error_msg += ' (Rate limited - please wait)'
+                    if not emit_stored(f'{error_msg} - showing stored history'):
+                        self.status.emit(error_msg)
+                    return
+
+                # Keep what was downloaded even when superseded; only the emit is skipped
+                stored = self.history_store.merge(coin_id, interval, series, fetch_days)
+                print(f"Received {stored} price points from {provider.label}")  # Debug
+                if is_stale():
+                    print(f"Not showing superseded history for {coin_id} ({period})")  # Debug
+                    return
+
+                if not emit_stored('Price history loaded successfully'):
+                    self.status.emit('No price data available')
+
+            except Exception as e:
+                print(f"Exception in fetch_history: {str(e)}")  # Debug
+                if not emit_stored(f'Error loading price history: {str(e)} - showing stored history'):
+                    self.status.emit(f'Error loading price history: {str(e)}')
+
+        future = self.executor.submit(self.profiler.wrap('history', fetch_history),
+                                      key=('history', coin_id, period))
+        if latest_wins:
+            self.history_future = future
+        return future
+
+    def fetch_portfolio_history(self, period, priority=PRIORITY_INTERACTIVE):
+        """Value curve of the portfolio over a chart period, published on `history` as PORTFOLIO_ID
+
+        Computed from the stored history of the held coins; the largest positions
+        whose stored history does not cover the period are downloaded first.
+        Supersedes any outstanding chart request, like fetch_history.
+        """
+        days = PERIOD_DAYS.get(period, 30)
+        interval = history_interval(days)
+        token = (PORTFOLIO_ID, period)
+        self.history_token = token
+        if self.history_future is not None:
+            self.history_future.cancel()
+
+        self.status.emit(f'Loading {period} portfolio value...')
+
+        def store_history(coin_id):
+            fetch_days = self.history_store.plan_fetch(coin_id, interval, days)
+            if not fetch_days or self.history_token != token:
+                return
+            try:
+                series, provider = self.providers.call(
+                    'fetch_history', coin_id, fetch_days, interval, priority, history=True
+                )
+                self.history_store.merge(coin_id, interval, series, fetch_days)
+            except requests.RequestException as e:
+                print(f"No {interval} history for {coin_id}: {e}")  # Debug
+
+        def fetch_portfolio_history():
+            try:
+                coin_ids = self.portfolio.coin_ids()
+                if not coin_ids:
+                    self.status.emit('Portfolio is empty - add lots in the Portfolio tab')
+                    return
+                self.executor.map(store_history, coin_ids[:HISTORY_FETCH_MAX])
+                if self.history_token != token:
+                    return
+                now_ms = int(time.time() * 1000)
+                history = self.history_store.load_many(coin_ids, interval, days, now_ms)
+                step = DAY_MS if interval == 'daily' else DAY_MS // 24
+                series = self.portfolio.value_history(history, now_ms - days * DAY_MS, now_ms, step)
+                if self.history_token != token:
+                    return
+                if not len(series):
+                    self.status.emit('No price history available for the portfolio')
+                    return
+                self.history.emit(series, PORTFOLIO_ID, period)
+                self.status.emit(f'Portfolio value history loaded ({len(history)} of {len(coin_ids)} coins)')
+
+            except Exception as e:
+                print(f"Exception in fetch_portfolio_history: {str(e)}")  # Debug
+                self.status.emit(f'Error loading portfolio history: {str(e)}')
+
+        self.history_future = self.executor.submit(self.profiler.wrap('history', fetch_portfolio_history),
+                                                   key=('history', PORTFOLIO_ID, period))
+        return self.history_future
+
+    def start_feeds(self, stream_url=PRICE_STREAM_URL, **polling_options):
+        """Keep prices current: adaptive polling, plus a push stream when one is configured"""
+        if self.feeds:
+            return self.feeds
+        self.feeds = [PollingFeed(self, **polling_options)]
+        if stream_url:
+            self.feeds.append(StreamingFeed(self, stream_url))
+        for feed in self.feeds:
+            feed.start()
+        return self.feeds
+
+    def stop_feeds(self):
+        for feed in self.feeds:
+            feed.stop()
+        self.feeds = []
+
+    def apply_prices(self, prices):
+        """Apply pushed {coin_id: price} updates to the snapshot and publish it"""
+        snapshot, changed = self.snapshot.with_prices(prices)
+        if changed:
+            self.snapshot = snapshot
+            self.markets.emit(snapshot)
+            self.check_alerts(snapshot)
+            self.value_portfolio(snapshot)
+        return changed
+
+    def check_alerts(self, snapshot):
+        """Check the alert book against a new snapshot; publishes and posts what fired"""
+        try:
+            with self.metrics.time('crypto_alert_check_seconds'):
+                events = self.alert_book.check(snapshot)
+        except Exception as e:
+            # A broken alert must never hold up the prices
+            print(f"Alert check failed: {e}")  # Debug
+            return []
+        if events:
+            for event in events:
+                self.metrics.inc('crypto_alerts_fired_total', kind=event['kind'])
+            self.alerts.emit(events)
+            if self.alert_webhook:
+                self.executor.submit(self._post_alerts, events)
+        return events
+
+    def value_portfolio(self, snapshot):
+        """Revalue the portfolio at a new snapshot; publishes its summary when a value moved"""
+        try:
+            if self.portfolio.update(snapshot):
+                self.valuation.emit(self.portfolio.summary())
+        except Exception as e:
+            print(f"Portfolio valuation failed: {e}")  # Debug
+
+    def _post_alerts(self, events):
+        try:
+            # Local endpoint: never through the configured proxy
+            response = self.session.post(self.alert_webhook, json={'alerts': events}, timeout=5,
+                                         proxies={'http': None, 'https': None})
+            response.close()
+            if response.status_code >= 400:
+                print(f"Alert webhook returned {response.status_code}")  # Debug
+        except requests.RequestException as e:
+            print(f"Alert webhook failed: {e}")  # Debug
+
+    def exchange_tickers(self, from_coin_id, to_coin_id):
+        """ChangeNOW tickers for a pair, or None if either coin is unsupported"""
+        from_ticker = self.changenow_mapping.get(from_coin_id)
+        to_ticker = self.changenow_mapping.get(to_coin_id)
+        if not from_ticker or not to_ticker or from_ticker == to_ticker:
+            return None
+        return from_ticker, to_ticker
+
+    def _exchange_get(self, url, priority=PRIORITY_INTERACTIVE):
+        return self.executor.get(url, priority=priority, timeout=10)
+
+    def prefetch_exchange_limits(self, from_coin_id, to_coin_id):
+        """Warm the cached min-amount and range of a pair before the user asks for a quote"""
+        tickers = self.exchange_tickers(from_coin_id, to_coin_id)
+        if tickers is None:
+            return None
+        pair = '_'.join(tickers)
+
+        def prefetch():
+            try:
+                self.executor.map(lambda url: self._exchange_get(url, PRIORITY_BACKGROUND), [
+                    f'{self.changenow_api}/min-amount/{pair}', f'{self.changenow_api}/exchange-range/{pair}'
+                ])
+            except requests.RequestException as e:
+                print(f"Prefetching exchange limits for {pair} failed: {e}")  # Debug
+
+        return self.executor.submit(prefetch, key=('exchange-limits', pair))
+
+    def get_exchange_quote(self, from_coin_id, to_coin_id, custom_amount=None):
+        """Get exchange rate, minimum amount and estimate from ChangeNOW.io
+
+        min-amount and exchange-range are independent of the amount and cached per
+        pair (see CACHE_RULES); the estimate is cached per amount. All calls that do
+        not depend on each other run concurrently, so a quote costs one round-trip
+        once the pair limits are cached, and also with a custom amount.
+        """
+        if not from_coin_id or not to_coin_id:
+            self.status.emit('Please select both currencies')
+            return None
+
+        if from_coin_id == to_coin_id:
+            self.status.emit('Please select different currencies')
+            return None
+
+        tickers = self.exchange_tickers(from_coin_id, to_coin_id)
+        if tickers is None:
+            self.status.emit('Currency not supported by ChangeNOW')
+            return None
+        from_ticker, to_ticker = tickers
+        pair = f'{from_ticker}_{to_ticker}'
+
+        self.status.emit(f'Getting exchange rate for {from_ticker.upper()} → {to_ticker.upper()}...')
+
+        def estimate_url(amount):
+            return f'{self.changenow_api}/exchange-amount/{amount}/{pair}'
+
+        def fetch_exchange_data():
+            try:
+                started = time.perf_counter()
+                urls = [f'{self.changenow_api}/min-amount/{pair}', f'{self.changenow_api}/exchange-range/{pair}']
+                if custom_amount:
+                    # The estimate only depends on the amount, so it joins the same round-trip
+                    urls.append(estimate_url(custom_amount))
+                responses = self.executor.map(self._exchange_get, urls)
+                min_response, range_response = responses[0], responses[1]
+
+                if min_response.status_code != 200:
+                    print(f"Min amount error: {min_response.status_code} - {min_response.text}")
+                    self.status.emit(f'Error getting minimum amount: {min_response.status_code}')
+                    return
+
+                min_amount = min_response.json().get('minAmount', 0)
+                max_amount = None
+                if range_response.status_code == 200:
+                    max_amount = range_response.json().get('maxAmount')
+                print(f"Min amount: {min_amount}, max amount: {max_amount}")
+
+                # Check if custom amount is outside the allowed range
+                if custom_amount and custom_amount < min_amount:
+                    self.status.emit(f'Amount is below minimum ({min_amount} {from_ticker.upper()})')
+                    return
+                if custom_amount and max_amount and custom_amount > max_amount:
+                    self.status.emit(f'Amount is above maximum ({max_amount} {from_ticker.upper()})')
+                    return
+
+                # Use custom amount or minimum amount
+                exchange_amount = custom_amount if custom_amount else max(min_amount, 1)
+                if custom_amount:
+                    estimate_response = responses[2]
+                else:
+                    estimate_response = self._exchange_get(estimate_url(exchange_amount))
+
+                if estimate_response.status_code != 200:
+                    print(f"Estimate error: {estimate_response.status_code} - {estimate_response.text}")
+                    self.status.emit(f'Error getting exchange estimate: {estimate_response.status_code}')
+                    return
+
+                estimated_amount = estimate_response.json().get('estimatedAmount', 0)
+                print(f"Estimated amount: {estimated_amount} "
+                      f"(quote took {(time.perf_counter() - started) * 1000:.0f} ms)")  # Debug
+
+                exchange_info = {
+                    'from_ticker': from_ticker.upper(),
+                    'to_ticker': to_ticker.upper(),
+                    'min_amount': min_amount,
+                    'max_amount': max_amount,
+                    'estimated_amount': estimated_amount,
+                    'exchange_amount': exchange_amount,
+                    'exchange_rate': estimated_amount / exchange_amount if exchange_amount > 0 else 0,
+                    'network_fee': 'Variable',
+                    'service_fee': 'Included in rate',
+                    'custom_amount': custom_amount is not None
+                }
+
+                self.exchange.emit(from_ticker, to_ticker, exchange_info)
+                self.status.emit('Exchange rates loaded successfully')
+
+            except Exception as e:
+                print(f"Exception in fetch_exchange_data: {str(e)}")
+                self.status.emit(f'Error fetching exchange data: {str(e)}')
+
+        return self.executor.submit(self.profiler.wrap('exchange', fetch_exchange_data),
+                                    key=('exchange', from_ticker, to_ticker, custom_amount))
+
+    def sweep_rates(self, max_pairs=RATE_SWEEP_PAIRS, max_age=RATE_MAX_AGE, concurrency=2, focus=()):
+        """Refresh the stalest part of the all-pairs rate matrix in the background
+
+        Each sweep quotes at most max_pairs pairs older than max_age (pairs touching
+        the `focus` tickers and the route hubs first), `concurrency` at a time, paced
+        by the background lane of the ChangeNOW rate limiter. It stops at the first
+        failed quote; later sweeps continue where it left off instead of re-quoting
+        every pair.
+        """
+        ticker_prices = {}
+        snapshot = self.snapshot
+        for coin_id, ticker in self.changenow_mapping.items():
+            if snapshot.price(coin_id):
+                ticker_prices[ticker] = snapshot.price(coin_id)
+
+        def quote(pair):
+            from_ticker, to_ticker = pair
+            # Same USD trade size for every pair; rounded so repeated sweeps hit the cache
+            amount = float(f'{QUOTE_NOTIONAL_USD / ticker_prices[from_ticker]:.4g}')
+            url = (f'{self.changenow_api}/exchange-amount/'
+                   f'{np.format_float_positional(amount, trim="-")}/{from_ticker}_{to_ticker}')
+            try:
+                response = self._exchange_get(url, PRIORITY_BACKGROUND)
+            except requests.RequestException as e:
+                print(f"Rate quote {from_ticker}_{to_ticker} failed: {e}")  # Debug
+                return False
+            if response.status_code == 200:
+                self.rate_matrix.update(from_ticker, to_ticker,
+                                        response.json().get('estimatedAmount', 0) / amount)
+            elif 400 <= response.status_code < 500 and response.status_code != 429:
+                # Unsupported pair or amount out of range: remember, retry after max_age
+                self.rate_matrix.update(from_ticker, to_ticker, None)
+            else:
+                return False
+            return True
+
+        def sweep():
+            pairs = [pair for pair in self.rate_matrix.stale_pairs(max_age, focus=focus)
+                     if pair[0] in ticker_prices][:max_pairs]
+            quoted = 0
+            for start in range(0, len(pairs), concurrency):
+                results = self.executor.map(quote, pairs[start:start + concurrency])
+                quoted += sum(results)
+                if not all(results):
+                    break
+            if quoted:
+                self.rates.emit(self.rate_matrix)
+            print(f"Rate sweep quoted {quoted}/{len(pairs)} pairs, "
+                  f"{self.rate_matrix.coverage():.0%} of the matrix known")  # Debug
+
+        return self.executor.submit(sweep, key='rate-sweep')
+
+    def find_route(self, from_coin_id, to_coin_id, max_hops=3):
+        """Best known route for a pair compared with its direct rate, or None"""
+        tickers = self.exchange_tickers(from_coin_id, to_coin_id)
+        if tickers is None:
+            return None
+        route, rate = self.rate_matrix.best_route(*tickers, max_hops=max_hops)
+        if route is None:
+            return None
+        direct = self.rate_matrix.rate(*tickers)
+        return {
+            'route': [ticker.upper() for ticker in route],
+            'rate': rate,
+            'direct_rate': direct,
+            # nan when the direct pair has not been quoted (or is unsupported)
+            'gain_pct': (rate / direct - 1) * 100 if direct == direct and direct > 0 else float('nan'),
+        }
+
+    def analyze(self, announce=True):
+        """Analyze market data and generate trading suggestions
+
+        Indicators are computed in one batched pass over the stored daily history of
+        every tracked coin. Missing or outdated history is downloaded first for up to
+        ANALYSIS_FETCH_MAX coins, largest first, so repeated analyses fill in the whole
+        universe; coins still without history are judged on the 24h data alone and
+        counted in the status message. announce=False skips the status messages (used
+        for the automatic re-analysis after each refresh) and fetches in the background.
+        """
+        if announce:
+            self.status.emit('🔍 Analyzing market trends and generating suggestions...')
+        priority = PRIORITY_INTERACTIVE if announce else PRIORITY_BACKGROUND
+
+        def store_history(missing):
+            coin_id, fetch_days = missing
+            try:
+                series, provider = self.providers.call(
+                    'fetch_history', coin_id, fetch_days, 'daily', priority, history=True
+                )
+                self.history_store.merge(coin_id, 'daily', series, fetch_days)
+            except requests.RequestException as e:
+                print(f"No daily history for {coin_id}: {e}")  # Debug
+
+        def fetch_market_analysis():
+            try:
+                started = time.perf_counter()
+                coins = self.tracked_coins
+                coin_ids = [coin_id for coin_id, symbol, name in coins]
+                # Tracked coins are in market cap order, so the largest are filled in first
+                missing = [(coin_id, self.history_store.plan_fetch(coin_id, 'daily', INDICATOR_DAYS))
+                           for coin_id in coin_ids]
+                missing = [item for item in missing if item[1]][:ANALYSIS_FETCH_MAX]
+                self.executor.map(store_history, missing)
+                history = self.history_store.load_many(coin_ids, 'daily', INDICATOR_DAYS)
+                signals = coin_signals(coin_ids, history)
+                suggestions = analyze_market(coins, self.snapshot, signals)
+                skipped = len(coin_ids) - len(signals)
+                print(f"Analyzed {len(coins)} coins ({len(signals)} with indicators, "
+                      f"{len(missing)} histories fetched) "
+                      f"in {(time.perf_counter() - started) * 1000:.1f} ms")  # Debug
+                self.suggestions.emit(suggestions)
+                if announce:
+                    if skipped:
+                        self.status.emit(f'✅ Market analysis complete! ({skipped} of {len(coin_ids)} coins '
+                                         'have no price history yet and were judged on 24h data only)')
+                    else:
+                        self.status.emit('✅ Market analysis complete!')
+
+            except Exception as e:
+                print(f"Exception in market analysis: {str(e)}")
+                self.status.emit(f'❌ Error analyzing market: {str(e)}')
+
+        return self.executor.submit(self.profiler.wrap('analysis', fetch_market_analysis), key='analysis')
+
+    def close(self):
+        self.stop_feeds()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.providers.shutdown()
+        self.executor.shutdown()
+        self.session.close()
+        self.history_store.close()
+        self.alert_book.close()
+        self.portfolio.close()
@@ -0,0 +1,25 @@
+"""Qt-free signal type used by the engine to publish results"""
+
+import threading
+
+
+class Signal:
+    """Minimal stand-in for pyqtSignal: slots are called on the emitting thread"""
+
+    def __init__(self):
+        self._slots = []
+        self._lock = threading.Lock()
+
+    def connect(self, slot):
+        with self._lock:
+            self._slots.append(slot)
+
+    def disconnect(self, slot):
+        with self._lock:
+            self._slots.remove(slot)
+
+    def emit(self, *args):
+        with self._lock:
+            slots = list(self._slots)
+        for slot in slots:
+            slot(*args)
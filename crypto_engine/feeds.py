@@ -0,0 +1,229 @@
+"""Price feeds that keep the engine's market data current
+
+A feed runs on its own daemon thread and hands prices to the engine; the engine
+publishes them through its `markets` signal like any other refresh.
+
+- PollingFeed re-fetches the markets snapshot, polling faster while prices move
+  and slower in quiet markets or when the CoinGecko budget runs low.
+- StreamingFeed holds a WebSocket open to a push provider and applies every
+  price update within a second, without any extra REST requests.
+"""
+
+import json
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .network import PRIORITY_BACKGROUND
+from .wsclient import WebSocket, WebSocketError
+
+
+# Polling never goes faster than CoinGecko refreshes /coins/markets (about every 30 s)
+POLL_MIN_INTERVAL = 30
+POLL_MAX_INTERVAL = 180
+POLL_START_INTERVAL = 60
+# 90th percentile move between two polls (%) counted as fast / quiet
+FAST_MOVE_PCT = 0.5
+QUIET_MOVE_PCT = 0.1
+# Below this share of the CoinGecko burst, polling backs off
+LOW_HEADROOM = 0.3
+
+# Streamed ticks are batched so the GUI is updated at most this often (seconds)
+TICK_FLUSH_INTERVAL = 1.0
+STREAM_RECONNECT_MAX = 60
+
+
+class PriceFeed(ABC):
+    """Base class: subclasses implement run() and check self.stopped"""
+
+    name = 'feed'
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f'{self.name}-feed', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def wait(self, seconds):
+        """Sleep unless stopped; returns True if the feed was stopped"""
+        return self._stop.wait(seconds)
+
+    def _run(self):
+        try:
+            self.run()
+        except Exception as e:
+            print(f"{self.name} feed stopped: {e}")  # Debug
+
+    @abstractmethod
+    def run(self):
+        """Feed prices to the engine until stopped"""
+
+
+class PollingFeed(PriceFeed):
+    """Refreshes the markets snapshot on an interval adapted to volatility and rate-limit headroom"""
+
+    name = 'polling'
+
+    def __init__(self, engine, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 start_interval=POLL_START_INTERVAL):
+        super().__init__(engine)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = start_interval
+
+    def next_interval(self, move_pct, headroom):
+        """Halve the interval on fast moves, stretch it in quiet markets or when short on budget
+
+        move_pct is None until two snapshots with prices have been compared; only
+        the budget is taken into account until then.
+        """
+        if headroom < LOW_HEADROOM:
+            interval = self.interval * 2
+        elif move_pct is None:
+            interval = self.interval
+        elif move_pct >= FAST_MOVE_PCT:
+            interval = self.interval / 2
+        elif move_pct < QUIET_MOVE_PCT:
+            interval = self.interval * 1.5
+        else:
+            interval = self.interval
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    @staticmethod
+    def observed_move(before, after):
+        """90th percentile absolute % price change of the coins priced in both snapshots
+
+        None when no coin is priced in both, e.g. while the startup snapshot is still empty.
+        """
+        old = before.prices_for(after.ids)
+        common = old > 0  # False for NaN (not in before)
+        if not common.any():
+            return None
+        return float(np.percentile(np.abs(after.prices[common] / old[common] - 1) * 100, 90))
+
+    def run(self):
+        # The first poll waits one interval: the app fetches a snapshot on startup
+        limiter = self.engine.executor.limiters.get('api.coingecko.com')
+        before = self.engine.snapshot
+        while not self.wait(self.interval):
+            future = self.engine.refresh_prices(priority=PRIORITY_BACKGROUND)
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Polling refresh failed: {e}")  # Debug
+            after = self.engine.snapshot
+            move = self.observed_move(before, after)
+            before = after
+            headroom = limiter.headroom() if limiter is not None else 1.0
+            self.interval = self.next_interval(move, headroom)
+            move_text = f'{move:.2f}%' if move is not None else 'not measured'
+            print(f"Next poll in {self.interval:.0f}s (move {move_text}, headroom {headroom:.0%})")  # Debug
+
+
+class StreamingFeed(PriceFeed):
+    """Applies pushed prices from a WebSocket ticker stream
+
+    The default parser understands Binance-style mini-ticker messages: an object or
+    a list of objects with the pair in "s" and the last price in "c". Symbols are
+    matched to tracked coins as SYMBOL + quote (e.g. BTCUSDT).
+    """
+
+    name = 'streaming'
+
+    def __init__(self, engine, url, quote='USDT'):
+        super().__init__(engine)
+        self.url = url
+        self.quote = quote
+        self.connected = False
+        self.socket = None
+
+    def symbol_map(self):
+        return {
+            f'{symbol.upper()}{self.quote}': coin_id
+            for coin_id, symbol, name in self.engine.tracked_coins
+            if symbol.upper() != self.quote
+        }
+
+    def parse(self, message, symbols):
+        """{coin_id: price} from one stream message"""
+        data = json.loads(message)
+        if isinstance(data, dict):
+            data = data.get('data', data)
+        tickers = data if isinstance(data, list) else [data]
+        prices = {}
+        for ticker in tickers:
+            coin_id = symbols.get(ticker.get('s', '')) if isinstance(ticker, dict) else None
+            if coin_id is not None:
+                try:
+                    prices[coin_id] = float(ticker['c'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+        return prices
+
+    def stop(self):
+        super().stop()
+        if self.socket is not None:
+            # Unblocks recv() on the feed thread
+            self.socket.close()
+
+    def run(self):
+        delay = 1
+        while not self.stopped:
+            try:
+                self.socket = WebSocket(self.url)
+                self.connected = True
+                delay = 1
+                self.engine.status.emit('Live price stream connected')
+                self._pump()
+            except (OSError, WebSocketError, ValueError) as e:
+                if not self.stopped:
+                    print(f"Price stream error: {e}")  # Debug
+            finally:
+                self.connected = False
+                if self.socket is not None:
+                    self.socket.close()
+            if self.stopped:
+                break
+            # Reconnect with exponential back-off; polling keeps prices fresh meanwhile
+            self.engine.status.emit(f'Live price stream disconnected - retrying in {delay}s')
+            if self.wait(delay):
+                break
+            delay = min(STREAM_RECONNECT_MAX, delay * 2)
+
+    def _pump(self):
+        symbols = self.symbol_map()
+        pending = {}
+        last_flush = time.monotonic()
+        self.socket.sock.settimeout(TICK_FLUSH_INTERVAL)
+        while not self.stopped:
+            try:
+                message = self.socket.recv()
+            except socket.timeout:
+                message = ''
+            if message is None:
+                break
+            if message:
+                pending.update(self.parse(message, symbols))
+            if pending and time.monotonic() - last_flush >= TICK_FLUSH_INTERVAL:
+                self.engine.apply_prices(pending)
+                pending = {}
+                last_flush = time.monotonic()
+                # The universe may have changed with the last refresh
+                symbols = self.symbol_map()
+        if pending:
+            self.engine.apply_prices(pending)
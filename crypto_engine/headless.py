@@ -0,0 +1,195 @@
+"""Display-less collector loop: python -m crypto_engine or crypto_gui.py --headless"""
+
+import argparse
+import datetime
+import json
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+
+from .alerts import parse_window
+
+from .config import MARKET_PROVIDERS, METRICS_PORT, PERIOD_DAYS, PROFILE, UNIVERSE
+from .engine import MarketEngine
+from .network import PRIORITY_BACKGROUND
+from .portfolio import parse_acquired
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='crypto_tracker --headless',
+        description='Collect prices and price history on a schedule without a GUI.'
+    )
+    parser.add_argument('--headless', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--interval', type=float, default=60,
+                        help='seconds between refresh cycles (default: 60)')
+    parser.add_argument('--once', action='store_true', help='run a single cycle and exit')
+    parser.add_argument('--history', choices=sorted(PERIOD_DAYS, key=PERIOD_DAYS.get),
+                        help='also keep this history period up to date for every coin')
+    parser.add_argument('--analyze', action='store_true', help='log trade suggestions after each refresh')
+    parser.add_argument('--json', action='store_true', help='write market snapshots as JSON lines')
+    parser.add_argument('--universe', default=UNIVERSE,
+                        help='coins to track: default, top:N, category:ID[:N] or ids:A,B (default: %(default)s)')
+    parser.add_argument('--providers', default=MARKET_PROVIDERS,
+                        help='market data sources, e.g. coingecko,coinpaprika (default: %(default)s)')
+    parser.add_argument('--proxy', help='http://host:port or socks5h://host:port')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help='serve Prometheus metrics on 127.0.0.1:PORT/metrics (default: off)')
+    parser.add_argument('--profile', action='store_true', default=PROFILE,
+                        help='profile each cycle with cProfile/tracemalloc (toggle at runtime with SIGUSR1)')
+    parser.add_argument('--alert', action='append', default=[], metavar='SPEC',
+                        help='add an alert, e.g. bitcoin:above:70000, ethereum:move:-5:1h, '
+                             'solana:volume:2:4h[:repeat] (may be repeated; alerts are kept)')
+    parser.add_argument('--list-alerts', action='store_true', help='list the stored alerts and exit')
+    parser.add_argument('--notify', action='store_true',
+                        help='show fired alerts as desktop notifications (needs notify-send)')
+    parser.add_argument('--lot', action='append', default=[], metavar='SPEC',
+                        help='add a portfolio lot, e.g. bitcoin:0.5:42000[:2024-01-15] '
+                             '(may be repeated; lots are kept)')
+    parser.add_argument('--list-lots', action='store_true', help='list the stored portfolio lots and exit')
+    return parser.parse_args(argv)
+
+
+def parse_alert(spec):
+    """(coin_id, kind, threshold, window, repeat) from COIN:KIND:THRESHOLD[:WINDOW][:repeat]"""
+    parts = spec.split(':')
+    repeat = parts[-1].lower() == 'repeat'
+    if repeat:
+        parts.pop()
+    if len(parts) not in (3, 4):
+        raise ValueError(f'Invalid alert {spec!r} (use COIN:KIND:THRESHOLD[:WINDOW][:repeat])')
+    window = parse_window(parts[3]) if len(parts) == 4 else None
+    return parts[0], parts[1].lower(), parts[2], window, repeat
+
+
+def parse_lot(spec):
+    """(coin_id, quantity, unit_cost, acquired) from COIN:QUANTITY:UNIT_COST[:YYYY-MM-DD]"""
+    parts = spec.split(':')
+    if len(parts) not in (3, 4):
+        raise ValueError(f'Invalid lot {spec!r} (use COIN:QUANTITY:UNIT_COST[:YYYY-MM-DD])')
+    return parts[0], parts[1], parts[2], parse_acquired(parts[3]) if len(parts) == 4 else None
+
+
+def log(msg):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+
+def run_cycle(engine, args):
+    """Refresh prices, then optionally history and analysis, waiting for each to finish"""
+    engine.refresh_prices(priority=PRIORITY_BACKGROUND).result()
+
+    if args.history:
+        futures = [
+            engine.fetch_history(coin_id, args.history, priority=PRIORITY_BACKGROUND, latest_wins=False)
+            for coin_id, symbol, name in engine.coins
+        ]
+        for future in futures:
+            future.result()
+
+    if args.analyze:
+        engine.analyze().result()
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    engine = MarketEngine(universe=args.universe, providers=args.providers, metrics_port=args.metrics_port,
+                          profile=args.profile)
+    stop = threading.Event()
+
+    try:
+        for alert in engine.alert_book.add_many(parse_alert(spec) for spec in args.alert):
+            log(f'Added alert #{alert.id}: {alert.describe()}')
+        for lot in engine.portfolio.add_lots(parse_lot(spec) for spec in args.lot):
+            log(f'Added lot #{lot.id}: {lot.quantity:g} {lot.coin_id} at ${lot.unit_cost:,.6g}')
+    except ValueError as e:
+        log(str(e))
+        engine.close()
+        return 2
+    if args.list_alerts:
+        for alert in engine.alert_book.alerts():
+            repeat = ' (repeating)' if alert.repeat else ''
+            print(f'#{alert.id:<6} {alert.describe()}{repeat}', flush=True)
+        engine.close()
+        return 0
+    if args.list_lots:
+        for lot in engine.portfolio.lots():
+            acquired = '-'
+            if lot.acquired is not None:
+                acquired = datetime.datetime.fromtimestamp(lot.acquired / 1000, datetime.timezone.utc)
+                acquired = acquired.strftime('%Y-%m-%d')
+            print(f'#{lot.id:<6} {lot.coin_id:<20} {lot.quantity:>14g} @ ${lot.unit_cost:<12,.6g} {acquired}',
+                  flush=True)
+        engine.close()
+        return 0
+
+    def on_markets(snapshot):
+        if args.json:
+            print(json.dumps({'time': datetime.datetime.now().isoformat(), 'markets': snapshot.to_dict()}),
+                  flush=True)
+        else:
+            log(f'Updated {len(snapshot)} coins')
+
+    notify_send = shutil.which('notify-send') if args.notify else None
+    if args.notify and notify_send is None:
+        log('notify-send not found; alerts are only logged')
+
+    def on_alerts(events):
+        for event in events:
+            log(f"Alert: {event['message']} (now ${event['price']:,.6g})")
+            if notify_send:
+                subprocess.Popen([notify_send, 'Crypto alert', event['message']])
+
+    def on_valuation(summary):
+        if args.json:
+            print(json.dumps({'time': datetime.datetime.now().isoformat(), 'portfolio': summary}), flush=True)
+        else:
+            log(f"Portfolio ${summary['value']:,.2f} (PnL {summary['pnl']:+,.2f}, {summary['pnl_pct']:+.2f}%) "
+                f"in {summary['positions']} positions")
+
+    def on_suggestions(suggestions):
+        for s in suggestions:
+            log(f"{s['symbol']:<6} {s['action']:<4} {s['confidence']:>3.0f}%  {s['reasoning']}")
+
+    engine.status.connect(log)
+    engine.markets.connect(on_markets)
+    engine.suggestions.connect(on_suggestions)
+    engine.alerts.connect(on_alerts)
+    engine.valuation.connect(on_valuation)
+
+    if engine.metrics_server is not None:
+        log(f'Metrics at http://127.0.0.1:{engine.metrics_server.port}/metrics')
+
+    if args.proxy:
+        engine.set_proxy(args.proxy)
+    else:
+        engine.load_env_proxy()
+
+    def request_stop(signum, frame):
+        log('Stopping...')
+        stop.set()
+
+    def toggle_profiling(signum, frame):
+        enabled = engine.profiler.toggle()
+        log(f"Profiling {'on' if enabled else 'off'} ({engine.profiler.out_dir})")
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, toggle_profiling)
+    if engine.profiler.enabled:
+        log(f'Profiling into {engine.profiler.out_dir}')
+
+    try:
+        while not stop.is_set():
+            try:
+                run_cycle(engine, args)
+            except Exception as e:
+                log(f'Cycle failed: {e}')
+            if args.once:
+                break
+            stop.wait(args.interval)
+    finally:
+        engine.close()
+    return 0
@@ -0,0 +1,166 @@
+"""On-disk store of every price point fetched from CoinGecko's market_chart"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .config import DAY_MS
+from .series import PriceSeries
+
+
+# How old the newest stored point may get before the tail is re-downloaded
+HISTORY_STALE_AFTER_MS = {
+    'hourly': 10 * 60 * 1000,
+    'daily': 60 * 60 * 1000,
+}
+
+
+class PriceHistoryStore:
+    """SQLite store keeping every market_chart point ever fetched, per coin and interval"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_history (
+                    coin_id TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    price REAL NOT NULL,
+                    market_cap REAL,
+                    volume REAL,
+                    PRIMARY KEY (coin_id, interval, ts)
+                )
+            ''')
+            # Window of time we know the stored series is complete for
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS coverage (
+                    coin_id TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    start_ms INTEGER NOT NULL,
+                    end_ms INTEGER NOT NULL,
+                    PRIMARY KEY (coin_id, interval)
+                )
+            ''')
+
+    def plan_fetch(self, coin_id, interval, days, now_ms=None):
+        """Return how many days have to be downloaded to cover the window (0 = disk is fresh)"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        window_start = now_ms - days * DAY_MS
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT start_ms, end_ms FROM coverage WHERE coin_id = ? AND interval = ?',
+                (coin_id, interval)
+            ).fetchone()
+
+        if row is None:
+            return days
+        start_ms, end_ms = row
+        if start_ms > window_start or end_ms < window_start:
+            # Head of the window is missing or nothing overlaps - fetch it whole
+            return days
+        if now_ms - end_ms < HISTORY_STALE_AFTER_MS.get(interval, DAY_MS):
+            return 0
+        # Only the tail is missing; one extra day of overlap replaces the last partial point
+        return min(days, math.ceil((now_ms - end_ms) / DAY_MS) + 1)
+
+    def merge(self, coin_id, interval, series, fetched_days, now_ms=None):
+        """Merge a PriceSeries covering the last `fetched_days` into the store"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        if not len(series):
+            return 0
+
+        # NaN market caps / volumes are stored as NULL by SQLite
+        rows = zip(
+            (coin_id,) * len(series), (interval,) * len(series), series.timestamps.tolist(),
+            series.prices.tolist(), series.market_caps.tolist(), series.volumes.tolist()
+        )
+        first_ts = int(series.timestamps[0])
+        window_start = now_ms - fetched_days * DAY_MS
+
+        with self._lock, self._conn:
+            # The newest point of a previous response is a live "now" value; drop the
+            # overlapped tail so it is replaced by the properly aligned points
+            self._conn.execute(
+                'DELETE FROM price_history WHERE coin_id = ? AND interval = ? AND ts >= ?',
+                (coin_id, interval, first_ts)
+            )
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO price_history VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+            row = self._conn.execute(
+                'SELECT start_ms, end_ms FROM coverage WHERE coin_id = ? AND interval = ?',
+                (coin_id, interval)
+            ).fetchone()
+            start_ms = window_start
+            if row is not None and row[1] >= window_start:
+                start_ms = min(row[0], window_start)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)',
+                (coin_id, interval, start_ms, now_ms)
+            )
+        return len(series)
+
+    def load(self, coin_id, interval, days, now_ms=None):
+        """Return the PriceSeries stored for the last `days`"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT ts, price, market_cap, volume FROM price_history '
+                'WHERE coin_id = ? AND interval = ? AND ts >= ? ORDER BY ts',
+                (coin_id, interval, now_ms - days * DAY_MS)
+            ).fetchall()
+        if not rows:
+            return PriceSeries.empty()
+        columns = np.array(rows, dtype=np.float64)
+        return PriceSeries(columns[:, 0].astype(np.int64), columns[:, 1], columns[:, 2], columns[:, 3])
+
+    def load_many(self, coin_ids, interval, days, now_ms=None):
+        """Return {coin_id: PriceSeries} for the coins with stored points in the last `days`"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        coin_ids = list(coin_ids)
+        rows = []
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(coin_ids), 500):
+                chunk = coin_ids[start:start + 500]
+                rows += self._conn.execute(
+                    'SELECT coin_id, ts, price, market_cap, volume FROM price_history '
+                    f'WHERE interval = ? AND ts >= ? AND coin_id IN ({",".join("?" * len(chunk))}) '
+                    'ORDER BY coin_id, ts',
+                    [interval, now_ms - days * DAY_MS] + chunk
+                ).fetchall()
+        if not rows:
+            return {}
+
+        ids, *columns = zip(*rows)
+        columns = np.array(columns, dtype=np.float64).T
+        ids = np.array(ids)
+        # Rows are grouped by coin; split the columns at every coin boundary
+        bounds = [0] + (np.flatnonzero(ids[1:] != ids[:-1]) + 1).tolist() + [len(ids)]
+        return {
+            str(ids[a]): PriceSeries(columns[a:b, 0].astype(np.int64), columns[a:b, 1], columns[a:b, 2], columns[a:b, 3])
+            for a, b in zip(bounds, bounds[1:])
+        }
+
+    def coin_ids(self, interval):
+        """Ids of every coin with stored points for the interval"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT DISTINCT coin_id FROM price_history WHERE interval = ? ORDER BY coin_id',
+                (interval,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
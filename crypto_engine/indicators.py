@@ -0,0 +1,176 @@
+"""Technical indicators computed for every coin at once over a (coins, days) price matrix
+
+Rows are coins, columns are UTC days on a grid shared by every coin (oldest
+first). A coin with a shorter history is NaN-padded on the left, and one whose
+history ends earlier on the right; days missing in between carry the last value.
+Indicators stay NaN until enough points exist, and latest_indicators reads each
+coin at its own last day.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .config import DAY_MS
+
+
+# Daily points loaded for analysis: enough to warm up the slowest indicator (SMA 50)
+INDICATOR_DAYS = 90
+# Coins whose missing daily history one analysis downloads (largest first)
+ANALYSIS_FETCH_MAX = 25
+
+
+def price_matrix(series_list, length=None, field='prices', end_ms=None):
+    """Values of each PriceSeries on a shared grid of the `length` days up to end_ms
+
+    Points are placed by their UTC day, the last point of a day winning, so coins
+    line up by date even when their histories have gaps or end on different days.
+    Gaps carry the previous value forward; days after a coin's last point stay NaN.
+    end_ms defaults to the newest point of any series and length to the days from
+    the oldest point to it. field picks the column: 'prices', 'market_caps' or 'volumes'.
+    """
+    known = [series for series in series_list if len(series)]
+    if end_ms is None:
+        end_ms = max((int(series.timestamps[-1]) for series in known), default=0)
+    last_day = end_ms // DAY_MS
+    if length is None:
+        first_day = min((int(series.timestamps[0]) // DAY_MS for series in known), default=last_day + 1)
+        length = last_day - first_day + 1
+    first_day = last_day - length + 1
+
+    matrix = np.full((len(series_list), length), np.nan)
+    for row, series in enumerate(series_list):
+        if not len(series):
+            continue
+        days = series.timestamps // DAY_MS
+        # Timestamps are sorted: keep the last point of each day inside the grid
+        keep = np.append(days[1:] != days[:-1], True) & (days >= first_day) & (days <= last_day)
+        matrix[row, days[keep] - first_day] = getattr(series, field)[keep]
+    return _fill_gaps(matrix)
+
+
+def _fill_gaps(matrix):
+    """Carry each row's last value over NaN gaps, up to the row's last value"""
+    known = ~np.isnan(matrix)
+    columns = np.arange(matrix.shape[1])
+    source = np.maximum.accumulate(np.where(known, columns, 0), axis=1)
+    filled = np.take_along_axis(matrix, source, axis=1)
+    filled[columns > last_columns(matrix)[:, None]] = np.nan
+    return filled
+
+
+def last_columns(matrix):
+    """Column of each row's last non-NaN value (the last column for an all-NaN row)"""
+    if not matrix.shape[1]:
+        return np.zeros(len(matrix), dtype=np.intp)
+    return matrix.shape[1] - 1 - np.argmax(~np.isnan(matrix[:, ::-1]), axis=1)
+
+
+def _valid_counts(values):
+    """Number of non-NaN points seen so far in each row"""
+    return np.cumsum(~np.isnan(values), axis=1)
+
+
+def _smooth(values, alpha):
+    """Exponential smoothing along time, vectorised across coins; NaNs carry the last value"""
+    out = np.empty(values.shape)
+    prev = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        prev = np.where(np.isnan(prev), x, np.where(np.isnan(x), prev, prev + alpha * (x - prev)))
+        out[:, t] = prev
+    return out
+
+
+def sma(values, window):
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        # Any NaN inside a window makes its mean NaN
+        out[:, window - 1:] = sliding_window_view(values, window, axis=1).mean(axis=-1)
+    return out
+
+
+def ema(values, span):
+    out = _smooth(values, 2 / (span + 1))
+    out[_valid_counts(values) < span] = np.nan
+    return out
+
+
+def rsi(values, period=14):
+    """Wilder's relative strength index (0-100)"""
+    change = np.diff(values, axis=1, prepend=np.nan)
+    gains = np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0))
+    losses = np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0))
+    avg_gain = _smooth(gains, 1 / period)
+    avg_loss = _smooth(losses, 1 / period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.where(avg_loss > 0, 100 - 100 / (1 + avg_gain / avg_loss), 100.0)
+    out[np.isnan(avg_gain) | (_valid_counts(change) < period)] = np.nan
+    return out
+
+
+def macd(values, fast=12, slow=26, signal=9):
+    """Return (macd line, signal line, histogram)"""
+    line = ema(values, fast) - ema(values, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(values, window=20, width=2):
+    """Return (lower band, middle band, upper band)"""
+    middle = sma(values, window)
+    std = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        std[:, window - 1:] = sliding_window_view(values, window, axis=1).std(axis=-1)
+    return middle - width * std, middle, middle + width * std
+
+
+def atr(values, period=14):
+    """Average true range from closes only: market_chart has no highs/lows, so the
+    true range is the absolute close-to-close move"""
+    true_range = np.abs(np.diff(values, axis=1, prepend=np.nan))
+    out = _smooth(true_range, 1 / period)
+    out[_valid_counts(true_range) < period] = np.nan
+    return out
+
+
+def latest_indicators(closes):
+    """Value of every indicator at each row's last close (its own last day) of a close-price matrix"""
+    rows = np.arange(len(closes))
+    last = last_columns(closes)
+
+    def at_last(values):
+        return values[rows, last]
+
+    price = at_last(closes)
+    macd_line, macd_signal, macd_hist = macd(closes)
+    lower, middle, upper = (at_last(band) for band in bollinger(closes))
+    band_width = upper - lower
+    average_range = at_last(atr(closes))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'price': price,
+            'sma_20': middle,
+            'sma_50': at_last(sma(closes, 50)),
+            'ema_12': at_last(ema(closes, 12)),
+            'ema_26': at_last(ema(closes, 26)),
+            'rsi': at_last(rsi(closes)),
+            'macd': at_last(macd_line),
+            'macd_signal': at_last(macd_signal),
+            'macd_hist': at_last(macd_hist),
+            'bb_lower': lower,
+            'bb_upper': upper,
+            'bb_percent': np.where(band_width > 0, (price - lower) / band_width, np.nan),
+            'atr': average_range,
+            'atr_pct': average_range / price * 100,
+        }
+
+
+def coin_signals(coin_ids, series_by_coin, length=INDICATOR_DAYS):
+    """Indicators per coin id, for the coins that have stored history"""
+    coin_ids = [coin_id for coin_id in coin_ids if len(series_by_coin.get(coin_id, ()))]
+    if not coin_ids:
+        return {}
+    latest = latest_indicators(price_matrix([series_by_coin[c] for c in coin_ids], length))
+    names = list(latest)
+    columns = np.column_stack([latest[name] for name in names]).tolist()
+    return {coin_id: dict(zip(names, values)) for coin_id, values in zip(coin_ids, columns)}
@@ -0,0 +1,207 @@
+"""Request, task and UI timing histograms with an optional Prometheus-style endpoint
+
+The engine records into one MetricsRegistry (MarketEngine.metrics); the GUI adds
+UI update timings and shows a summary in its Diagnostics tab. With a metrics port
+configured, the registry is also served as Prometheus text on
+http://127.0.0.1:PORT/metrics.
+"""
+
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+UI_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+
+# name: (type, help, buckets)
+METRICS = {
+    'crypto_http_request_seconds': ('histogram', 'HTTP round-trip time per attempt', LATENCY_BUCKETS),
+    'crypto_http_response_bytes': ('histogram', 'HTTP response body size', SIZE_BUCKETS),
+    'crypto_http_responses_total': ('counter', 'HTTP responses by status code ("error" = no response)', None),
+    'crypto_http_retries_total': ('counter', 'Requests retried after a 429 response', None),
+    'crypto_http_rate_limited_total': ('counter', '429 responses received', None),
+    'crypto_http_cache_total': ('counter', 'Cacheable GETs by outcome (hit, revalidated, miss)', None),
+    'crypto_http_coalesced_total': ('counter', 'GETs that joined an identical in-flight request', None),
+    'crypto_rate_limit_wait_seconds': ('histogram', 'Time spent waiting for a rate-limit token', LATENCY_BUCKETS),
+    'crypto_task_queue_wait_seconds': ('histogram', 'Time tasks waited for a free worker', LATENCY_BUCKETS),
+    'crypto_task_seconds': ('histogram', 'Run time of named engine tasks', LATENCY_BUCKETS),
+    'crypto_alert_check_seconds': ('histogram', 'Time spent checking the alerts against a snapshot', UI_BUCKETS),
+    'crypto_alerts_fired_total': ('counter', 'Price alerts fired, by kind', None),
+    'crypto_ui_update_seconds': ('histogram', 'Time spent updating a view on the GUI thread', UI_BUCKETS),
+}
+
+# Variable path segments folded so every coin or pair shares one endpoint label
+ENDPOINT_PATTERNS = [
+    (re.compile(r'/coins/(?!markets$|list$)[^/]+/'), '/coins/{id}/'),
+    (re.compile(r'/exchange-amount/[^/]+/[^/]+$'), '/exchange-amount/{amount}/{pair}'),
+    (re.compile(r'/(min-amount|exchange-range)/[^/]+$'), r'/\1/{pair}'),
+]
+
+
+def endpoint_label(url):
+    """Host and path of url with ids, pairs and amounts replaced by placeholders"""
+    parts = urlsplit(url)
+    path = parts.path
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return f'{parts.hostname}{path}'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = ((k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')) for k, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with approximate quantiles"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Linear interpolation inside the bucket holding the q-th observation,
+        clamped to the observed range"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        estimate = self.max
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / count
+                break
+            seen += count
+        return min(self.max, max(self.min, estimate))
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled histograms and counters"""
+
+    def __init__(self):
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}    # (name, labels) -> float
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observe the duration of the with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def summary(self):
+        """Rows for the diagnostics view: histograms with count/mean/p50/p90/p99, then counters"""
+        with self._lock:
+            histograms = [
+                {'name': name, 'labels': dict(labels), 'count': h.count,
+                 'mean': h.sum / h.count if h.count else None,
+                 'p50': h.quantile(0.5), 'p90': h.quantile(0.9), 'p99': h.quantile(0.99)}
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return histograms, counters
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.count, h.sum, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name, (kind, help_text, _) in METRICS.items():
+            series = sorted(key for key in (histograms if kind == 'histogram' else counters) if key[0] == name)
+            if not series:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key in series:
+                labels = key[1]
+                if kind == 'counter':
+                    lines.append(f'{name}{_format_labels(labels)} {counters[key]:g}')
+                    continue
+                counts, count, total, buckets = histograms[key]
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    bucket_labels = _format_labels(labels + (('le', le),))
+                    lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total:.6g}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Serves a registry on http://HOST:PORT/metrics from a daemon thread (localhost only by default)"""
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        self.server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.registry = registry
+        self.port = self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,458 @@
+"""Shared HTTP plumbing: worker pool, rate limiting and response caching"""
+
+import base64
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from .metrics import MetricsRegistry, endpoint_label
+
+
+# Request priorities: interactive requests are always served before background ones
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Request budget per host as (requests per minute, burst size)
+RATE_LIMITS = {
+    'api.coingecko.com': (25, 5),
+    'api.changenow.io': (60, 10),
+    'api.coinpaprika.com': (10, 3),
+}
+
+
+class RateLimited(requests.RequestException):
+    """Raised when a request could not get a slot in the host's rate-limit budget in time"""
+
+
+class RateLimiter:
+    """Token bucket with priority lanes and Retry-After aware back-off"""
+
+    def __init__(self, per_minute, burst, background_reserve=1):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        # Tokens background requests must leave in the bucket for interactive ones
+        self.background_reserve = min(background_reserve, burst - 1)
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+        self.failures = 0
+        self._updated = time.monotonic()
+        self._waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+        self._cond = threading.Condition()
+
+    def acquire(self, priority=PRIORITY_BACKGROUND, timeout=None):
+        """Wait for a token; returns False if none became available within timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self.blocked_until - now
+                    if wait <= 0:
+                        reserve = 0 if priority == PRIORITY_INTERACTIVE else self.background_reserve
+                        yield_to_interactive = (priority != PRIORITY_INTERACTIVE
+                                                and self._waiting[PRIORITY_INTERACTIVE] > 0)
+                        if not yield_to_interactive and self.tokens >= 1 + reserve:
+                            self.tokens -= 1
+                            return True
+                        wait = max((1 + reserve - self.tokens) / self.rate, 0.05)
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            return False
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def penalize(self, retry_after=None):
+        """Block the host after a 429, honouring Retry-After or backing off exponentially"""
+        with self._cond:
+            self.failures += 1
+            delay = retry_after if retry_after is not None else min(60, 2 ** self.failures)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.tokens = 0.0
+            self._cond.notify_all()
+        return delay
+
+    def succeeded(self):
+        with self._cond:
+            self.failures = 0
+
+    def headroom(self):
+        """Fraction of the burst currently available (0 while blocked)"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return 0.0
+            return self.tokens / self.capacity
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+def parse_retry_after(value):
+    """Return the Retry-After header value in seconds, or None if absent/invalid"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Response cache rules as (URL path fragment, TTL in seconds, keep on disk); first match wins.
+# Paths rather than hosts, so a configured mirror (or the benchmark mock) is cached the same way.
+# Market lists (/coins/markets, /tickers) are not cached: a cached body is held whole, and
+# they are streamed and decoded as they arrive instead.
+CACHE_RULES = [
+    ('/v1/min-amount/', 6 * 60 * 60, True),
+    ('/v1/exchange-range/', 6 * 60 * 60, True),
+    ('/v1/exchange-amount/', 30, False),
+]
+
+
+class ResponseCache:
+    """LRU cache of successful GET responses with an optional on-disk tier"""
+
+    def __init__(self, max_entries=256, disk_dir=None, rules=CACHE_RULES):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.rules = rules
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def rule_for(self, url):
+        """Return (ttl, persist) for url, or None if it is not cacheable"""
+        for fragment, ttl, persist in self.rules:
+            if fragment in url:
+                return ttl, persist
+        return None
+
+    def lookup(self, key):
+        """Return the cached entry for key (fresh or stale), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def store(self, key, response, ttl, persist=False):
+        entry = {
+            'url': response.url,
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'content': response.content,
+            'expires_at': time.time() + ttl,
+            'persist': persist,
+        }
+        self._remember(key, entry)
+        if persist:
+            self._write_disk(key, entry)
+
+    def revalidated(self, key, entry, ttl, response):
+        """Extend an entry after a 304 Not Modified, picking up refreshed validators"""
+        for header in ('ETag', 'Last-Modified', 'Date'):
+            if header in response.headers:
+                entry['headers'][header] = response.headers[header]
+        entry['expires_at'] = time.time() + ttl
+        self._remember(key, entry)
+        if entry.get('persist'):
+            self._write_disk(key, entry)
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry['expires_at'] > time.time()
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Validators to send when revalidating a stale entry"""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    @staticmethod
+    def to_response(entry):
+        """Rebuild a requests.Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.url = entry['url']
+        response.headers.update(entry['headers'])
+        response._content = entry['content']
+        response._content_consumed = True
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha1(repr(key).encode()).hexdigest() + '.json')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                entry = json.load(f)
+            entry['content'] = base64.b64decode(entry['content'])
+            return entry
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        record = dict(entry, content=base64.b64encode(entry['content']).decode('ascii'))
+        path = self._disk_path(key)
+        try:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(record, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Could not write response cache: {e}")
+
+
+class RequestExecutor:
+    """Bounded pool of daemon workers shared by all network work"""
+
+    def __init__(self, session, max_workers=4, cache=None, metrics=None):
+        self.session = session
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.max_workers = max_workers
+        self._queue = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._tasks = {}     # key -> Future of a queued or running task
+        self._requests = {}  # (url, params) -> Future of an in-flight GET
+        self._running = 0
+        self._shutdown = False
+        self.limiters = {host: RateLimiter(*budget) for host, budget in RATE_LIMITS.items()}
+
+    def submit(self, fn, *args, key=None):
+        """Queue fn(*args); a task with the same key that is still pending is shared instead"""
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('executor has been shut down')
+            if key is not None:
+                existing = self._tasks.get(key)
+                if existing is not None:
+                    return existing
+            future = Future()
+            if key is not None:
+                self._tasks[key] = future
+            if len(self._workers) < self.max_workers and self._queue.qsize() >= self._idle_workers():
+                worker = threading.Thread(target=self._work, name=f'crypto-net-{len(self._workers)}', daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+        future.add_done_callback(lambda f: self._task_done(key, f))
+        # Named after the first part of the key, e.g. 'refresh' or 'history'
+        task = (key[0] if isinstance(key, tuple) else key) if key is not None else 'unnamed'
+        self._queue.put((future, fn, args, task, time.perf_counter()))
+        return future
+
+    def map(self, fn, items):
+        """Run fn over items on the pool and return the results in order
+
+        Items still queued when their turn comes are run on the calling thread,
+        so a task can fan out without deadlocking a saturated pool.
+        """
+        futures = [self.submit(fn, item) for item in items]
+        results = []
+        for future, item in zip(futures, items):
+            if future.cancel():
+                results.append(fn(item))
+            else:
+                results.append(future.result())
+        return results
+
+    def get(self, url, params=None, priority=PRIORITY_BACKGROUND, max_retries=2, stream=False, **kwargs):
+        """GET through the shared session; identical in-flight requests share one response
+
+        With stream=True the body of an uncacheable response is left unread for the
+        caller to consume (and close); such requests are not shared. Cacheable
+        responses are always read in full.
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        endpoint = endpoint_label(url)
+        rule = self.cache.rule_for(url) if self.cache is not None else None
+        if stream and rule is None:
+            return self._send(url, params, priority, max_retries, dict(kwargs, stream=True))
+        entry = self.cache.lookup(key) if rule is not None else None
+        if entry is not None and ResponseCache.is_fresh(entry):
+            self.metrics.inc('crypto_http_cache_total', endpoint=endpoint, result='hit')
+            return ResponseCache.to_response(entry)
+
+        with self._lock:
+            future = self._requests.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self._requests[key] = future
+
+        if not owner:
+            self.metrics.inc('crypto_http_coalesced_total', endpoint=endpoint)
+            return future.result()
+
+        try:
+            if entry is not None:
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **ResponseCache.conditional_headers(entry))
+            response = self._send(url, params, priority, max_retries, kwargs)
+            if rule is not None:
+                ttl, persist = rule
+                if response.status_code == 304 and entry is not None:
+                    self.metrics.inc('crypto_http_cache_total', endpoint=endpoint, result='revalidated')
+                    self.cache.revalidated(key, entry, ttl, response)
+                    response = ResponseCache.to_response(entry)
+                else:
+                    self.metrics.inc('crypto_http_cache_total', endpoint=endpoint, result='miss')
+                    if response.status_code == 200:
+                        self.cache.store(key, response, ttl, persist)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                self._requests.pop(key, None)
+
+    def _send(self, url, params, priority, max_retries, kwargs):
+        """Send a GET within the host's rate-limit budget, retrying 429 responses"""
+        host = urlsplit(url).hostname
+        endpoint = endpoint_label(url)
+        limiter = self.limiters.get(host)
+        # Background work gives up sooner so it never piles up behind a throttled host
+        wait_limit = 30 if priority == PRIORITY_INTERACTIVE else 15
+        attempt = 0
+        while True:
+            if limiter is not None:
+                with self.metrics.time('crypto_rate_limit_wait_seconds', host=host):
+                    acquired = limiter.acquire(priority, timeout=wait_limit)
+                if not acquired:
+                    raise RateLimited(f'{host} rate limit reached - please wait')
+
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, **kwargs)
+            except requests.RequestException:
+                self.metrics.inc('crypto_http_responses_total', endpoint=endpoint, status='error')
+                raise
+            self.metrics.observe('crypto_http_request_seconds', time.perf_counter() - started, endpoint=endpoint)
+            # A streamed body is still unread; its size is only known from the headers
+            size = (response.headers.get('Content-Length', '') if kwargs.get('stream')
+                    else str(len(response.content)))
+            if size.isdigit():
+                self.metrics.observe('crypto_http_response_bytes', int(size), endpoint=endpoint)
+            self.metrics.inc('crypto_http_responses_total', endpoint=endpoint, status=str(response.status_code))
+            if response.status_code != 429 or limiter is None:
+                if limiter is not None:
+                    limiter.succeeded()
+                return response
+
+            self.metrics.inc('crypto_http_rate_limited_total', endpoint=endpoint)
+            delay = limiter.penalize(parse_retry_after(response.headers.get('Retry-After')))
+            print(f"Rate limited by {host}, backing off {delay:.0f}s")  # Debug
+            if attempt >= max_retries or delay > wait_limit:
+                return response
+            response.close()
+            attempt += 1
+            self.metrics.inc('crypto_http_retries_total', endpoint=endpoint)
+
+    def queue_depth(self):
+        """Number of tasks waiting for a free worker"""
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': len(self._workers),
+                'running': self._running,
+                'queued': self._queue.qsize(),
+                'in_flight_requests': len(self._requests),
+            }
+
+    def shutdown(self):
+        """Cancel queued tasks and stop the workers once they finish their current task"""
+        with self._lock:
+            self._shutdown = True
+            pending = list(self._tasks.values())
+            workers = len(self._workers)
+        for future in pending:
+            future.cancel()
+        for _ in range(workers):
+            self._queue.put(None)
+
+    def _idle_workers(self):
+        return len(self._workers) - self._running
+
+    def _task_done(self, key, future):
+        if key is not None:
+            with self._lock:
+                if self._tasks.get(key) is future:
+                    del self._tasks[key]
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Unhandled error in background task: {future.exception()}")
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, task, queued_at = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            self.metrics.observe('crypto_task_queue_wait_seconds', started - queued_at, task=task)
+            with self._lock:
+                self._running += 1
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                self.metrics.observe('crypto_task_seconds', time.perf_counter() - started, task=task)
@@ -0,0 +1,349 @@
+"""Holdings entered as lots, valued incrementally against every market snapshot
+
+A lot is a quantity of one coin bought at a unit cost, optionally on a known
+date. Lots are aggregated into one position per coin, kept as arrays (quantity,
+cost basis, last price, value) with the running total beside them. A new
+snapshot only touches the positions whose price moved: the total is adjusted by
+the change in their value rather than re-summed, so revaluing stays a few array
+operations however many lots and coins are held. Adding or removing a lot
+adjusts its position and the total the same way.
+
+Historical value curves are computed from the stored price history in one
+vectorised pass per block of coins: holdings step up at each lot's acquisition
+time and are multiplied by the last stored price at every point of a time grid.
+
+Lots live in SQLite (DATA_DIR/portfolio.db), so they survive restarts.
+"""
+
+import calendar
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .series import PriceSeries
+
+# Chart/history id of the portfolio value curve (never a CoinGecko id)
+PORTFOLIO_ID = '@portfolio'
+# Largest positions whose missing history is downloaded for a value curve; the rest use what is stored
+HISTORY_FETCH_MAX = 25
+# Incremental updates between full re-sums of the total, which cancel floating-point drift
+RESUM_EVERY = 1000
+# Coins valued per block when building a value curve, bounding the (coins, points) matrices
+HISTORY_BLOCK = 256
+
+
+def parse_acquired(text):
+    """Epoch ms of a 'YYYY-MM-DD' date (UTC midnight), or None for an empty one"""
+    text = (text or '').strip()
+    if not text:
+        return None
+    try:
+        return calendar.timegm(time.strptime(text, '%Y-%m-%d')) * 1000
+    except ValueError:
+        raise ValueError(f'Invalid date {text!r} (use YYYY-MM-DD)') from None
+
+
+class Lot:
+    """One purchase; `acquired` is epoch ms, or None when the date is unknown"""
+
+    __slots__ = ('id', 'coin_id', 'quantity', 'unit_cost', 'acquired', 'note')
+
+    def __init__(self, id, coin_id, quantity, unit_cost, acquired=None, note=''):
+        self.id = id
+        self.coin_id = coin_id
+        self.quantity = quantity
+        self.unit_cost = unit_cost
+        self.acquired = acquired
+        self.note = note
+
+    @property
+    def cost(self):
+        return self.quantity * self.unit_cost
+
+
+def validate_lot(coin_id, quantity, unit_cost, acquired=None):
+    """(quantity, unit_cost, acquired) as numbers, or ValueError"""
+    if not coin_id:
+        raise ValueError('Lot needs a coin')
+    try:
+        quantity = float(quantity)
+        unit_cost = float(unit_cost)
+    except (TypeError, ValueError):
+        raise ValueError('Lot quantity and unit cost must be numbers') from None
+    if not math.isfinite(quantity) or quantity <= 0:
+        raise ValueError('Lot quantity must be positive')
+    if not math.isfinite(unit_cost) or unit_cost < 0:
+        raise ValueError('Lot unit cost must not be negative')
+    if acquired is not None:
+        acquired = int(acquired)
+        if acquired > time.time() * 1000:
+            raise ValueError('Lot date is in the future')
+    return quantity, unit_cost, acquired
+
+
+class Portfolio:
+    """Persistent lots with live per-position and total valuation
+
+    Every coin with lots has a slot in the position arrays. update(snapshot)
+    compares the snapshot's prices with the last ones applied and moves the total
+    by quantity x price delta of the positions that changed; coins missing from a
+    snapshot keep their last price. Positions are valued at 0 until their coin has
+    been priced.
+
+    Thread-safe: snapshots may arrive from the refresh workers and the price feeds
+    while lots are added or removed from the GUI thread.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS lots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    coin_id TEXT NOT NULL,
+                    quantity REAL NOT NULL,
+                    unit_cost REAL NOT NULL,
+                    acquired INTEGER,
+                    note TEXT NOT NULL DEFAULT ''
+                )
+            ''')
+
+        self._lots = {}      # id -> Lot
+        # Coins with (or once with) lots, in the order of the position arrays
+        self._coins = []
+        self._position = {}
+        self._quantity = np.empty(0)
+        self._cost = np.empty(0)                    # cost basis
+        self._count = np.empty(0, dtype=np.int64)  # lots per position; 0 once all were removed
+        self._prices = np.empty(0)                  # last price applied, NaN until the coin is priced
+        self._values = np.empty(0)                  # quantity x price, 0 while unpriced
+        self._value = 0.0                           # running total of self._values
+        self._rows = (None, None)                   # (snapshot ids, rows of self._coins in that snapshot)
+        self._snapshot = None                       # last snapshot applied, to price new positions
+        self._since_resum = 0
+        # Bumped whenever positions open or close, so views know when to rebuild their rows
+        self.layout = 0
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, coin_id, quantity, unit_cost, acquired, note FROM lots ORDER BY id'
+            ).fetchall()
+            lots = [Lot(*row) for row in rows]
+            self._lots = {lot.id: lot for lot in lots}
+            if lots:
+                self._apply_lots(lots, 1)
+
+    def __len__(self):
+        return len(self._lots)
+
+    # Position maintenance; callers hold the lock
+
+    def _apply_lots(self, lots, sign):
+        """Add (sign 1) or take out (sign -1) lots from their positions and the total"""
+        new = [coin_id for coin_id in dict.fromkeys(lot.coin_id for lot in lots) if coin_id not in self._position]
+        if new:
+            for coin_id in new:
+                self._position[coin_id] = len(self._coins)
+                self._coins.append(coin_id)
+            prices = (self._snapshot.prices_for(new) if self._snapshot is not None
+                      else np.full(len(new), np.nan))
+            with np.errstate(invalid='ignore'):
+                prices = np.where(prices > 0, prices, np.nan)
+            zeros = np.zeros(len(new))
+            self._quantity = np.concatenate([self._quantity, zeros])
+            self._cost = np.concatenate([self._cost, zeros])
+            self._count = np.concatenate([self._count, np.zeros(len(new), dtype=np.int64)])
+            self._prices = np.concatenate([self._prices, prices])
+            self._values = np.concatenate([self._values, zeros])
+            self._rows = (None, None)
+
+        slots = np.fromiter((self._position[lot.coin_id] for lot in lots), dtype=np.intp, count=len(lots))
+        quantities = np.fromiter((lot.quantity for lot in lots), dtype=np.float64, count=len(lots)) * sign
+        costs = quantities * np.fromiter((lot.unit_cost for lot in lots), dtype=np.float64, count=len(lots))
+        opened = self._count == 0
+        np.add.at(self._quantity, slots, quantities)
+        np.add.at(self._cost, slots, costs)
+        np.add.at(self._count, slots, sign)
+
+        touched = np.unique(slots)
+        # Closed positions drop the rounding residue of their removed lots
+        closed = touched[self._count[touched] == 0]
+        self._quantity[closed] = 0
+        self._cost[closed] = 0
+        values = np.nan_to_num(self._quantity[touched] * self._prices[touched])
+        self._value += float((values - self._values[touched]).sum())
+        self._values[touched] = values
+        if len(closed) or np.any(opened[touched] & (self._count[touched] > 0)):
+            self.layout += 1
+
+    def _prices_in(self, snapshot):
+        """Prices of the position coins in snapshot, NaN where missing or not positive"""
+        ids, rows = self._rows
+        # Refreshes mostly list the coins in the same order as last time
+        if ids is not snapshot.ids and ids != snapshot.ids:
+            rows = snapshot.rows(self._coins)
+        self._rows = (snapshot.ids, rows)
+        prices = snapshot.prices[rows]
+        with np.errstate(invalid='ignore'):
+            return np.where((rows >= 0) & (prices > 0), prices, np.nan)
+
+    # Public API
+
+    def add_lot(self, coin_id, quantity, unit_cost, acquired=None, note=''):
+        """Store a lot and add it to its position; returns it. Raises ValueError for invalid lots."""
+        return self.add_lots([(coin_id, quantity, unit_cost, acquired, note)])[0]
+
+    def add_lots(self, specs):
+        """Store (coin_id, quantity, unit_cost[, acquired[, note]]) lots in one transaction"""
+        rows = []
+        for spec in specs:
+            coin_id, quantity, unit_cost, acquired, note = (tuple(spec) + (None, ''))[:5]
+            quantity, unit_cost, acquired = validate_lot(coin_id, quantity, unit_cost, acquired)
+            rows.append((coin_id, quantity, unit_cost, acquired, note or ''))
+        added = []
+        with self._lock:
+            with self._conn:
+                for row in rows:
+                    cursor = self._conn.execute(
+                        'INSERT INTO lots (coin_id, quantity, unit_cost, acquired, note) VALUES (?, ?, ?, ?, ?)', row
+                    )
+                    added.append(Lot(cursor.lastrowid, *row))
+            if added:
+                self._lots.update((lot.id, lot) for lot in added)
+                self._apply_lots(added, 1)
+        return added
+
+    def remove_lots(self, lot_ids):
+        """Delete lots; returns how many existed"""
+        with self._lock:
+            removed = [self._lots.pop(lot_id) for lot_id in set(lot_ids) if lot_id in self._lots]
+            if not removed:
+                return 0
+            with self._conn:
+                self._conn.executemany('DELETE FROM lots WHERE id = ?', [(lot.id,) for lot in removed])
+            self._apply_lots(removed, -1)
+        return len(removed)
+
+    def lots(self):
+        """Every lot, oldest first"""
+        with self._lock:
+            return sorted(self._lots.values(), key=lambda lot: lot.id)
+
+    def coin_ids(self):
+        """Coins with open positions, largest value first"""
+        with self._lock:
+            open_slots = np.flatnonzero(self._count > 0)
+            order = open_slots[np.argsort(-self._values[open_slots], kind='stable')]
+            return [self._coins[k] for k in order]
+
+    def update(self, snapshot):
+        """Revalue the positions at snapshot's prices; returns True if any value changed"""
+        with self._lock:
+            if not len(snapshot):
+                return False
+            self._snapshot = snapshot
+            if not self._coins:
+                return False
+            prices = self._prices_in(snapshot)
+            # NaN (coin missing from the snapshot) keeps the last price
+            with np.errstate(invalid='ignore'):
+                moved = np.flatnonzero((prices != self._prices) & (prices == prices))
+            if not len(moved):
+                return False
+            self._prices[moved] = prices[moved]
+            values = self._quantity[moved] * prices[moved]
+            self._value += float((values - self._values[moved]).sum())
+            self._values[moved] = values
+            self._since_resum += 1
+            if self._since_resum >= RESUM_EVERY:
+                self._value = float(self._values.sum())
+                self._since_resum = 0
+            return True
+
+    def summary(self):
+        """Totals: value, cost, pnl and pnl_pct (over priced positions), positions, lots, unpriced"""
+        with self._lock:
+            open_slots = self._count > 0
+            priced = open_slots & ~np.isnan(self._prices)
+            priced_cost = float(self._cost[priced].sum())
+            pnl = self._value - priced_cost
+            return {
+                'value': self._value, 'cost': float(self._cost.sum()), 'pnl': pnl,
+                'pnl_pct': pnl / priced_cost * 100 if priced_cost > 0 else 0.0,
+                'positions': int(np.count_nonzero(open_slots)), 'lots': len(self._lots),
+                'unpriced': int(np.count_nonzero(open_slots & ~priced)),
+            }
+
+    def positions(self):
+        """Open positions as parallel arrays: coin_ids, quantity, cost, avg_cost, price, value,
+        pnl, pnl_pct, allocation (% of the total) and lots; plus the current layout"""
+        with self._lock:
+            slots = np.flatnonzero(self._count > 0)
+            quantity, cost, price = self._quantity[slots], self._cost[slots], self._prices[slots]
+            value = self._values[slots]
+            total = self._value
+            layout = self.layout
+            coin_ids = [self._coins[k] for k in slots]
+            lots = self._count[slots]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pnl = np.where(np.isnan(price), np.nan, value - cost)
+            return {
+                'coin_ids': coin_ids, 'quantity': quantity, 'cost': cost, 'avg_cost': cost / quantity,
+                'price': price, 'value': value, 'pnl': pnl,
+                'pnl_pct': np.where(cost > 0, pnl / cost * 100, np.nan),
+                'allocation': value / total * 100 if total > 0 else np.zeros(len(slots)),
+                'lots': lots, 'layout': layout,
+            }
+
+    def value_history(self, history, start_ms, end_ms, step_ms):
+        """Portfolio value every step_ms from start_ms to end_ms as a PriceSeries
+
+        history is {coin_id: PriceSeries} (e.g. PriceHistoryStore.load_many). Each
+        lot counts from its acquisition date (lots without one from the start); each
+        coin is valued at its last stored price at or before every point. The curve
+        starts once every held coin with history has a price; coins without any
+        stored history are left out.
+        """
+        with self._lock:
+            lots = list(self._lots.values())
+        coins = sorted({lot.coin_id for lot in lots if len(history.get(lot.coin_id, ()))})
+        if not coins:
+            return PriceSeries.empty()
+        start_ms = max(start_ms, max(int(history[coin_id].timestamps[0]) for coin_id in coins))
+        grid = np.arange(start_ms, end_ms + 1, step_ms, dtype=np.int64)
+        if not len(grid):
+            return PriceSeries.empty()
+
+        position = {coin_id: k for k, coin_id in enumerate(coins)}
+        lots = sorted((lot for lot in lots if lot.coin_id in position), key=lambda lot: position[lot.coin_id])
+        slots = np.fromiter((position[lot.coin_id] for lot in lots), dtype=np.intp, count=len(lots))
+        quantities = np.fromiter((lot.quantity for lot in lots), dtype=np.float64, count=len(lots))
+        acquired = np.fromiter((-1 if lot.acquired is None else lot.acquired for lot in lots),
+                               dtype=np.int64, count=len(lots))
+        # First grid point at which each lot is held
+        steps = np.searchsorted(grid, acquired)
+
+        total = np.zeros(len(grid))
+        for first in range(0, len(coins), HISTORY_BLOCK):
+            block = coins[first:first + HISTORY_BLOCK]
+            a, b = np.searchsorted(slots, [first, first + len(block)])
+            # Holdings: each lot's quantity from its step on, summed per coin
+            holdings = np.zeros((len(block), len(grid) + 1))
+            np.add.at(holdings, (slots[a:b] - first, steps[a:b]), quantities[a:b])
+            holdings = np.cumsum(holdings[:, :-1], axis=1)
+            prices = np.vstack([history[coin_id].prices_at(grid) for coin_id in block])
+            total += np.nansum(holdings * prices, axis=0)
+        return PriceSeries(grid, total)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,150 @@
+"""Opt-in cProfile and tracemalloc capture of the engine's hot paths
+
+When enabled (CRYPTO_TRACKER_PROFILE=1, --profile, or toggled at runtime), every
+profiled section - refresh, history, exchange, analysis and the GUI view updates -
+writes two files to the profile directory:
+
+- NAME.prof  cProfile stats; inspect with `python -m pstats FILE` or snakeviz
+- NAME.heap  tracemalloc snapshot; load with tracemalloc.Snapshot.load(FILE)
+
+and a one-line summary to profile.log. Only the newest files are kept.
+
+Each section is profiled on the thread that runs it; work it hands to other
+threads (e.g. pages fetched through executor.map) shows up as waiting. Sections
+on different threads may overlap, in which case their memory peaks overlap too.
+On Python 3.12+ only one cProfile can be active at a time, so sections starting
+while another is profiled run unprofiled (counted in `skipped`).
+"""
+
+import cProfile
+import glob
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Profiled sections kept on disk (.prof + .heap each); older ones are deleted
+PROFILE_KEEP = 50
+# Frames of traceback stored per allocation
+PROFILE_TRACE_FRAMES = 10
+# profile.log is rotated to profile.log.1 beyond this size
+PROFILE_LOG_BYTES = 1024 * 1024
+
+
+class Profiler:
+    """Wraps sections of work in cProfile + tracemalloc while enabled"""
+
+    def __init__(self, out_dir, enabled=False, keep=PROFILE_KEEP):
+        self.out_dir = out_dir
+        self.keep = keep
+        self.enabled = False
+        self.captured = 0
+        self.skipped = 0
+        self._sequence = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACE_FRAMES)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        # Sections still running finish without a heap snapshot
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def toggle(self):
+        """Switch profiling on or off; returns the new state"""
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    @contextmanager
+    def profile(self, name):
+        """Profile the with-block as `name` while profiling is enabled"""
+        if not self.enabled or not tracemalloc.is_tracing():
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active (Python 3.12+ allows only one)
+            with self._lock:
+                self.skipped += 1
+            yield
+            return
+        with self._lock:
+            self._active += 1
+            if self._active == 1 and hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._active -= 1
+            self._write(name, profiler, elapsed, before)
+
+    def wrap(self, name, fn):
+        """fn wrapped in profile(name), for handing to the executor"""
+        def profiled(*args):
+            with self.profile(name):
+                return fn(*args)
+        return profiled
+
+    def _write(self, name, profiler, elapsed, before):
+        current, peak = tracemalloc.get_traced_memory()
+        try:
+            snapshot = tracemalloc.take_snapshot()
+        except RuntimeError:
+            # Profiling was switched off while the section ran
+            snapshot = None
+        try:
+            with self._lock:
+                self._sequence += 1
+                base = f"{time.strftime('%Y%m%d-%H%M%S')}-{self._sequence:04d}-{name}"
+            path = os.path.join(self.out_dir, base)
+            profiler.dump_stats(f'{path}.prof')
+            memory = ''
+            if snapshot is not None:
+                snapshot.dump(f'{path}.heap')
+                memory = f', peak +{(peak - before) / 1e6:.2f} MB, net {(current - before) / 1e6:+.2f} MB'
+            self._log(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {name}: {elapsed * 1000:.1f} ms{memory} -> {base}")
+            self._rotate()
+            with self._lock:
+                self.captured += 1
+        except OSError as e:
+            print(f"Could not write profile for {name}: {e}")  # Debug
+
+    def _log(self, line):
+        log_path = os.path.join(self.out_dir, 'profile.log')
+        if os.path.exists(log_path) and os.path.getsize(log_path) > PROFILE_LOG_BYTES:
+            os.replace(log_path, f'{log_path}.1')
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+    def _rotate(self):
+        # File names start with the time and a sequence number, so they sort by age
+        profiles = sorted(glob.glob(os.path.join(self.out_dir, '*.prof')))
+        for old in profiles[:-self.keep] if self.keep else profiles:
+            for path in (old, old[:-len('.prof')] + '.heap'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        return {'enabled': self.enabled, 'captured': self.captured, 'skipped': self.skipped,
+                'directory': self.out_dir}
@@ -0,0 +1,302 @@
+"""Market data providers with hedged requests and failover
+
+Every provider returns data in the engine's shapes: a MarketSnapshot keyed by
+CoinGecko ids for markets, and PriceSeries for history.
+
+ProviderPool sends each call to the fastest healthy provider and, if it has not
+answered within its usual (90th percentile) latency, hedges with the next one;
+whichever answers first wins. Failing providers are skipped for a cooling-off period.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+
+from .config import COINGECKO_API, COINPAPRIKA_API, markets_pages
+from .decoding import iter_array, read_market_chart
+from .network import PRIORITY_BACKGROUND
+from .snapshot import MarketSnapshot
+
+
+class ProviderError(requests.RequestException):
+    """A provider answered without usable data"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MarketProvider(ABC):
+    """Base class; providers implement fetch_markets and, optionally, fetch_history"""
+
+    name = 'provider'
+    supports_history = False
+
+    def __init__(self, executor, base_url=None):
+        self.executor = executor
+        self.base_url = (base_url or self.default_url).rstrip('/')
+
+    @property
+    def label(self):
+        """Name, plus the host when it is not the provider's default endpoint"""
+        if self.base_url == self.default_url.rstrip('/'):
+            return self.name
+        return f"{self.name} ({self.base_url.split('/')[2]})"
+
+    @abstractmethod
+    def fetch_markets(self, universe, priority, known_coins=()):
+        """Return (snapshot, errors) for a parsed universe; raise ProviderError if empty"""
+
+    def fetch_history(self, coin_id, days, interval, priority):
+        """Return the PriceSeries of the last `days` at `interval`"""
+        raise ProviderError(f'{self.name} has no price history')
+
+    def _get(self, path, params=None, priority=PRIORITY_BACKGROUND, timeout=15, stream=False):
+        response = self.executor.get(f'{self.base_url}{path}', params=params, priority=priority, timeout=timeout,
+                                     stream=stream)
+        if response.status_code != 200:
+            response.close()
+        if response.status_code == 429:
+            raise ProviderError(f'Rate limited by {self.name}', 429)
+        if response.status_code != 200:
+            raise ProviderError(f'{self.name}: HTTP {response.status_code}', response.status_code)
+        return response
+
+
+class CoinGeckoProvider(MarketProvider):
+    """CoinGecko's public API (or any compatible mirror given as base_url)"""
+
+    name = 'coingecko'
+    default_url = COINGECKO_API
+    supports_history = True
+
+    def fetch_markets(self, universe, priority, known_coins=()):
+        pages = markets_pages(universe)
+
+        def fetch_page(page_params):
+            params = {
+                'vs_currency': 'usd',
+                'order': 'market_cap_desc',
+                'sparkline': False,
+                'price_change_percentage': '24h'
+            }
+            params.update(page_params)
+            try:
+                # Only the used fields are kept, decoded coin by coin as the page arrives
+                with self._get('/coins/markets', params, priority, stream=True) as response:
+                    return self.market_rows(iter_array(response)), None
+            except requests.RequestException as e:
+                return None, str(e)
+
+        # Pages are fetched concurrently on the shared pool and merged in order
+        rows = []
+        errors = []
+        for page_rows, error in self.executor.map(fetch_page, pages):
+            if error:
+                errors.append(error)
+                continue
+            rows += page_rows
+        snapshot = MarketSnapshot.from_rows(rows, limit=universe[2])
+
+        if not len(snapshot):
+            raise ProviderError(errors[0] if errors else 'No market data available')
+        if errors:
+            errors = [f'{len(pages) - len(errors)}/{len(pages)} pages - {errors[0]}']
+        return snapshot, errors
+
+    @staticmethod
+    def market_rows(coins):
+        """(id, symbol, name, price, change, market cap, volume, last updated) of /coins/markets entries"""
+        return [
+            (coin['id'], coin['symbol'], coin['name'], coin['current_price'], coin['price_change_percentage_24h'],
+             coin['market_cap'], coin['total_volume'], coin['last_updated'])
+            for coin in coins
+        ]
+
+    def fetch_history(self, coin_id, days, interval, priority):
+        params = {'vs_currency': 'usd', 'days': days, 'interval': interval}
+        with self._get(f'/coins/{coin_id}/market_chart', params, priority, stream=True) as response:
+            return read_market_chart(response)
+
+
+class CoinPaprikaProvider(MarketProvider):
+    """CoinPaprika's free /tickers endpoint (markets only; no category filter)
+
+    CoinPaprika ids look like 'btc-bitcoin'. They are mapped to CoinGecko ids by
+    symbol through the coins the engine already knows, falling back to the id
+    without its symbol prefix, which matches CoinGecko for most large coins.
+    """
+
+    name = 'coinpaprika'
+    default_url = COINPAPRIKA_API
+
+    def fetch_markets(self, universe, priority, known_coins=()):
+        kind, value, limit = universe
+        if kind == 'category':
+            raise ProviderError(f'{self.name} cannot filter by category')
+
+        with self._get('/tickers', {'quotes': 'USD'}, priority, timeout=20, stream=True) as response:
+            tickers = [self._ticker_row(ticker) for ticker in iter_array(response)]
+        tickers.sort(key=lambda t: t[0])
+        by_symbol = {}
+        for coin_id, symbol, name in known_coins:
+            by_symbol.setdefault(symbol.upper(), coin_id)
+        wanted = set(value) if kind == 'ids' else None
+
+        rows = {}
+        for _, paprika_id, symbol, name, price, change, market_cap, volume, last_updated in tickers:
+            symbol = symbol.upper()
+            coin_id = by_symbol.get(symbol) or paprika_id.split('-', 1)[-1]
+            if coin_id in rows or (wanted is not None and coin_id not in wanted):
+                continue
+            rows[coin_id] = (coin_id, symbol, name, price, change, market_cap, volume, last_updated)
+            if len(rows) >= limit:
+                break
+
+        if wanted is not None:
+            # Keep the requested order, as CoinGecko does
+            rows = {coin_id: rows[coin_id] for coin_id in value if coin_id in rows}
+        if not rows:
+            raise ProviderError(f'{self.name}: no matching coins')
+        return MarketSnapshot.from_rows(rows.values()), []
+
+    @staticmethod
+    def _ticker_row(ticker):
+        """(rank, id, symbol, name, price, change, market cap, volume, last updated) of a ticker"""
+        quote = ticker.get('quotes', {}).get('USD', {})
+        return (ticker.get('rank') or float('inf'), ticker['id'], ticker['symbol'], ticker['name'],
+                quote.get('price'), quote.get('percent_change_24h'), quote.get('market_cap'),
+                quote.get('volume_24h'), ticker.get('last_updated'))
+
+
+PROVIDER_TYPES = {cls.name: cls for cls in (CoinGeckoProvider, CoinPaprikaProvider)}
+
+
+def build_providers(spec, executor):
+    """Providers from a spec like 'coingecko,coinpaprika' or 'coingecko=https://mirror/api/v3,coingecko'"""
+    providers = []
+    for item in (spec or 'coingecko').split(','):
+        name, _, url = item.strip().partition('=')
+        if name not in PROVIDER_TYPES:
+            raise ValueError(f'Unknown market data provider: {name}')
+        providers.append(PROVIDER_TYPES[name](executor, url or None))
+    return providers
+
+
+class ProviderPool:
+    """Hedged, failover calls across providers ordered by observed latency"""
+
+    # Latency samples kept per provider, and how many are needed to trust them
+    SAMPLES = 50
+    MIN_SAMPLES = 5
+
+    def __init__(self, providers, hedge_percentile=90, default_hedge_delay=2.0, min_hedge_delay=0.25,
+                 max_cooldown=300):
+        self.providers = list(providers)
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_cooldown = max_cooldown
+        self.latencies = {id(p): deque(maxlen=self.SAMPLES) for p in self.providers}
+        self.failures = {id(p): 0 for p in self.providers}
+        self.cooldown_until = {id(p): 0.0 for p in self.providers}
+        self.wins = {id(p): 0 for p in self.providers}
+        self.hedged = 0
+        self._lock = threading.Lock()
+        # Attempts run on their own threads so hedging never waits on the request pool
+        self._attempts = ThreadPoolExecutor(max_workers=2 * max(1, len(self.providers)),
+                                            thread_name_prefix='provider')
+
+    def ranked(self, history=False):
+        """Providers to try in order: healthy before cooling-off, then fastest median first
+
+        Providers not measured yet come after the measured ones, in configured order.
+        """
+        now = time.monotonic()
+        candidates = [p for p in self.providers if p.supports_history or not history]
+        with self._lock:
+            def sort_key(provider):
+                samples = self.latencies[id(provider)]
+                median = float(np.median(samples)) if samples else float('inf')
+                return self.cooldown_until[id(provider)] > now, median
+            return sorted(candidates, key=sort_key)
+
+    def hedge_delay(self, provider):
+        with self._lock:
+            samples = list(self.latencies[id(provider)])
+        if len(samples) < self.MIN_SAMPLES:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, float(np.percentile(samples, self.hedge_percentile)))
+
+    def _attempt(self, provider, method, args):
+        started = time.monotonic()
+        try:
+            result = getattr(provider, method)(*args)
+        except Exception:
+            with self._lock:
+                self.failures[id(provider)] += 1
+                backoff = min(self.max_cooldown, 5 * 2 ** (self.failures[id(provider)] - 1))
+                self.cooldown_until[id(provider)] = time.monotonic() + backoff
+            raise
+        with self._lock:
+            self.latencies[id(provider)].append(time.monotonic() - started)
+            self.failures[id(provider)] = 0
+            self.cooldown_until[id(provider)] = 0.0
+        return result
+
+    def call(self, method, *args, history=False):
+        """Return (result, provider) from the first provider to answer successfully"""
+        candidates = self.ranked(history)
+        if not candidates:
+            raise ProviderError('No market data provider configured')
+        if len(candidates) == 1:
+            return self._attempt(candidates[0], method, args), candidates[0]
+
+        pending = {}
+        last_error = None
+        while candidates or pending:
+            if candidates:
+                provider = candidates.pop(0)
+                if pending:
+                    with self._lock:
+                        self.hedged += 1
+                pending[self._attempts.submit(self._attempt, provider, method, args)] = provider
+                # Hedge once this provider is slower than it usually is
+                timeout = self.hedge_delay(provider)
+            else:
+                timeout = None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                with self._lock:
+                    self.wins[id(provider)] += 1
+                return result, provider
+        raise last_error
+
+    def stats(self):
+        """Per-provider latency percentiles, wins and health"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'hedged': self.hedged,
+                'providers': [{
+                    'name': p.label,
+                    'p50_ms': float(np.percentile(self.latencies[id(p)], 50)) * 1000 if self.latencies[id(p)] else None,
+                    'p90_ms': float(np.percentile(self.latencies[id(p)], 90)) * 1000 if self.latencies[id(p)] else None,
+                    'wins': self.wins[id(p)],
+                    'cooling_off': self.cooldown_until[id(p)] > now,
+                } for p in self.providers],
+            }
+
+    def shutdown(self):
+        self._attempts.shutdown(wait=False)
@@ -0,0 +1,100 @@
+"""All-pairs ChangeNOW rate matrix and multi-hop route finding"""
+
+import math
+import threading
+import time
+
+import numpy as np
+
+
+# Quotes older than this are refreshed by the next sweep
+RATE_MAX_AGE = 15 * 60
+# Rates are quoted for this many USD worth of the source coin, so every pair is
+# compared at the same trade size and stays above ChangeNOW's minimum amounts
+QUOTE_NOTIONAL_USD = 1000
+# Pairs quoted per sweep; the rest wait for the next one
+RATE_SWEEP_PAIRS = 40
+# Hubs a route is most likely to pass through, refreshed before the other pairs
+ROUTE_HUBS = ('usdt', 'btc', 'eth')
+
+
+class RateMatrix:
+    """Latest estimated rate for every from→to ticker pair (NaN = not quoted yet)"""
+
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        self.index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        n = len(self.tickers)
+        self.rates = np.full((n, n), np.nan)
+        self.quoted_at = np.full((n, n), -np.inf)
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def update(self, from_ticker, to_ticker, rate, now=None):
+        i, j = self.index[from_ticker], self.index[to_ticker]
+        with self._lock:
+            self.rates[i, j] = rate if rate and rate > 0 else np.nan
+            self.quoted_at[i, j] = now if now is not None else time.time()
+            self.version += 1
+
+    def rate(self, from_ticker, to_ticker):
+        return float(self.rates[self.index[from_ticker], self.index[to_ticker]])
+
+    def stale_pairs(self, max_age=RATE_MAX_AGE, now=None, focus=()):
+        """Pairs quoted longer than max_age ago, pairs touching `focus` or a hub first"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            stale = (now - self.quoted_at) > max_age
+        np.fill_diagonal(stale, False)
+        pairs = [(self.tickers[i], self.tickers[j]) for i, j in zip(*np.nonzero(stale))]
+        preferred = set(focus) | set(ROUTE_HUBS)
+        pairs.sort(key=lambda pair: (pair[0] not in focus and pair[1] not in focus,
+                                     pair[0] not in preferred and pair[1] not in preferred))
+        return pairs
+
+    def coverage(self):
+        """Fraction of the off-diagonal pairs with a known rate"""
+        n = len(self.tickers)
+        return float(np.count_nonzero(~np.isnan(self.rates))) / (n * (n - 1)) if n > 1 else 0.0
+
+    def best_route(self, from_ticker, to_ticker, max_hops=3):
+        """Highest-rate route with at most max_hops conversions
+
+        Searches every simple route (no ticker twice) over -log(rate) edge weights,
+        one hop at a time across all partial routes at once. Unlike shortest-path
+        relaxation this stays exact when stale quotes form a profitable cycle; with
+        ~20 tickers and 3 hops it is a few thousand partial routes. Returns (tickers
+        along the route, overall rate), or (None, nan) if no route is known.
+        """
+        source, target = self.index[from_ticker], self.index[to_ticker]
+        if source == target:
+            return None, math.nan
+        with self._lock:
+            rates = self.rates.copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = np.where(rates > 0, -np.log(rates), np.inf)
+        np.fill_diagonal(weights, np.inf)
+
+        paths = np.array([[source]], dtype=np.intp)
+        path_weights = np.zeros(1)
+        best, best_weight = None, np.inf
+        for _ in range(max_hops):
+            # extended[p, v]: route p followed by a hop to v; tickers already on it are excluded
+            extended = path_weights[:, None] + weights[paths[:, -1]]
+            extended[np.arange(len(paths))[:, None], paths] = np.inf
+            finish = int(np.argmin(extended[:, target]))
+            # Strictly better only, so the route with fewer hops wins a tie
+            if extended[finish, target] < best_weight:
+                best_weight = extended[finish, target]
+                best = paths[finish].tolist() + [target]
+            extended[:, target] = np.inf
+            rows, columns = np.nonzero(np.isfinite(extended))
+            if not len(rows):
+                break
+            paths = np.column_stack((paths[rows], columns))
+            path_weights = extended[rows, columns]
+
+        if best is None:
+            return None, math.nan
+        route_rate = float(math.prod(rates[a, b] for a, b in zip(best, best[1:])))
+        return [self.tickers[i] for i in best], route_rate
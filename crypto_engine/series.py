@@ -0,0 +1,104 @@
+"""Compact columnar representation of a coin's price history"""
+
+import time
+
+import numpy as np
+
+from .config import DAY_MS
+
+HOUR_MS = DAY_MS // 24
+
+
+class PriceSeries:
+    """Price history as contiguous arrays: int64 epoch-ms timestamps and float64 price/market cap/volume"""
+
+    __slots__ = ('timestamps', 'prices', 'market_caps', 'volumes')
+
+    def __init__(self, timestamps, prices, market_caps=None, volumes=None):
+        self.timestamps = np.ascontiguousarray(timestamps, dtype=np.int64)
+        self.prices = np.ascontiguousarray(prices, dtype=np.float64)
+        n = len(self.timestamps)
+        self.market_caps = (np.ascontiguousarray(market_caps, dtype=np.float64)
+                            if market_caps is not None else np.full(n, np.nan))
+        self.volumes = (np.ascontiguousarray(volumes, dtype=np.float64)
+                        if volumes is not None else np.full(n, np.nan))
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=np.int64), np.empty(0))
+
+    @classmethod
+    def from_market_chart(cls, data):
+        """Build from a market_chart response without creating per-point Python objects"""
+        return cls.from_pairs(cls._pairs(data.get('prices')), cls._pairs(data.get('market_caps')),
+                              cls._pairs(data.get('total_volumes')))
+
+    @classmethod
+    def from_pairs(cls, prices, market_caps=None, volumes=None):
+        """Build from (n, 2) float arrays of [timestamp, value] pairs; caps and volumes are optional"""
+        if prices is None or not len(prices):
+            return cls.empty()
+        # Drop points CoinGecko returned without a price
+        prices = prices[~np.isnan(prices[:, 1])]
+        timestamps = prices[:, 0].astype(np.int64)
+        return cls(
+            timestamps, prices[:, 1],
+            cls._align(timestamps, market_caps if market_caps is not None else np.empty((0, 2))),
+            cls._align(timestamps, volumes if volumes is not None else np.empty((0, 2)))
+        )
+
+    @staticmethod
+    def _pairs(values):
+        if not values:
+            return np.empty((0, 2))
+        # null entries become NaN
+        return np.array(values, dtype=np.float64).reshape(-1, 2)
+
+    @staticmethod
+    def _align(timestamps, pairs):
+        """Values of [ts, value] pairs at the given timestamps, NaN where missing"""
+        if len(pairs) == len(timestamps) and np.array_equal(pairs[:, 0].astype(np.int64), timestamps):
+            return pairs[:, 1]
+        out = np.full(len(timestamps), np.nan)
+        if not len(pairs):
+            return out
+        pair_ts = pairs[:, 0].astype(np.int64)
+        order = np.argsort(pair_ts)
+        pair_ts = pair_ts[order]
+        pos = np.clip(np.searchsorted(pair_ts, timestamps), 0, len(pair_ts) - 1)
+        found = pair_ts[pos] == timestamps
+        out[found] = pairs[order][pos[found], 1]
+        return out
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def since(self, start_ms):
+        """View of the points at or after start_ms"""
+        start = np.searchsorted(self.timestamps, start_ms)
+        return PriceSeries(self.timestamps[start:], self.prices[start:],
+                           self.market_caps[start:], self.volumes[start:])
+
+    def prices_at(self, timestamps):
+        """Last price at or before each of timestamps (sorted epoch ms), NaN before the first point"""
+        i = np.searchsorted(self.timestamps, timestamps, side='right') - 1
+        out = np.full(len(i), np.nan)
+        known = i >= 0
+        out[known] = self.prices[i[known]]
+        return out
+
+    def date_numbers(self):
+        """Timestamps as matplotlib date numbers of the local time, as datetime.fromtimestamp gives it
+
+        The UTC offset is looked up once per hour of the series, so DST changes are followed.
+        """
+        if not len(self.timestamps):
+            return np.empty(0)
+        hours, inverse = np.unique(self.timestamps // HOUR_MS, return_inverse=True)
+        offsets = np.fromiter((time.localtime(hour * HOUR_MS // 1000).tm_gmtoff for hour in hours.tolist()),
+                              dtype=np.int64, count=len(hours))
+        return (self.timestamps + offsets[inverse] * 1000) / DAY_MS
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.prices.nbytes + self.market_caps.nbytes + self.volumes.nbytes
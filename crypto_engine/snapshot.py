@@ -0,0 +1,155 @@
+"""Immutable, versioned market snapshot stored as columns"""
+
+import itertools
+
+import numpy as np
+
+# Versions increase with every snapshot built, so a newer snapshot always compares higher
+_versions = itertools.count(1)
+
+
+class MarketSnapshot:
+    """Market data of every tracked coin at one point in time
+
+    One entry per coin in provider order: an id -> row index map, tuples of ids,
+    symbols, names and last-updated timestamps, and read-only float64 columns for
+    price, 24h change (%), market cap and volume (0 where the provider had none).
+    Snapshots are never modified; updates produce a new snapshot with a higher
+    version that shares every column it did not change, so consumers can keep and
+    read them from any thread without copying. The empty snapshot is version 0.
+    """
+
+    __slots__ = ('version', 'ids', 'symbols', 'names', 'last_updated', 'index',
+                 'prices', 'changes', 'market_caps', 'volumes')
+
+    # Numeric columns, in the order rows list them after id, symbol and name
+    COLUMNS = ('prices', 'changes', 'market_caps', 'volumes')
+
+    def __init__(self, ids, symbols, names, prices, changes, market_caps, volumes, last_updated,
+                 version=None, index=None):
+        self.version = next(_versions) if version is None else version
+        self.ids = tuple(ids)
+        self.symbols = tuple(symbols)
+        self.names = tuple(names)
+        self.last_updated = tuple(last_updated)
+        self.index = index if index is not None else {coin_id: i for i, coin_id in enumerate(self.ids)}
+        # Arrays passed in are taken over (not copied) and made read-only
+        for name, values in zip(self.COLUMNS, (prices, changes, market_caps, volumes)):
+            column = np.asarray(values, dtype=np.float64)
+            column.flags.writeable = False
+            setattr(self, name, column)
+
+    @classmethod
+    def empty(cls):
+        return cls((), (), (), (), (), (), (), (), version=0)
+
+    @classmethod
+    def from_rows(cls, rows, limit=None):
+        """Build from (id, symbol, name, price, change, market cap, volume, last updated) rows
+
+        A coin listed twice keeps its first position and its last values; missing
+        numbers become 0. Rows beyond the first `limit` coins are ignored.
+        """
+        positions = {}
+        unique = []
+        for row in rows:
+            position = positions.get(row[0])
+            if position is not None:
+                unique[position] = row
+            elif limit is None or len(unique) < limit:
+                positions[row[0]] = len(unique)
+                unique.append(row)
+        count = len(unique)
+        if not count:
+            return cls((), (), (), (), (), (), (), ())
+        ids, symbols, names, prices, changes, market_caps, volumes, last_updated = zip(*unique)
+        numbers = [np.fromiter((value or 0 for value in column), dtype=np.float64, count=count)
+                   for column in (prices, changes, market_caps, volumes)]
+        return cls(ids, (symbol.upper() for symbol in symbols), names, *numbers, last_updated, index=positions)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, coin_id):
+        return coin_id in self.index
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def price(self, coin_id, default=None):
+        """Current price of coin_id as a float, or default if it is not in the snapshot"""
+        i = self.index.get(coin_id)
+        return default if i is None else float(self.prices[i])
+
+    def rows(self, coin_ids):
+        """Row index of each of coin_ids as an intp array, -1 for coins not in the snapshot"""
+        index = self.index
+        return np.fromiter((index.get(coin_id, -1) for coin_id in coin_ids), dtype=np.intp, count=len(coin_ids))
+
+    def column_for(self, name, coin_ids):
+        """Values of a numeric column for coin_ids as a float64 array, NaN for coins not in the snapshot"""
+        column = getattr(self, name)
+        if coin_ids is self.ids or coin_ids == self.ids:
+            return column
+        rows = self.rows(coin_ids)
+        out = np.full(len(rows), np.nan)
+        known = rows >= 0
+        out[known] = column[rows[known]]
+        return out
+
+    def prices_for(self, coin_ids):
+        """Prices of coin_ids as a float64 array, NaN for coins not in the snapshot"""
+        return self.column_for('prices', coin_ids)
+
+    def coins(self):
+        """(id, symbol, name) of every coin, in order"""
+        return list(zip(self.ids, self.symbols, self.names))
+
+    def replace(self, **columns):
+        """A new version with the given numeric columns replaced and the others shared"""
+        unknown = set(columns) - set(self.COLUMNS)
+        if unknown:
+            raise TypeError(f"Unknown snapshot columns: {', '.join(sorted(unknown))}")
+        values = [columns.get(name, getattr(self, name)) for name in self.COLUMNS]
+        return MarketSnapshot(self.ids, self.symbols, self.names, *values, self.last_updated, index=self.index)
+
+    def with_prices(self, prices):
+        """Apply {coin_id: price} updates; returns (snapshot, number of prices that changed)
+
+        The snapshot itself is returned when nothing changed.
+        """
+        rows, values = [], []
+        for coin_id, price in prices.items():
+            i = self.index.get(coin_id)
+            if i is not None:
+                rows.append(i)
+                values.append(price)
+        if not rows:
+            return self, 0
+        rows = np.array(rows, dtype=np.intp)
+        values = np.array(values, dtype=np.float64)
+        moved = self.prices[rows] != values
+        changed = int(np.count_nonzero(moved))
+        if not changed:
+            return self, 0
+        updated = self.prices.copy()
+        updated[rows[moved]] = values[moved]
+        return self.replace(prices=updated), changed
+
+    def to_dict(self):
+        """{coin_id: {'symbol', 'name', 'current_price', 'price_change_24h', 'market_cap',
+        'total_volume', 'last_updated'}}, e.g. for JSON output"""
+        return {
+            coin_id: {
+                'symbol': symbol, 'name': name, 'current_price': price, 'price_change_24h': change,
+                'market_cap': market_cap, 'total_volume': volume, 'last_updated': last_updated,
+            }
+            for coin_id, symbol, name, price, change, market_cap, volume, last_updated in zip(
+                self.ids, self.symbols, self.names, self.prices.tolist(), self.changes.tolist(),
+                self.market_caps.tolist(), self.volumes.tolist(), self.last_updated
+            )
+        }
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
@@ -0,0 +1,150 @@
+"""Minimal RFC 6455 WebSocket client (text messages only) for streaming price feeds"""
+
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+from urllib.parse import urlsplit
+
+_ACCEPT_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class WebSocketError(Exception):
+    pass
+
+
+class WebSocket:
+    """Blocking client connection; recv() returns text messages, None once closed"""
+
+    def __init__(self, url, timeout=10):
+        parts = urlsplit(url)
+        if parts.scheme not in ('ws', 'wss'):
+            raise WebSocketError(f'Not a WebSocket URL: {url}')
+        host = parts.hostname
+        port = parts.port or (443 if parts.scheme == 'wss' else 80)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+        sock = socket.create_connection((host, port), timeout=timeout)
+        if parts.scheme == 'wss':
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        self.sock = sock
+        self._buffer = b''
+        self._message = b''
+        self.closed = False
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall((
+            f'GET {path} HTTP/1.1\r\n'
+            f'Host: {host}:{port}\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\n'
+            'Sec-WebSocket-Version: 13\r\n\r\n'
+        ).encode())
+
+        status, headers = self._read_handshake()
+        if not status.startswith('HTTP/1.1 101'):
+            self.sock.close()
+            raise WebSocketError(f'Handshake refused: {status}')
+        expected = base64.b64encode(hashlib.sha1((key + _ACCEPT_GUID).encode()).digest()).decode()
+        if headers.get('sec-websocket-accept') != expected:
+            self.sock.close()
+            raise WebSocketError('Handshake failed: bad Sec-WebSocket-Accept')
+
+    def _read_handshake(self):
+        while b'\r\n\r\n' not in self._buffer:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise WebSocketError('Connection closed during handshake')
+            self._buffer += chunk
+        head, self._buffer = self._buffer.split(b'\r\n\r\n', 1)
+        lines = head.decode('latin-1').split('\r\n')
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return lines[0], headers
+
+    def _fill(self, n):
+        """Buffer at least n bytes; a socket timeout leaves the buffer intact"""
+        while len(self._buffer) < n:
+            chunk = self.sock.recv(max(4096, n - len(self._buffer)))
+            if not chunk:
+                raise WebSocketError('Connection closed')
+            self._buffer += chunk
+
+    def _recv_frame(self):
+        # Frames are only consumed once complete, so recv() can be retried after a timeout
+        self._fill(2)
+        first, second = self._buffer[0], self._buffer[1]
+        fin, opcode = first & 0x80, first & 0x0F
+        length, offset = second & 0x7F, 2
+        if length == 126:
+            self._fill(4)
+            length, = struct.unpack('!H', self._buffer[2:4])
+            offset = 4
+        elif length == 127:
+            self._fill(10)
+            length, = struct.unpack('!Q', self._buffer[2:10])
+            offset = 10
+        mask = None
+        if second & 0x80:
+            self._fill(offset + 4)
+            mask = self._buffer[offset:offset + 4]
+            offset += 4
+        self._fill(offset + length)
+        payload = self._buffer[offset:offset + length]
+        self._buffer = self._buffer[offset + length:]
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return fin, opcode, payload
+
+    def _send_frame(self, opcode, payload):
+        # Client frames are always masked
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack('!H', length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack('!Q', length)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.sock.sendall(header + mask + masked)
+
+    def recv(self):
+        """Next text message, answering pings on the way; None once the server closes
+
+        With a socket timeout set, socket.timeout may be raised; calling recv() again
+        resumes where it stopped.
+        """
+        while True:
+            fin, opcode, payload = self._recv_frame()
+            if opcode == OP_PING:
+                self._send_frame(OP_PONG, payload)
+            elif opcode == OP_CLOSE:
+                self.close()
+                return None
+            elif opcode in (OP_TEXT, OP_BINARY, OP_CONTINUATION):
+                self._message += payload
+                if fin:
+                    message, self._message = self._message, b''
+                    return message.decode('utf-8')
+
+    def send(self, text):
+        self._send_frame(OP_TEXT, text.encode('utf-8'))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._send_frame(OP_CLOSE, b'')
+        except OSError:
+            pass
+        self.sock.close()
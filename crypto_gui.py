@@ -1,43 +1,438 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import sys
-import requests
-import threading
-import os
 import datetime
-import json
-import time
+import functools
+
+import numpy as np
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QHBoxLayout, QLineEdit, 
     QPushButton, QListWidget, QMessageBox, QComboBox, QSizePolicy, QSpacerItem,
-    QTableWidget, QTableWidgetItem, QTabWidget, QGridLayout
+    QTableWidget, QTableWidgetItem, QTabWidget, QGridLayout, QTableView, QCheckBox, QSystemTrayIcon,
+    QStyle, QAbstractItemView
 )
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QAbstractTableModel, QModelIndex
 from PyQt5.QtGui import QFont, QColor, QPalette
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-plt.style.use('dark_background')
+
+from crypto_engine import MarketEngine, PRIORITY_INTERACTIVE
+from crypto_engine.alerts import parse_window
+from crypto_engine.config import PROFILE
+from crypto_engine.portfolio import PORTFOLIO_ID, parse_acquired
+
+# Time from process start until the price table is populated that we aim to stay under
+STARTUP_TARGET_MS = 1500
+AUTO_ANALYSIS_INTERVAL = 15
+# How often the Diagnostics tab re-reads the metrics while it is open (ms)
+DIAGNOSTICS_REFRESH_MS = 2000
+# Fired alerts listed in the Alerts tab; desktop notifications shown per batch
+ALERT_LOG_SIZE = 200
+ALERT_NOTIFY_MAX = 3
+
+
+def timed_view(view):
+    """Record a slot's run time on the GUI thread as crypto_ui_update_seconds{view=...}
+
+    The slot is also profiled as 'ui-VIEW' while profiling is on.
+    """
+    def decorate(slot):
+        @functools.wraps(slot)
+        def wrapper(self, *args):
+            with self.engine.metrics.time('crypto_ui_update_seconds', view=view), \
+                    self.engine.profiler.profile(f'ui-{view}'):
+                return slot(self, *args)
+        return wrapper
+    return decorate
+
+
+def format_large_usd(value):
+    """Format market cap / volume as $1.23B, $4.56M or $789"""
+    if value > 1e9:
+        return f"${value/1e9:.2f}B"
+    elif value > 1e6:
+        return f"${value/1e6:.2f}M"
+    return f"${value:,.0f}"
+
+
+class PriceTableModel(QAbstractTableModel):
+    """Market overview rows kept as columns; a refresh only signals the cells that changed"""
+
+    HEADERS = [
+        'Symbol', 'Name', 'Price (USD)', '24h Change (%)',
+        'Market Cap', '24h Volume', 'Last Updated'
+    ]
+    # MarketSnapshot column behind each table column
+    FIELDS = ['symbols', 'names', 'prices', 'changes', 'market_caps', 'volumes', 'last_updated']
+    NUMERIC_COLUMNS = (2, 3, 4, 5)
+    CHANGE_COLUMN = 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.coin_ids = []
+        self.rows = {}  # coin id -> row
+        # Raw values, one per column: float64 arrays for the numbers, lists for text
+        self.values = [np.empty(0) if column in self.NUMERIC_COLUMNS else []
+                       for column in range(len(self.FIELDS))]
+        self.display = [[] for _ in self.FIELDS]  # formatted text, one list per column
+        self.time_cache = {}
+        # Table row of each coin in the last snapshot's order, and that snapshot's columns
+        self.snapshot_ids = ()
+        self.snapshot_rows = np.empty(0, dtype=np.intp)
+        self.snapshot_columns = [None] * len(self.FIELDS)
+        self.up_color = QColor(0, 255, 0, 50)
+        self.down_color = QColor(255, 0, 0, 50)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.coin_ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            return self.display[column][row]
+        if role == Qt.BackgroundRole and column == self.CHANGE_COLUMN:
+            change = self.values[column][row]
+            if change > 0:
+                return self.up_color
+            elif change < 0:
+                return self.down_color
+        return None
+
+    def update_snapshot(self, snapshot):
+        """Apply a MarketSnapshot, returning the number of cells that changed
+
+        Numbers are compared column-wise against the snapshot's arrays; a column
+        the snapshot shares with the previous one (e.g. names, or everything but
+        prices after a pushed price update) is skipped outright.
+        """
+        ids = snapshot.ids
+        inserted = 0
+        if ids is not self.snapshot_ids and ids != self.snapshot_ids:
+            if tuple(self.coin_ids) != ids[:len(self.coin_ids)]:
+                # Coins left or moved: rebuild in the snapshot's (market cap) order
+                self._reset_rows(snapshot)
+                return len(ids) * len(self.FIELDS)
+            inserted = self._insert_rows(snapshot)
+            self.snapshot_ids = ids
+            self.snapshot_rows = np.fromiter((self.rows[coin_id] for coin_id in ids), dtype=np.intp,
+                                             count=len(ids))
+            self.snapshot_columns = [None] * len(self.FIELDS)
+        rows = self.snapshot_rows
+
+        changed = 0
+        for column, field in enumerate(self.FIELDS):
+            new = getattr(snapshot, field)
+            if new is self.snapshot_columns[column]:
+                continue
+            self.snapshot_columns[column] = new
+            values = self.values[column]
+            display = self.display[column]
+            if column in self.NUMERIC_COLUMNS:
+                moved = np.flatnonzero(values[rows] != new)
+                changed_rows = rows[moved].tolist()
+                values[rows[moved]] = new[moved]
+                for row, value in zip(changed_rows, new[moved].tolist()):
+                    display[row] = self.format_value(column, value)
+            else:
+                changed_rows = []
+                for row, value in zip(rows.tolist(), new):
+                    if values[row] != value:
+                        values[row] = value
+                        display[row] = self.format_value(column, value)
+                        changed_rows.append(row)
+            for first, last in self._runs(changed_rows):
+                self.dataChanged.emit(self.index(first, column), self.index(last, column))
+            changed += len(changed_rows)
+
+        return changed + inserted * len(self.FIELDS)
+
+    def _reset_rows(self, snapshot):
+        """Replace every row with the snapshot's coins, in its order"""
+        self.beginResetModel()
+        ids = snapshot.ids
+        self.coin_ids = list(ids)
+        self.rows = {coin_id: row for row, coin_id in enumerate(ids)}
+        for column, field in enumerate(self.FIELDS):
+            source = getattr(snapshot, field)
+            if column in self.NUMERIC_COLUMNS:
+                self.values[column] = source.copy()
+                values = source.tolist()
+            else:
+                values = self.values[column] = list(source)
+            self.display[column] = [self.format_value(column, value) for value in values]
+            self.snapshot_columns[column] = source
+        self.snapshot_ids = ids
+        self.snapshot_rows = np.arange(len(ids), dtype=np.intp)
+        self.endResetModel()
+
+    def _insert_rows(self, snapshot):
+        """Append rows for the snapshot's new coins; only used when it extends the table's order"""
+        new = [i for i, coin_id in enumerate(snapshot.ids) if coin_id not in self.rows]
+        if not new:
+            return 0
+        first = len(self.coin_ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+        for i in new:
+            self.rows[snapshot.ids[i]] = len(self.coin_ids)
+            self.coin_ids.append(snapshot.ids[i])
+        for column, field in enumerate(self.FIELDS):
+            source = getattr(snapshot, field)
+            if column in self.NUMERIC_COLUMNS:
+                added = source[new]
+                self.values[column] = np.concatenate([self.values[column], added])
+                added = added.tolist()
+            else:
+                added = [source[i] for i in new]
+                self.values[column] += added
+            self.display[column] += [self.format_value(column, value) for value in added]
+        self.endInsertRows()
+        return len(new)
+
+    def format_value(self, column, value):
+        if column == 2:
+            return f"${value:,.4f}"
+        if column == 3:
+            return f"{value:+.2f}%"
+        if column in (4, 5):
+            return format_large_usd(value)
+        if column == 6:
+            return self.format_time(value)
+        return value
+
+    def format_time(self, last_updated):
+        """HH:MM:SS for an ISO timestamp; many coins share one, so parse each only once"""
+        time_str = self.time_cache.get(last_updated)
+        if time_str is None:
+            try:
+                parsed = datetime.datetime.fromisoformat(last_updated.replace('Z', '+00:00'))
+                time_str = parsed.strftime('%H:%M:%S')
+            except (AttributeError, ValueError):
+                time_str = 'Unknown'
+            if len(self.time_cache) > 10000:
+                self.time_cache.clear()
+            self.time_cache[last_updated] = time_str
+        return time_str
+
+    @staticmethod
+    def _runs(rows):
+        """Collapse row numbers into (first, last) runs of consecutive rows"""
+        runs = []
+        for row in sorted(rows):
+            if runs and row == runs[-1][1] + 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        return runs
+
+
+class AlertTableModel(QAbstractTableModel):
+    """Stored alerts, read from the engine's alert book on reload()"""
+
+    HEADERS = ['#', 'Alert', 'Repeat', 'Last Fired']
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.alerts = []
+
+    def reload(self):
+        self.beginResetModel()
+        self.alerts = self.engine.alert_book.alerts()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.alerts)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        alert = self.alerts[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(alert.id)
+        if column == 1:
+            snapshot = self.engine.snapshot
+            i = snapshot.index.get(alert.coin_id)
+            return alert.describe(snapshot.symbols[i] if i is not None else None)
+        if column == 2:
+            return 'Yes' if alert.repeat else 'No'
+        if alert.last_fired is None:
+            return ''
+        return datetime.datetime.fromtimestamp(alert.last_fired).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class PositionTableModel(QAbstractTableModel):
+    """Open portfolio positions as the portfolio's arrays, formatted only for the cells on screen
+
+    Every revaluation moves the allocation of every position, so a price update
+    signals the valuation columns as one block; rows are only rebuilt when
+    positions open or close.
+    """
+
+    HEADERS = ['Symbol', 'Quantity', 'Avg Cost', 'Price', 'Value', 'PnL', 'PnL (%)', 'Allocation (%)', 'Lots']
+    # Columns that change with prices
+    VALUED_COLUMNS = (3, 7)
+    PNL_COLUMNS = (5, 6)
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.positions = None
+        self.layout = None
+        self.up_color = QColor(0, 255, 0, 50)
+        self.down_color = QColor(255, 0, 0, 50)
+
+    def reload(self):
+        positions = self.engine.portfolio.positions()
+        if positions['layout'] != self.layout or self.positions is None:
+            self.beginResetModel()
+            self.positions = positions
+            self.layout = positions['layout']
+            self.endResetModel()
+        elif len(positions['coin_ids']):
+            self.positions = positions
+            first, last = self.VALUED_COLUMNS
+            self.dataChanged.emit(self.index(0, first), self.index(len(positions['coin_ids']) - 1, last))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self.positions is None else len(self.positions['coin_ids'])
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        positions = self.positions
+        if role == Qt.BackgroundRole and column in self.PNL_COLUMNS:
+            pnl = positions['pnl'][row]
+            if pnl > 0:
+                return self.up_color
+            elif pnl < 0:
+                return self.down_color
+            return None
+        if role == Qt.TextAlignmentRole and column > 0:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role != Qt.DisplayRole:
+            return None
+        if column == 0:
+            snapshot = self.engine.snapshot
+            coin_id = positions['coin_ids'][row]
+            i = snapshot.index.get(coin_id)
+            return snapshot.symbols[i] if i is not None else coin_id
+        if column == 1:
+            return f"{positions['quantity'][row]:,.8g}"
+        if column == 8:
+            return str(positions['lots'][row])
+        value = positions[('avg_cost', 'price', 'value', 'pnl', 'pnl_pct', 'allocation')[column - 2]][row]
+        if value != value:
+            return '-'
+        if column in (2, 3):
+            return f'${value:,.{2 if value >= 1 else 6}f}'
+        if column in (4, 5):
+            return f'${value:,.2f}' if column == 4 else f'{"+" if value >= 0 else "-"}${abs(value):,.2f}'
+        return f'{value:+.2f}%' if column == 6 else f'{value:.2f}%'
+
+
+class LotTableModel(QAbstractTableModel):
+    """Lots in the portfolio, read from the engine on reload()"""
+
+    HEADERS = ['#', 'Coin', 'Quantity', 'Unit Cost', 'Cost', 'Acquired', 'Note']
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.lots = []
+
+    def reload(self):
+        self.beginResetModel()
+        self.lots = self.engine.portfolio.lots()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lots)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        lot = self.lots[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(lot.id)
+        if column == 1:
+            snapshot = self.engine.snapshot
+            i = snapshot.index.get(lot.coin_id)
+            return snapshot.symbols[i] if i is not None else lot.coin_id
+        if column == 2:
+            return f'{lot.quantity:,.8g}'
+        if column == 3:
+            return f'${lot.unit_cost:,.{2 if lot.unit_cost >= 1 else 6}f}'
+        if column == 4:
+            return f'${lot.cost:,.2f}'
+        if column == 5:
+            if lot.acquired is None:
+                return ''
+            return datetime.datetime.fromtimestamp(lot.acquired / 1000, datetime.timezone.utc).strftime('%Y-%m-%d')
+        return lot.note
 
 
 class CryptoPriceWidget(QWidget):
     update_status_signal = pyqtSignal(str)
     update_price_signal = pyqtSignal(float)
-    update_table_signal = pyqtSignal(dict)
-    update_chart_signal = pyqtSignal(list, list, str, str)
+    update_table_signal = pyqtSignal(object)
+    update_chart_signal = pyqtSignal(object, str, str)
     update_exchange_signal = pyqtSignal(str, str, dict)
     update_suggestions_signal = pyqtSignal(list)
+    update_rates_signal = pyqtSignal(object)
+    update_alerts_signal = pyqtSignal(list)
+    update_valuation_signal = pyqtSignal(dict)
 
-    def __init__(self):
+    def __init__(self, profile=PROFILE):
         super().__init__()
-        self.session = requests.Session()
-        self.setup_data()
+        self.startup_ms = None
+        self.setup_data(profile)
         self.setup_ui()
         self.setup_connections()
         self.load_initial_settings()
         self.populate_combo()
         
-        # Auto-refresh every 60 seconds
+        # Prices are kept current by the engine's feeds (adaptive polling, optional stream)
+        self.engine.start_feeds()
+
+        # Background upkeep every 60 seconds
         self.auto_refresh_timer = QTimer()
-        self.auto_refresh_timer.timeout.connect(self.refresh_all_prices)
+        self.auto_refresh_timer.timeout.connect(self.auto_refresh)
         self.auto_refresh_timer.start(60000)  # 60 seconds
 
     def setup_ui(self):
@@ -78,6 +473,11 @@ class CryptoPriceWidget(QWidget):
         self.tab_widget.addTab(self.overview_tab, "📊 Market Overview")
         self.setup_overview_tab()
         
+        # Portfolio tab
+        self.portfolio_tab = QWidget()
+        self.tab_widget.addTab(self.portfolio_tab, "💼 Portfolio")
+        self.setup_portfolio_tab()
+        
         # Chart tab
         self.chart_tab = QWidget()
         self.tab_widget.addTab(self.chart_tab, "📈 Price History")
@@ -93,6 +493,16 @@ class CryptoPriceWidget(QWidget):
         self.tab_widget.addTab(self.suggestions_tab, "🎯 Trade Suggestions")
         self.setup_suggestions_tab()
 
+        # Alerts tab
+        self.alerts_tab = QWidget()
+        self.tab_widget.addTab(self.alerts_tab, "🔔 Alerts")
+        self.setup_alerts_tab()
+
+        # Diagnostics tab
+        self.diagnostics_tab = QWidget()
+        self.tab_widget.addTab(self.diagnostics_tab, "🩺 Diagnostics")
+        self.setup_diagnostics_tab()
+
         # Status
         self.status_label = QLabel('Initializing...')
         self.status_label.setFont(QFont('Arial', 12))
@@ -154,7 +564,7 @@ class CryptoPriceWidget(QWidget):
                 border: 1px solid #00ff99;
             }
             
-            QTableWidget { 
+            QTableView { 
                 gridline-color: #333; 
                 background: qlineargradient(x1:0, y1:0, x2:1, y2:1, stop:0 #1e1e1e, stop:1 #2a2a2a);
                 border: 1px solid #444;
@@ -163,13 +573,13 @@ class CryptoPriceWidget(QWidget):
                 selection-color: #000000;
             }
             
-            QTableWidget::item { 
+            QTableView::item { 
                 padding: 12px; 
                 border-bottom: 1px solid #333;
                 border-right: 1px solid #333;
             }
             
-            QTableWidget::item:selected { 
+            QTableView::item:selected { 
                 background: qlineargradient(x1:0, y1:0, x2:1, y2:0, stop:0 #00ff99, stop:1 #00cc77);
                 color: #000000;
                 font-weight: bold;
@@ -315,15 +725,17 @@ class CryptoPriceWidget(QWidget):
         self.refresh_button.setFixedWidth(200)
         refresh_layout.addWidget(self.refresh_button)
         refresh_layout.addStretch()
+        # Portfolio totals next to the market, kept current with every price update
+        self.overview_portfolio_label = QLabel()
+        self.overview_portfolio_label.setFont(QFont('Arial', 13, QFont.Bold))
+        self.overview_portfolio_label.setStyleSheet('color: #00ff99;')
+        refresh_layout.addWidget(self.overview_portfolio_label)
         layout.addLayout(refresh_layout)
         
         # Price table
-        self.price_table = QTableWidget()
-        self.price_table.setColumnCount(7)
-        self.price_table.setHorizontalHeaderLabels([
-            'Symbol', 'Name', 'Price (USD)', '24h Change (%)', 
-            'Market Cap', '24h Volume', 'Last Updated'
-        ])
+        self.price_model = PriceTableModel(self)
+        self.price_table = QTableView()
+        self.price_table.setModel(self.price_model)
         
         # Make table responsive
         header = self.price_table.horizontalHeader()
@@ -333,6 +745,78 @@ class CryptoPriceWidget(QWidget):
         
         layout.addWidget(self.price_table)
 
+    def setup_portfolio_tab(self):
+        layout = QVBoxLayout()
+        self.portfolio_tab.setLayout(layout)
+        
+        # New lot: coin, quantity, unit cost (blank = current price), optional purchase date
+        form_layout = QHBoxLayout()
+        self.lot_coin_combo = QComboBox()
+        self.lot_coin_combo.setMinimumWidth(150)
+        form_layout.addWidget(self.lot_coin_combo)
+        
+        self.lot_quantity_input = QLineEdit()
+        self.lot_quantity_input.setPlaceholderText('Quantity')
+        self.lot_quantity_input.setFixedWidth(120)
+        form_layout.addWidget(self.lot_quantity_input)
+        
+        self.lot_cost_input = QLineEdit()
+        self.lot_cost_input.setPlaceholderText('Unit cost $ (blank = now)')
+        self.lot_cost_input.setFixedWidth(190)
+        form_layout.addWidget(self.lot_cost_input)
+        
+        self.lot_date_input = QLineEdit()
+        self.lot_date_input.setPlaceholderText('YYYY-MM-DD (optional)')
+        self.lot_date_input.setFixedWidth(180)
+        form_layout.addWidget(self.lot_date_input)
+        
+        self.add_lot_button = QPushButton('Add Lot')
+        self.add_lot_button.setFixedWidth(110)
+        form_layout.addWidget(self.add_lot_button)
+        self.remove_lot_button = QPushButton('Remove Selected Lots')
+        self.remove_lot_button.setFixedWidth(200)
+        form_layout.addWidget(self.remove_lot_button)
+        self.portfolio_chart_button = QPushButton('📈 Value History')
+        self.portfolio_chart_button.setFixedWidth(160)
+        form_layout.addWidget(self.portfolio_chart_button)
+        form_layout.addStretch()
+        layout.addLayout(form_layout)
+        
+        self.portfolio_summary = QLabel()
+        self.portfolio_summary.setFont(QFont('Arial', 14, QFont.Bold))
+        self.portfolio_summary.setStyleSheet('color: #00ff99; padding: 5px;')
+        layout.addWidget(self.portfolio_summary)
+        
+        # Models rather than QTableWidgets: thousands of lots across the whole coin universe
+        self.position_model = PositionTableModel(self.engine, self)
+        self.positions_table = QTableView()
+        self.positions_table.setModel(self.position_model)
+        self.positions_table.verticalHeader().setVisible(False)
+        positions_header = self.positions_table.horizontalHeader()
+        positions_header.setStretchLastSection(True)
+        positions_header.setSectionResizeMode(0, positions_header.Stretch)
+        for i in range(1, len(PositionTableModel.HEADERS)):
+            positions_header.setSectionResizeMode(i, positions_header.ResizeToContents)
+        layout.addWidget(self.positions_table, 2)
+        
+        lots_label = QLabel('Lots')
+        lots_label.setStyleSheet('color: #00ff99; font-weight: bold;')
+        layout.addWidget(lots_label)
+        self.lot_model = LotTableModel(self.engine, self)
+        self.lots_table = QTableView()
+        self.lots_table.setModel(self.lot_model)
+        self.lots_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.lots_table.verticalHeader().setVisible(False)
+        lots_header = self.lots_table.horizontalHeader()
+        lots_header.setStretchLastSection(True)
+        for i in range(len(LotTableModel.HEADERS) - 1):
+            lots_header.setSectionResizeMode(i, lots_header.ResizeToContents)
+        layout.addWidget(self.lots_table, 1)
+        
+        # Set when values moved while the tab was hidden
+        self.portfolio_stale = True
+        self.show_portfolio_totals(self.engine.portfolio.summary())
+
     def setup_chart_tab(self):
         layout = QVBoxLayout()
         self.chart_tab.setLayout(layout)
@@ -361,12 +845,54 @@ class CryptoPriceWidget(QWidget):
         
         layout.addLayout(controls_layout)
         
-        # Chart
-        self.figure = Figure(figsize=(12, 6), facecolor='#1e1e1e')
-        self.canvas = FigureCanvas(self.figure)
-        self.ax = self.figure.add_subplot(111)
-        self.ax.set_facecolor('#2d2d2d')
-        layout.addWidget(self.canvas)
+        # Chart - matplotlib is only imported once this tab is first opened
+        self.chart = None
+        self.canvas = None
+        self.pending_chart = None
+        self.chart_layout = layout
+        self.chart_placeholder = QLabel('📈 Loading chart...')
+        self.chart_placeholder.setAlignment(Qt.AlignCenter)
+        self.chart_placeholder.setStyleSheet('color: #888888; font-size: 16px;')
+        self.chart_placeholder.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        layout.addWidget(self.chart_placeholder)
+
+    def ensure_chart(self):
+        """Build the matplotlib figure on first use, replacing the placeholder"""
+        if self.canvas is not None:
+            return
+        
+        started = time.perf_counter()
+        from price_chart import PriceChart
+        
+        self.chart = PriceChart()
+        self.canvas = self.chart.canvas
+        
+        self.chart_layout.replaceWidget(self.chart_placeholder, self.canvas)
+        self.chart_placeholder.deleteLater()
+        self.chart_placeholder = None
+        print(f"Chart stack loaded in {(time.perf_counter() - started) * 1000:.0f} ms")  # Debug
+        
+        if self.pending_chart is not None:
+            pending, self.pending_chart = self.pending_chart, None
+            self.update_chart(*pending)
+
+    def on_tab_changed(self, index):
+        if self.tab_widget.widget(index) is self.chart_tab:
+            self.ensure_chart()
+        elif self.tab_widget.widget(index) is self.exchange_tab:
+            self.prefetch_exchange_limits()
+        
+        if self.tab_widget.widget(index) is self.portfolio_tab and self.portfolio_stale:
+            self.reload_portfolio()
+        if self.tab_widget.widget(index) is self.alerts_tab and self.alerts_stale:
+            self.reload_alerts()
+        
+        # Metrics are only re-read while the Diagnostics tab is visible
+        if self.tab_widget.widget(index) is self.diagnostics_tab:
+            self.update_diagnostics()
+            self.diagnostics_timer.start(DIAGNOSTICS_REFRESH_MS)
+        else:
+            self.diagnostics_timer.stop()
 
     def setup_exchange_tab(self):
         layout = QVBoxLayout()
@@ -459,6 +985,12 @@ class CryptoPriceWidget(QWidget):
         self.exchange_results.setWordWrap(True)
         self.exchange_results.setMinimumHeight(100)
         layout.addWidget(self.exchange_results)
+
+        # Best multi-hop route from the background all-pairs rate sweep
+        self.route_label = QLabel('🔀 Best route: collecting rates for all pairs...')
+        self.route_label.setStyleSheet('color: #ffb347; font-weight: bold; padding: 5px;')
+        self.route_label.setWordWrap(True)
+        layout.addWidget(self.route_label)
         
         # Exchange fee table
         self.exchange_table = QTableWidget()
@@ -578,73 +1110,169 @@ class CryptoPriceWidget(QWidget):
         
         layout.addWidget(self.suggestions_table)
 
-    def setup_data(self):
-        # Famous cryptocurrencies with their CoinGecko IDs
-        self.coins = [
-            ('bitcoin', 'BTC', 'Bitcoin'),
-            ('ethereum', 'ETH', 'Ethereum'),
-            ('binancecoin', 'BNB', 'BNB'),
-            ('cardano', 'ADA', 'Cardano'),
-            ('solana', 'SOL', 'Solana'),
-            ('xrp', 'XRP', 'XRP'),
-            ('dogecoin', 'DOGE', 'Dogecoin'),
-            ('monero', 'XMR', 'Monero'),
-            ('tether', 'USDT', 'Tether'),
-            ('polygon', 'MATIC', 'Polygon'),
-            ('litecoin', 'LTC', 'Litecoin'),
-            ('chainlink', 'LINK', 'Chainlink'),
-            ('avalanche-2', 'AVAX', 'Avalanche'),
-            ('tron', 'TRX', 'TRON'),
-            ('shiba-inu', 'SHIB', 'Shiba Inu'),
-            ('uniswap', 'UNI', 'Uniswap'),
-            ('the-open-network', 'TON', 'Toncoin'),
-        ]
-        
-        self.coin_ids = ','.join([c[0] for c in self.coins])
-        self.proxy = None
-        self.current_prices = {}
-        
-        # ChangeNOW currency mapping (CoinGecko ID to ChangeNOW ticker)
-        self.changenow_mapping = {
-            'bitcoin': 'btc',
-            'ethereum': 'eth',
-            'binancecoin': 'bnb',
-            'cardano': 'ada',
-            'solana': 'sol',
-            'xrp': 'xrp',
-            'dogecoin': 'doge',
-            'monero': 'xmr',
-            'tether': 'usdt',
-            'polygon': 'matic',
-            'litecoin': 'ltc',
-            'chainlink': 'link',
-            'avalanche-2': 'avax',
-            'tron': 'trx',
-            'shiba-inu': 'shib',
-            'uniswap': 'uni',
-            'the-open-network': 'ton',
-        }
+    def setup_alerts_tab(self):
+        layout = QVBoxLayout()
+        self.alerts_tab.setLayout(layout)
+        
+        # New alert: coin, kind, threshold, window (move/volume only), repeat
+        form_layout = QHBoxLayout()
+        self.alert_coin_combo = QComboBox()
+        self.alert_coin_combo.setMinimumWidth(150)
+        form_layout.addWidget(self.alert_coin_combo)
+        
+        self.alert_kind_combo = QComboBox()
+        for label, kind in (('Price above ($)', 'above'), ('Price below ($)', 'below'),
+                            ('Move (%, - for drops)', 'move'), ('Volume spike (x)', 'volume')):
+            self.alert_kind_combo.addItem(label, kind)
+        form_layout.addWidget(self.alert_kind_combo)
+        
+        self.alert_threshold_input = QLineEdit()
+        self.alert_threshold_input.setPlaceholderText('e.g. 70000, -5 or 2')
+        self.alert_threshold_input.setFixedWidth(160)
+        form_layout.addWidget(self.alert_threshold_input)
+        
+        form_layout.addWidget(QLabel('within'))
+        self.alert_window_combo = QComboBox()
+        self.alert_window_combo.setEditable(True)
+        self.alert_window_combo.addItems(['5m', '15m', '1h', '4h', '1d'])
+        self.alert_window_combo.setCurrentText('1h')
+        self.alert_window_combo.setFixedWidth(80)
+        self.alert_window_combo.setEnabled(False)
+        form_layout.addWidget(self.alert_window_combo)
+        
+        self.alert_repeat_check = QCheckBox('Repeat')
+        form_layout.addWidget(self.alert_repeat_check)
+        
+        self.add_alert_button = QPushButton('Add Alert')
+        self.add_alert_button.setFixedWidth(120)
+        form_layout.addWidget(self.add_alert_button)
+        self.remove_alert_button = QPushButton('Remove Selected')
+        self.remove_alert_button.setFixedWidth(150)
+        form_layout.addWidget(self.remove_alert_button)
+        form_layout.addStretch()
+        layout.addLayout(form_layout)
+        
+        self.alerts_summary = QLabel()
+        self.alerts_summary.setStyleSheet('color: #ffb347; padding: 5px;')
+        layout.addWidget(self.alerts_summary)
+        
+        # A model rather than a QTableWidget: the book may hold tens of thousands of alerts
+        self.alert_model = AlertTableModel(self.engine, self)
+        self.alerts_table = QTableView()
+        self.alerts_table.setModel(self.alert_model)
+        self.alerts_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.alerts_table.verticalHeader().setVisible(False)
+        alerts_header = self.alerts_table.horizontalHeader()
+        alerts_header.setSectionResizeMode(0, alerts_header.ResizeToContents)
+        alerts_header.setSectionResizeMode(1, alerts_header.Stretch)
+        alerts_header.setSectionResizeMode(2, alerts_header.ResizeToContents)
+        alerts_header.setSectionResizeMode(3, alerts_header.ResizeToContents)
+        layout.addWidget(self.alerts_table, 2)
+        
+        fired_label = QLabel('Fired alerts')
+        fired_label.setStyleSheet('color: #00ff99; font-weight: bold;')
+        layout.addWidget(fired_label)
+        self.fired_alerts_list = QListWidget()
+        layout.addWidget(self.fired_alerts_list, 1)
+        
+        # Set when the book changed while the tab was hidden
+        self.alerts_stale = True
+        # Desktop notifications through the system tray, when the desktop has one
+        self.tray_icon = None
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            self.tray_icon = QSystemTrayIcon(self.style().standardIcon(QStyle.SP_MessageBoxInformation), self)
+            self.tray_icon.setToolTip('Crypto Currency Price Tracker')
+            self.tray_icon.show()
+
+    def setup_diagnostics_tab(self):
+        layout = QVBoxLayout()
+        self.diagnostics_tab.setLayout(layout)
+        
+        self.diagnostics_summary = QLabel('Collecting metrics...')
+        self.diagnostics_summary.setFont(QFont('Arial', 12))
+        self.diagnostics_summary.setStyleSheet('color: #ffffff; padding: 10px;')
+        self.diagnostics_summary.setWordWrap(True)
+        self.diagnostics_summary.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.diagnostics_summary)
+        
+        # Profiling can be switched on for a slow session without restarting
+        profile_layout = QHBoxLayout()
+        self.profile_button = QPushButton()
+        self.profile_button.setFixedWidth(200)
+        profile_layout.addWidget(self.profile_button)
+        self.profile_label = QLabel()
+        self.profile_label.setStyleSheet('color: #ffb347;')
+        self.profile_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        profile_layout.addWidget(self.profile_label)
+        profile_layout.addStretch()
+        layout.addLayout(profile_layout)
+        
+        # One row per histogram or counter series; times in ms, sizes in KB
+        self.diagnostics_table = QTableWidget()
+        self.diagnostics_table.setColumnCount(7)
+        self.diagnostics_table.setHorizontalHeaderLabels([
+            'Metric', 'Labels', 'Count', 'Mean', 'p50', 'p90', 'p99'
+        ])
+        self.diagnostics_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.diagnostics_table.verticalHeader().setVisible(False)
+        diag_header = self.diagnostics_table.horizontalHeader()
+        diag_header.setSectionResizeMode(0, diag_header.ResizeToContents)
+        diag_header.setSectionResizeMode(1, diag_header.Stretch)
+        for i in range(2, 7):
+            diag_header.setSectionResizeMode(i, diag_header.ResizeToContents)
+        layout.addWidget(self.diagnostics_table)
+        
+        self.diagnostics_timer = QTimer()
+        self.diagnostics_timer.timeout.connect(self.update_diagnostics)
+
+    def setup_data(self, profile=PROFILE):
+        # All fetching and analysis happens in the GUI-free engine
+        self.engine = MarketEngine(profile=profile)
+        self.coins = self.engine.coins
+        self.suggestions_requested = False
+        self.last_auto_analysis = 0.0
 
     def setup_connections(self):
+        # Engine signals fire on worker threads; re-emit through Qt signals to reach the GUI thread
+        self.engine.status.connect(self.update_status_signal.emit)
+        self.engine.markets.connect(self.update_table_signal.emit)
+        self.engine.history.connect(self.update_chart_signal.emit)
+        self.engine.exchange.connect(self.update_exchange_signal.emit)
+        self.engine.suggestions.connect(self.update_suggestions_signal.emit)
+        self.engine.rates.connect(self.update_rates_signal.emit)
+        self.engine.alerts.connect(self.update_alerts_signal.emit)
+        self.engine.valuation.connect(self.update_valuation_signal.emit)
         self.update_price_signal.connect(self.update_current_price)
         self.update_status_signal.connect(self.update_status)
         self.update_table_signal.connect(self.update_price_table)
+        self.update_table_signal.connect(self.on_markets_updated)
         self.update_chart_signal.connect(self.update_chart)
         self.update_exchange_signal.connect(self.update_exchange_info)
         self.update_suggestions_signal.connect(self.update_suggestions_display)
+        self.update_rates_signal.connect(self.update_route_info)
+        self.update_alerts_signal.connect(self.on_alerts_fired)
+        self.update_valuation_signal.connect(self.update_valuation)
         self.refresh_button.clicked.connect(self.refresh_all_prices)
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
         self.proxy_button.clicked.connect(self.set_proxy)
         self.combo.currentTextChanged.connect(self.on_coin_changed)
         self.period_combo.currentTextChanged.connect(self.on_period_changed)
         self.get_fee_button.clicked.connect(self.get_exchange_fee)
+        self.from_combo.currentIndexChanged.connect(self.prefetch_exchange_limits)
+        self.to_combo.currentIndexChanged.connect(self.prefetch_exchange_limits)
         self.analyze_button.clicked.connect(self.analyze_market)
+        self.profile_button.clicked.connect(self.toggle_profiling)
+        self.alert_kind_combo.currentIndexChanged.connect(self.on_alert_kind_changed)
+        self.add_alert_button.clicked.connect(self.add_alert)
+        self.remove_alert_button.clicked.connect(self.remove_selected_alerts)
+        self.add_lot_button.clicked.connect(self.add_lot)
+        self.remove_lot_button.clicked.connect(self.remove_selected_lots)
+        self.portfolio_chart_button.clicked.connect(self.show_portfolio_chart)
 
     def load_initial_settings(self):
         # Use environment proxy if set
-        env_proxy = os.environ.get('HTTP_PROXY') or os.environ.get('http_proxy')
+        env_proxy = self.engine.load_env_proxy()
         if env_proxy:
-            self.proxy = env_proxy
-            self.session.proxies = {'http': env_proxy, 'https': env_proxy}
             self.proxy_input.setText(env_proxy)
 
     def populate_combo(self):
@@ -652,12 +1280,14 @@ class CryptoPriceWidget(QWidget):
         self.from_combo.clear()
         self.to_combo.clear()
         
+        self.populate_coin_pickers(self.coins)
         for coin_id, symbol, name in self.coins:
             # Chart combo
             self.combo.addItem(f"{symbol} - {name}", coin_id)
             # Exchange combos
             self.from_combo.addItem(f"{symbol} - {name}", coin_id)
             self.to_combo.addItem(f"{symbol} - {name}", coin_id)
+        self.combo.addItem('💼 Portfolio value', PORTFOLIO_ID)
         
         if self.coins:
             self.combo.setCurrentIndex(0)
@@ -669,6 +1299,17 @@ class CryptoPriceWidget(QWidget):
         # Initial data load
         self.refresh_all_prices()
     
+    def populate_coin_pickers(self, coins):
+        """Offer every tracked coin for alerts and lots, keeping the current choices"""
+        for combo in (self.alert_coin_combo, self.lot_coin_combo):
+            current = combo.currentData()
+            combo.clear()
+            for coin_id, symbol, name in coins:
+                combo.addItem(f"{symbol} - {name}", coin_id)
+            index = combo.findData(current)
+            if index >= 0:
+                combo.setCurrentIndex(index)
+    
     def load_initial_chart(self):
         """Load initial chart for the first cryptocurrency"""
         coin_id = self.combo.currentData()
@@ -677,145 +1318,60 @@ class CryptoPriceWidget(QWidget):
             self.fetch_price_history(coin_id)
 
     def set_proxy(self):
-        proxy_url = self.proxy_input.text().strip()
-        if proxy_url:
-            if proxy_url.startswith(('socks5h://', 'socks5://', 'socks4://')):
-                try:
-                    import socks
-                    self.session.proxies = {'http': proxy_url, 'https': proxy_url}
-                    self.update_status_signal.emit(f'SOCKS proxy set: {proxy_url}')
-                except ImportError:
-                    self.update_status_signal.emit('requests[socks] required for SOCKS proxy. Install with: pip install requests[socks]')
-                    return
-            else:
-                self.session.proxies = {'http': proxy_url, 'https': proxy_url}
-                self.update_status_signal.emit(f'HTTP proxy set: {proxy_url}')
-        else:
-            self.session.proxies = {}
-            self.update_status_signal.emit('Proxy cleared.')
+        self.engine.set_proxy(self.proxy_input.text().strip())
+
+    def auto_refresh(self):
+        """Timer-driven upkeep; price refreshes are scheduled by the engine's feeds"""
+        # Keep extending the rate matrix while the user is on the Exchange tab
+        self.prefetch_exchange_limits()
 
     def refresh_all_prices(self):
         """Fetch current prices and market data for all cryptocurrencies"""
-        self.update_status_signal.emit('Fetching latest prices...')
-        
-        def fetch_data():
-            try:
-                # Fetch detailed market data
-                url = f'https://api.coingecko.com/api/v3/coins/markets'
-                params = {
-                    'vs_currency': 'usd',
-                    'ids': self.coin_ids,
-                    'order': 'market_cap_desc',
-                    'per_page': 100,
-                    'page': 1,
-                    'sparkline': False,
-                    'price_change_percentage': '24h'
-                }
-                
-                response = self.session.get(url, params=params, timeout=15)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    market_data = {}
-                    
-                    for coin in data:
-                        coin_id = coin['id']
-                        market_data[coin_id] = {
-                            'symbol': coin['symbol'].upper(),
-                            'name': coin['name'],
-                            'current_price': coin['current_price'] or 0,
-                            'price_change_24h': coin['price_change_percentage_24h'] or 0,
-                            'market_cap': coin['market_cap'] or 0,
-                            'total_volume': coin['total_volume'] or 0,
-                            'last_updated': coin['last_updated']
-                        }
-                        self.current_prices[coin_id] = coin['current_price'] or 0
-                    
-                    self.update_table_signal.emit(market_data)
-                    self.update_status_signal.emit('Prices updated successfully')
-                    
-                    # Update current coin's price
-                    current_coin_id = self.combo.currentData()
-                    if current_coin_id and current_coin_id in self.current_prices:
-                        self.update_price_signal.emit(self.current_prices[current_coin_id])
-                    
-                else:
-                    self.update_status_signal.emit(f'Error: HTTP {response.status_code}')
-                    
-            except requests.RequestException as e:
-                self.update_status_signal.emit(f'Network error: {str(e)}')
-            except Exception as e:
-                self.update_status_signal.emit(f'Error fetching data: {str(e)}')
-        
-        threading.Thread(target=fetch_data, daemon=True).start()
-
-    def update_price_table(self, market_data):
-        """Update the price table with market data"""
-        self.price_table.setRowCount(len(market_data))
-        
-        row = 0
-        for coin_id, data in market_data.items():
-            # Symbol
-            self.price_table.setItem(row, 0, QTableWidgetItem(data['symbol']))
-            
-            # Name
-            self.price_table.setItem(row, 1, QTableWidgetItem(data['name']))
-            
-            # Price
-            price_item = QTableWidgetItem(f"${data['current_price']:,.4f}")
-            self.price_table.setItem(row, 2, price_item)
-            
-            # 24h Change
-            change = data['price_change_24h']
-            change_item = QTableWidgetItem(f"{change:+.2f}%")
-            if change > 0:
-                change_item.setBackground(QColor(0, 255, 0, 50))
-            elif change < 0:
-                change_item.setBackground(QColor(255, 0, 0, 50))
-            self.price_table.setItem(row, 3, change_item)
-            
-            # Market Cap
-            market_cap = data['market_cap']
-            if market_cap > 1e9:
-                market_cap_str = f"${market_cap/1e9:.2f}B"
-            elif market_cap > 1e6:
-                market_cap_str = f"${market_cap/1e6:.2f}M"
-            else:
-                market_cap_str = f"${market_cap:,.0f}"
-            self.price_table.setItem(row, 4, QTableWidgetItem(market_cap_str))
-            
-            # Volume
-            volume = data['total_volume']
-            if volume > 1e9:
-                volume_str = f"${volume/1e9:.2f}B"
-            elif volume > 1e6:
-                volume_str = f"${volume/1e6:.2f}M"
-            else:
-                volume_str = f"${volume:,.0f}"
-            self.price_table.setItem(row, 5, QTableWidgetItem(volume_str))
-            
-            # Last Updated
-            try:
-                last_updated = datetime.datetime.fromisoformat(data['last_updated'].replace('Z', '+00:00'))
-                time_str = last_updated.strftime('%H:%M:%S')
-            except:
-                time_str = 'Unknown'
-            self.price_table.setItem(row, 6, QTableWidgetItem(time_str))
-            
-            row += 1
+        self.engine.refresh_prices(priority=PRIORITY_INTERACTIVE)
+
+    def on_markets_updated(self, snapshot):
+        """Update current coin's price after a refresh"""
+        price = snapshot.price(self.combo.currentData())
+        if price is not None:
+            self.update_price_signal.emit(price)
+        if len(snapshot) != self.alert_coin_combo.count():
+            self.populate_coin_pickers(snapshot.coins())
+        # Suggestions follow the market data once the user has asked for them,
+        # at most every AUTO_ANALYSIS_INTERVAL seconds when prices are streamed
+        now = time.monotonic()
+        if self.suggestions_requested and now - self.last_auto_analysis >= AUTO_ANALYSIS_INTERVAL:
+            self.last_auto_analysis = now
+            self.engine.analyze(announce=False)
+
+    @timed_view('price_table')
+    def update_price_table(self, snapshot):
+        """Update the price table from a MarketSnapshot"""
+        if self.startup_ms is None:
+            self.startup_ms = (time.perf_counter() - STARTUP_T0) * 1000
+            verdict = 'within' if self.startup_ms <= STARTUP_TARGET_MS else 'OVER'
+            print(f"Startup: price table ready after {self.startup_ms:.0f} ms ({verdict} {STARTUP_TARGET_MS} ms target)")
+        
+        changed = self.price_model.update_snapshot(snapshot)
+        print(f"Price table: {changed} cells changed")  # Debug
 
     def update_current_price(self, price):
         """Update the current price display"""
         self.price_label.setText(f'Current Price: ${price:,.4f}')
+        if self.chart is not None and self.engine.history_token and self.engine.history_token[0] == self.combo.currentData():
+            self.chart.set_last_price(price)
 
     def on_coin_changed(self):
         """Handle coin selection change"""
         coin_id = self.combo.currentData()
         print(f"Coin changed to: {coin_id}")  # Debug
-        if coin_id:
+        if coin_id == PORTFOLIO_ID:
+            self.fetch_price_history(coin_id)
+            self.update_portfolio_price(self.engine.portfolio.summary())
+        elif coin_id:
             self.fetch_price_history(coin_id)
-            if coin_id in self.current_prices:
-                self.update_price_signal.emit(self.current_prices[coin_id])
+            price = self.engine.snapshot.price(coin_id)
+            if price is not None:
+                self.update_price_signal.emit(price)
 
     def on_period_changed(self):
         """Handle period selection change"""
@@ -826,119 +1382,38 @@ class CryptoPriceWidget(QWidget):
             self.fetch_price_history(coin_id)
 
     def fetch_price_history(self, coin_id):
-        """Fetch and display price history for selected coin"""
-        period = self.period_combo.currentText()
-        
-        # Map period to days
-        days_map = {
-            '7 days': 7,
-            '30 days': 30,
-            '90 days': 90,
-            '1 year': 365
-        }
-        days = days_map.get(period, 30)
+        """Fetch and display price history for selected coin (or the portfolio value)"""
+        if coin_id == PORTFOLIO_ID:
+            self.engine.fetch_portfolio_history(self.period_combo.currentText())
+        else:
+            self.engine.fetch_history(coin_id, self.period_combo.currentText())
+
+    @timed_view('chart')
+    def update_chart(self, series, coin_id, period):
+        """Update the price chart from a PriceSeries"""
+        if (coin_id, period) != self.engine.history_token:
+            # A newer selection was made while this one was in flight
+            return
         
-        self.update_status_signal.emit(f'Loading {period} price history...')
+        if self.canvas is None:
+            # Chart tab not opened yet; draw when it is
+            self.pending_chart = (series, coin_id, period)
+            return
         
-        def fetch_history():
-            try:
-                url = f'https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart'
-                params = {
-                    'vs_currency': 'usd',
-                    'days': days,
-                    'interval': 'daily' if days > 7 else 'hourly'
-                }
-                
-                print(f"Fetching data from: {url}")  # Debug
-                print(f"Params: {params}")  # Debug
-                
-                response = self.session.get(url, params=params, timeout=15)
-                
-                print(f"Response status: {response.status_code}")  # Debug
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    prices = data.get('prices', [])
-                    
-                    print(f"Received {len(prices)} price points")  # Debug
-                    
-                    if prices:
-                        # Extract dates and prices
-                        dates = [datetime.datetime.fromtimestamp(p[0]/1000) for p in prices]
-                        price_values = [p[1] for p in prices]
-                        
-                        # Use signal-slot mechanism instead of QTimer
-                        self.update_chart_signal.emit(dates, price_values, coin_id, period)
-                        
-                        self.update_status_signal.emit('Price history loaded successfully')
-                    else:
-                        self.update_status_signal.emit('No price data available')
-                else:
-                    error_msg = f'Error loading history: HTTP {response.status_code}'
-                    if response.status_code == 429:
-                        error_msg += ' (Rate limited - please wait)'
-                    print(f"Error response: {response.text[:200]}")  # Debug
-                    self.update_status_signal.emit(error_msg)
-                    
-            except Exception as e:
-                print(f"Exception in fetch_history: {str(e)}")  # Debug
-                self.update_status_signal.emit(f'Error loading price history: {str(e)}')
-        
-        threading.Thread(target=fetch_history, daemon=True).start()
-
-    def update_chart(self, dates, prices, coin_id, period):
-        """Update the price chart"""
         try:
-            print(f"Updating chart for {coin_id} with {len(dates)} data points")  # Debug
-            
-            self.ax.clear()
-            self.ax.set_facecolor('#2d2d2d')
-            
-            # Plot price line
-            self.ax.plot(dates, prices, color='#00ff99', linewidth=2)
-            
-            # Customize chart
-            coin_name = next((name for cid, symbol, name in self.coins if cid == coin_id), coin_id)
-            self.ax.set_title(f'{coin_name} Price History ({period})', color='white', fontsize=16, pad=20)
-            self.ax.set_xlabel('Date', color='white')
-            self.ax.set_ylabel('Price (USD)', color='white')
-            
-            # Style axes
-            self.ax.tick_params(axis='both', colors='white')
-            self.ax.grid(True, alpha=0.3, color='white')
-            
-            # Format x-axis dates
-            try:
-                import matplotlib.dates as mdates
-                if len(dates) > 30:  # More than 30 data points
-                    self.ax.xaxis.set_major_locator(mdates.WeekdayLocator())
-                    self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-                else:
-                    self.ax.xaxis.set_major_locator(mdates.DayLocator(interval=max(1, len(dates)//10)))
-                    self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
-                
-                # Rotate x-axis labels
-                for label in self.ax.get_xticklabels():
-                    label.set_rotation(45)
-                    label.set_horizontalalignment('right')
-            except Exception as date_error:
-                print(f"Date formatting error: {date_error}")
-            
-            # Format y-axis for currency
-            try:
-                if max(prices) > 1000:
-                    self.ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
-                elif max(prices) > 1:
-                    self.ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:.2f}'))
-                else:
-                    self.ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:.4f}'))
-            except Exception as format_error:
-                print(f"Y-axis formatting error: {format_error}")
-            
-            self.figure.tight_layout()
-            self.canvas.draw()
+            if coin_id == PORTFOLIO_ID:
+                title = f'Portfolio Value ({period})'
+            else:
+                title = f'{self.engine.coin_name(coin_id)} Price History ({period})'
+            draw_ms = self.chart.set_series(series, title)
+            print(f"Updated chart for {coin_id} with {len(series)} data points in {draw_ms:.1f} ms")  # Debug
             
-            print("Chart updated successfully")  # Debug
+            if coin_id == PORTFOLIO_ID:
+                price = self.engine.portfolio.summary()['value']
+            else:
+                price = self.engine.snapshot.price(coin_id)
+            if price is not None:
+                self.chart.set_last_price(price)
             
         except Exception as e:
             print(f"Error updating chart: {str(e)}")  # Debug
@@ -948,26 +1423,36 @@ class CryptoPriceWidget(QWidget):
         """Update status label"""
         self.status_label.setText(msg)
 
+    def prefetch_exchange_limits(self, *args):
+        """Fetch the selected pair's limits and stale pair rates in the background"""
+        if self.tab_widget.currentWidget() is self.exchange_tab:
+            from_id, to_id = self.from_combo.currentData(), self.to_combo.currentData()
+            self.engine.prefetch_exchange_limits(from_id, to_id)
+            tickers = self.engine.exchange_tickers(from_id, to_id) or ()
+            self.engine.sweep_rates(focus=tickers)
+            self.update_route_info()
+
+    @timed_view('routes')
+    def update_route_info(self, *args):
+        """Show the best known route for the selected pair against its direct rate"""
+        route = self.engine.find_route(self.from_combo.currentData(), self.to_combo.currentData())
+        coverage = self.engine.rate_matrix.coverage()
+        if route is None:
+            self.route_label.setText(f'🔀 Best route: not enough rates yet ({coverage:.0%} of pairs quoted)')
+            return
+        path = ' → '.join(route['route'])
+        first, last = route['route'][0], route['route'][-1]
+        if len(route['route']) == 2:
+            text = f"🔀 Direct is best: 1 {first} ≈ {route['rate']:.8f} {last}"
+        elif route['gain_pct'] == route['gain_pct']:
+            text = (f"🔀 Best route {path}: 1 {first} ≈ {route['rate']:.8f} {last} "
+                    f"({route['gain_pct']:+.2f}% vs direct)")
+        else:
+            text = f"🔀 Best route {path}: 1 {first} ≈ {route['rate']:.8f} {last} (no direct quote)"
+        self.route_label.setText(f'{text}  ·  {coverage:.0%} of pairs quoted')
+
     def get_exchange_fee(self):
         """Get exchange fee from ChangeNOW.io"""
-        from_coin_id = self.from_combo.currentData()
-        to_coin_id = self.to_combo.currentData()
-        
-        if not from_coin_id or not to_coin_id:
-            self.update_status_signal.emit('Please select both currencies')
-            return
-            
-        if from_coin_id == to_coin_id:
-            self.update_status_signal.emit('Please select different currencies')
-            return
-        
-        from_ticker = self.changenow_mapping.get(from_coin_id)
-        to_ticker = self.changenow_mapping.get(to_coin_id)
-        
-        if not from_ticker or not to_ticker:
-            self.update_status_signal.emit('Currency not supported by ChangeNOW')
-            return
-        
         # Get custom amount from input field
         custom_amount = None
         amount_text = self.amount_input.text().strip()
@@ -981,87 +1466,21 @@ class CryptoPriceWidget(QWidget):
                 self.update_status_signal.emit('Please enter a valid amount')
                 return
         
-        self.update_status_signal.emit(f'Getting exchange rate for {from_ticker.upper()} → {to_ticker.upper()}...')
-        
-        def fetch_exchange_data():
-            try:
-                # Get minimum exchange amount
-                min_url = f'https://api.changenow.io/v1/min-amount/{from_ticker}_{to_ticker}'
-                print(f"Fetching min amount from: {min_url}")
-                
-                min_response = self.session.get(min_url, timeout=10)
-                
-                if min_response.status_code == 200:
-                    min_data = min_response.json()
-                    min_amount = min_data.get('minAmount', 0)
-                    print(f"Min amount: {min_amount}")
-                    
-                    # Use custom amount or minimum amount
-                    exchange_amount = custom_amount if custom_amount else max(min_amount, 1)
-                    
-                    # Check if custom amount is below minimum
-                    if custom_amount and custom_amount < min_amount:
-                        self.update_status_signal.emit(f'Amount is below minimum ({min_amount} {from_ticker.upper()})')
-                        return
-                    
-                    # Get exchange estimate
-                    estimate_url = f'https://api.changenow.io/v1/exchange-amount/{exchange_amount}/{from_ticker}_{to_ticker}'
-                    print(f"Fetching estimate from: {estimate_url}")
-                    
-                    estimate_response = self.session.get(estimate_url, timeout=10)
-                    
-                    if estimate_response.status_code == 200:
-                        estimate_data = estimate_response.json()
-                        estimated_amount = estimate_data.get('estimatedAmount', 0)
-                        print(f"Estimated amount: {estimated_amount}")
-                        
-                        # Get exchange info (fees)
-                        info_url = f'https://api.changenow.io/v1/exchange-range/{from_ticker}_{to_ticker}'
-                        info_response = self.session.get(info_url, timeout=10)
-                        
-                        exchange_info = {
-                            'from_ticker': from_ticker.upper(),
-                            'to_ticker': to_ticker.upper(),
-                            'min_amount': min_amount,
-                            'estimated_amount': estimated_amount,
-                            'exchange_amount': exchange_amount,
-                            'exchange_rate': estimated_amount / exchange_amount if exchange_amount > 0 else 0,
-                            'network_fee': 'Variable',
-                            'service_fee': 'Included in rate',
-                            'custom_amount': custom_amount is not None
-                        }
-                        
-                        if info_response.status_code == 200:
-                            info_data = info_response.json()
-                            print(f"Exchange range info: {info_data}")
-                        
-                        # Emit signal to update UI
-                        self.update_exchange_signal.emit(from_ticker, to_ticker, exchange_info)
-                        self.update_status_signal.emit('Exchange rates loaded successfully')
-                        
-                    else:
-                        print(f"Estimate error: {estimate_response.status_code} - {estimate_response.text}")
-                        self.update_status_signal.emit(f'Error getting exchange estimate: {estimate_response.status_code}')
-                else:
-                    print(f"Min amount error: {min_response.status_code} - {min_response.text}")
-                    self.update_status_signal.emit(f'Error getting minimum amount: {min_response.status_code}')
-                    
-            except Exception as e:
-                print(f"Exception in fetch_exchange_data: {str(e)}")
-                self.update_status_signal.emit(f'Error fetching exchange data: {str(e)}')
-        
-        threading.Thread(target=fetch_exchange_data, daemon=True).start()
+        self.engine.get_exchange_quote(self.from_combo.currentData(), self.to_combo.currentData(), custom_amount)
 
+    @timed_view('exchange')
     def update_exchange_info(self, from_ticker, to_ticker, exchange_info):
         """Update exchange information display"""
         try:
             # Update results text
+            max_amount = exchange_info.get('max_amount')
+            max_line = f"\n• Maximum Amount: {max_amount:.8f} {from_ticker}" if max_amount else ''
             if exchange_info.get('custom_amount', False):
                 results_text = f"""
 Exchange Rate: {from_ticker} → {to_ticker}
 
 • Custom Amount: {exchange_info['exchange_amount']:.8f} {from_ticker}
-• Minimum Amount: {exchange_info['min_amount']:.8f} {from_ticker}
+• Minimum Amount: {exchange_info['min_amount']:.8f} {from_ticker}{max_line}
 • Exchange Rate: 1 {from_ticker} ≈ {exchange_info['exchange_rate']:.8f} {to_ticker}
 • Service Fee: {exchange_info['service_fee']}
 • Network Fee: {exchange_info['network_fee']}
@@ -1075,7 +1494,7 @@ Note: Rates are approximate and may change. Always verify on ChangeNOW.io before
                 results_text = f"""
 Exchange Rate: {from_ticker} → {to_ticker}
 
-• Minimum Amount: {exchange_info['min_amount']:.8f} {from_ticker}
+• Minimum Amount: {exchange_info['min_amount']:.8f} {from_ticker}{max_line}
 • Exchange Rate: 1 {from_ticker} ≈ {exchange_info['exchange_rate']:.8f} {to_ticker}
 • Service Fee: {exchange_info['service_fee']}
 • Network Fee: {exchange_info['network_fee']}
@@ -1113,140 +1532,10 @@ Note: Rates are approximate and may change. Always verify on ChangeNOW.io before
 
     def analyze_market(self):
         """Analyze market data and generate trading suggestions"""
-        self.update_status_signal.emit('🔍 Analyzing market trends and generating suggestions...')
-        
-        def fetch_market_analysis():
-            try:
-                suggestions = []
-                
-                # Analyze each coin
-                for coin_id, symbol, name in self.coins:
-                    if coin_id in self.current_prices:
-                        price_data = self.current_prices[coin_id]
-                        
-                        # Handle both dict and direct value cases
-                        if isinstance(price_data, dict):
-                            current_price = price_data.get('usd', 0)
-                            price_change_24h = price_data.get('usd_24h_change', 0)
-                            market_cap = price_data.get('usd_market_cap', 0)
-                            volume = price_data.get('usd_24h_vol', 0)
-                        else:
-                            # If price_data is just a number, use it as current_price
-                            current_price = price_data if isinstance(price_data, (int, float)) else 0
-                            price_change_24h = 0
-                            market_cap = 0
-                            volume = 0
-                        
-                        # Skip if no valid price data
-                        if current_price <= 0:
-                            continue
-                        
-                        # Simple technical analysis
-                        suggestion = self.analyze_coin_data(
-                            name, symbol, current_price, price_change_24h, 
-                            market_cap, volume
-                        )
-                        if suggestion:
-                            suggestions.append(suggestion)
-                
-                # Sort by confidence
-                suggestions.sort(key=lambda x: x['confidence'], reverse=True)
-                
-                # Emit signal to update UI
-                self.update_suggestions_signal.emit(suggestions[:10])  # Top 10 suggestions
-                self.update_status_signal.emit('✅ Market analysis complete!')
-                
-            except Exception as e:
-                print(f"Exception in market analysis: {str(e)}")
-                self.update_status_signal.emit(f'❌ Error analyzing market: {str(e)}')
-        
-        threading.Thread(target=fetch_market_analysis, daemon=True).start()
-
-    def analyze_coin_data(self, name, symbol, price, change_24h, market_cap, volume):
-        """Analyze individual coin data and return suggestion"""
-        try:
-            # Technical indicators analysis
-            confidence = 50  # Base confidence
-            action = "HOLD"
-            reasoning = []
-            target_price = price
-            
-            # Price momentum analysis
-            if change_24h > 15:
-                action = "SELL"
-                confidence += 20
-                reasoning.append(f"Strong upward momentum (+{change_24h:.1f}%)")
-                target_price = price * 0.95  # Take profit
-                
-            elif change_24h > 5:
-                if volume > market_cap * 0.1:  # High volume
-                    action = "BUY"
-                    confidence += 15
-                    reasoning.append(f"Good momentum with high volume")
-                    target_price = price * 1.1
-                else:
-                    action = "HOLD"
-                    reasoning.append(f"Moderate gain (+{change_24h:.1f}%)")
-                    
-            elif change_24h < -15:
-                action = "BUY"
-                confidence += 25
-                reasoning.append(f"Oversold condition ({change_24h:.1f}%)")
-                target_price = price * 1.2  # Recovery target
-                
-            elif change_24h < -5:
-                action = "BUY"
-                confidence += 10
-                reasoning.append(f"Dip buying opportunity ({change_24h:.1f}%)")
-                target_price = price * 1.15
-                
-            else:
-                reasoning.append(f"Sideways movement ({change_24h:.1f}%)")
-            
-            # Volume analysis
-            if market_cap > 0:
-                volume_ratio = volume / market_cap if market_cap > 0 else 0
-                if volume_ratio > 0.2:
-                    confidence += 10
-                    reasoning.append("High trading volume")
-                elif volume_ratio < 0.05:
-                    confidence -= 5
-                    reasoning.append("Low trading volume")
-            
-            # Market cap considerations
-            if market_cap > 50_000_000_000:  # Large cap
-                reasoning.append("Large-cap stability")
-                confidence += 5
-            elif market_cap < 1_000_000_000:  # Small cap
-                reasoning.append("Small-cap volatility")
-                confidence -= 5
-            
-            # Special crypto considerations
-            if symbol in ['BTC', 'ETH']:
-                confidence += 10
-                reasoning.append("Major cryptocurrency")
-            elif symbol in ['USDT', 'USDC']:
-                action = "HOLD"
-                confidence = 90
-                reasoning = ["Stablecoin - hold for stability"]
-                target_price = price
-            
-            confidence = min(95, max(5, confidence))  # Clamp between 5-95%
-            
-            return {
-                'name': name,
-                'symbol': symbol,
-                'action': action,
-                'confidence': confidence,
-                'current_price': price,
-                'target_price': target_price,
-                'reasoning': ' | '.join(reasoning)
-            }
-            
-        except Exception as e:
-            print(f"Error analyzing {name}: {str(e)}")
-            return None
+        self.suggestions_requested = True
+        self.engine.analyze()
 
+    @timed_view('suggestions')
     def update_suggestions_display(self, suggestions):
         """Update the suggestions display with analysis results"""
         try:
@@ -1255,7 +1544,7 @@ Note: Rates are approximate and may change. Always verify on ChangeNOW.io before
                 summary_text = f"""
 🎯 AI MARKET ANALYSIS COMPLETE 🎯
 
-📊 Analyzed {len(self.coins)} cryptocurrencies
+📊 Analyzed {len(self.engine.tracked_coins)} cryptocurrencies
 🔍 Generated {len(suggestions)} actionable suggestions
 ⭐ Top recommendations ready below
 
@@ -1327,18 +1616,230 @@ Always do your own research and consider market risks before trading.
             print(f"Error updating suggestions display: {str(e)}")
             self.update_status_signal.emit(f'Error updating suggestions: {str(e)}')
         
+    def on_alert_kind_changed(self):
+        self.alert_window_combo.setEnabled(self.alert_kind_combo.currentData() in ('move', 'volume'))
+
+    def add_alert(self):
+        coin_id = self.alert_coin_combo.currentData()
+        kind = self.alert_kind_combo.currentData()
+        try:
+            window = parse_window(self.alert_window_combo.currentText()) if kind in ('move', 'volume') else None
+            alert = self.engine.alert_book.add(coin_id, kind, self.alert_threshold_input.text().strip(), window,
+                                               self.alert_repeat_check.isChecked())
+        except ValueError as e:
+            QMessageBox.warning(self, 'Invalid alert', str(e))
+            return
+        self.alert_threshold_input.clear()
+        self.reload_alerts()
+        symbol = self.alert_coin_combo.currentText().split(' - ')[0]
+        self.update_status_signal.emit(f'Alert added: {alert.describe(symbol)}')
+
+    def remove_selected_alerts(self):
+        rows = sorted({index.row() for index in self.alerts_table.selectionModel().selectedRows()})
+        for row in rows:
+            self.engine.alert_book.remove(self.alert_model.alerts[row].id)
+        if rows:
+            self.reload_alerts()
+            self.update_status_signal.emit(f'{len(rows)} alert(s) removed')
+
+    def reload_alerts(self):
+        self.alert_model.reload()
+        self.alerts_stale = False
+        stats = self.engine.alert_book.stats()
+        webhook = self.engine.alert_webhook or 'off (set CRYPTO_TRACKER_ALERT_WEBHOOK to enable)'
+        self.alerts_summary.setText(
+            f"{stats['alerts']:,} alerts on {stats['coins']:,} coins, {stats['fired']:,} fired this session - "
+            f"webhook: {webhook}"
+        )
+
+    @timed_view('alerts')
+    def on_alerts_fired(self, events):
+        """Log fired alerts and show them as desktop notifications"""
+        for event in events:
+            stamp = datetime.datetime.fromtimestamp(event['time']).strftime('%H:%M:%S')
+            self.fired_alerts_list.insertItem(0, f"{stamp}  🔔 {event['message']} (now ${event['price']:,.6g})")
+        while self.fired_alerts_list.count() > ALERT_LOG_SIZE:
+            self.fired_alerts_list.takeItem(self.fired_alerts_list.count() - 1)
+        
+        # A burst of alerts is summarised instead of flooding the desktop
+        messages = [event['message'] for event in events[:ALERT_NOTIFY_MAX]]
+        if len(events) > ALERT_NOTIFY_MAX:
+            messages.append(f'... and {len(events) - ALERT_NOTIFY_MAX} more')
+        if self.tray_icon is not None:
+            self.tray_icon.showMessage('Crypto alert', '\n'.join(messages), QSystemTrayIcon.Information, 10000)
+        else:
+            QApplication.alert(self)
+        self.update_status_signal.emit(f"🔔 {'; '.join(messages)}")
+        
+        if self.tab_widget.currentWidget() is self.alerts_tab:
+            self.reload_alerts()
+        else:
+            self.alerts_stale = True
+
+    def add_lot(self):
+        coin_id = self.lot_coin_combo.currentData()
+        unit_cost = self.lot_cost_input.text().strip()
+        try:
+            if not unit_cost:
+                unit_cost = self.engine.snapshot.price(coin_id)
+                if not unit_cost:
+                    raise ValueError('No current price for this coin yet - enter the unit cost')
+            acquired = parse_acquired(self.lot_date_input.text())
+            lot = self.engine.portfolio.add_lot(coin_id, self.lot_quantity_input.text().strip(), unit_cost, acquired)
+        except ValueError as e:
+            QMessageBox.warning(self, 'Invalid lot', str(e))
+            return
+        self.lot_quantity_input.clear()
+        self.lot_cost_input.clear()
+        self.lot_date_input.clear()
+        self.reload_portfolio()
+        symbol = self.lot_coin_combo.currentText().split(' - ')[0]
+        self.update_status_signal.emit(f'Lot added: {lot.quantity:,.8g} {symbol} at ${lot.unit_cost:,.6g}')
+
+    def remove_selected_lots(self):
+        rows = {index.row() for index in self.lots_table.selectionModel().selectedRows()}
+        removed = self.engine.portfolio.remove_lots([self.lot_model.lots[row].id for row in rows])
+        if removed:
+            self.reload_portfolio()
+            self.update_status_signal.emit(f'{removed} lot(s) removed')
+
+    def show_portfolio_chart(self):
+        """Plot the portfolio value over the selected period in the Price History tab"""
+        self.tab_widget.setCurrentWidget(self.chart_tab)
+        index = self.combo.findData(PORTFOLIO_ID)
+        if index == self.combo.currentIndex():
+            self.fetch_price_history(PORTFOLIO_ID)
+        else:
+            self.combo.setCurrentIndex(index)
+
+    def reload_portfolio(self):
+        """Re-read positions and lots after lots were added or removed"""
+        self.lot_model.reload()
+        self.position_model.reload()
+        self.portfolio_stale = False
+        summary = self.engine.portfolio.summary()
+        self.show_portfolio_totals(summary)
+        self.update_portfolio_price(summary)
+
+    @timed_view('portfolio')
+    def update_valuation(self, summary):
+        """Show the portfolio revalued at the latest prices"""
+        self.show_portfolio_totals(summary)
+        self.update_portfolio_price(summary)
+        if self.tab_widget.currentWidget() is self.portfolio_tab:
+            self.position_model.reload()
+        else:
+            self.portfolio_stale = True
+
+    def show_portfolio_totals(self, summary):
+        if not summary['lots']:
+            self.overview_portfolio_label.setText('')
+            self.portfolio_summary.setText('No holdings yet - add a lot to start tracking your portfolio')
+            return
+        pnl = summary['pnl']
+        totals = (f"${summary['value']:,.2f} ({'+' if pnl >= 0 else '-'}${abs(pnl):,.2f}, "
+                  f"{summary['pnl_pct']:+.2f}%)")
+        color = '#00ff99' if pnl >= 0 else '#ff6b6b'
+        self.overview_portfolio_label.setText(f'💼 Portfolio: {totals}')
+        self.overview_portfolio_label.setStyleSheet(f'color: {color};')
+        unpriced = f", {summary['unpriced']} not priced yet" if summary['unpriced'] else ''
+        self.portfolio_summary.setText(
+            f"Total value {totals} - cost basis ${summary['cost']:,.2f} - "
+            f"{summary['positions']:,} positions, {summary['lots']:,} lots{unpriced}"
+        )
+        self.portfolio_summary.setStyleSheet(f'color: {color}; padding: 5px;')
+
+    def update_portfolio_price(self, summary):
+        """Show the portfolio value as the current price while the chart plots it"""
+        if self.combo.currentData() != PORTFOLIO_ID:
+            return
+        self.price_label.setText(f"Portfolio Value: ${summary['value']:,.2f}")
+        if self.chart is not None and self.engine.history_token and self.engine.history_token[0] == PORTFOLIO_ID:
+            self.chart.set_last_price(summary['value'])
+
+    def toggle_profiling(self):
+        enabled = self.engine.profiler.toggle()
+        self.update_status_signal.emit('Profiling started' if enabled else 'Profiling stopped')
+        self.update_diagnostics()
+
+    def update_diagnostics(self):
+        """Show pool, rate-limit and provider health plus every recorded metric"""
+        executor = self.engine.executor.stats()
+        lines = [
+            f"Workers: {executor['workers']}/{self.engine.executor.max_workers} "
+            f"({executor['running']} busy, {executor['queued']} queued, "
+            f"{executor['in_flight_requests']} requests in flight)",
+            'Rate-limit headroom: ' + ', '.join(
+                f'{host} {limiter.headroom():.0%}' for host, limiter in self.engine.executor.limiters.items()
+            ),
+        ]
+        provider_stats = self.engine.providers.stats()
+        providers = []
+        for p in provider_stats['providers']:
+            if p['p50_ms'] is None:
+                text = f"{p['name']} (no samples)"
+            else:
+                text = f"{p['name']} p50 {p['p50_ms']:.0f} ms / p90 {p['p90_ms']:.0f} ms, {p['wins']} wins"
+            if p['cooling_off']:
+                text += ' - cooling off'
+            providers.append(text)
+        lines.append(f"Providers: {'; '.join(providers)} ({provider_stats['hedged']} hedged requests)")
+        if self.engine.metrics_server is not None:
+            lines.append(f'Prometheus endpoint: http://127.0.0.1:{self.engine.metrics_server.port}/metrics')
+        else:
+            lines.append('Prometheus endpoint: off (set CRYPTO_TRACKER_METRICS_PORT to enable)')
+        self.diagnostics_summary.setText('\n'.join(lines))
+        
+        profiler = self.engine.profiler.stats()
+        self.profile_button.setText('⏹ Stop Profiling' if profiler['enabled'] else '⏺ Start Profiling')
+        self.profile_label.setText(
+            f"{'Profiling' if profiler['enabled'] else 'Profiling off'} - {profiler['captured']} captured, "
+            f"{profiler['skipped']} skipped, files in {profiler['directory']}"
+        )
+        
+        histograms, counters = self.engine.metrics.summary()
+        self.diagnostics_table.setRowCount(len(histograms) + len(counters))
+        
+        def set_row(row, values):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column >= 2:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.diagnostics_table.setItem(row, column, item)
+        
+        for row, h in enumerate(histograms):
+            if h['name'].endswith('_bytes'):
+                scale, unit = 1 / 1024, ' KB'
+            else:
+                scale, unit = 1000, ' ms'
+            stats = [f'{h[key] * scale:,.1f}{unit}' if h[key] is not None else ''
+                     for key in ('mean', 'p50', 'p90', 'p99')]
+            labels = ', '.join(f'{k}={v}' for k, v in h['labels'].items())
+            set_row(row, [h['name'], labels, f"{h['count']:,}"] + stats)
+        for row, c in enumerate(counters, start=len(histograms)):
+            labels = ', '.join(f'{k}={v}' for k, v in c['labels'].items())
+            set_row(row, [c['name'], labels, f"{c['value']:,.0f}", '', '', '', ''])
+
     def closeEvent(self, event):
         """Clean up on close"""
         if hasattr(self, 'auto_refresh_timer'):
             self.auto_refresh_timer.stop()
-        if hasattr(self, 'session'):
-            self.session.close()
+        if hasattr(self, 'diagnostics_timer'):
+            self.diagnostics_timer.stop()
+        if getattr(self, 'tray_icon', None) is not None:
+            self.tray_icon.hide()
+        if hasattr(self, 'engine'):
+            self.engine.close()
         event.accept()
 
 
 def main():
+    if '--headless' in sys.argv[1:]:
+        from crypto_engine.headless import main as headless_main
+        sys.exit(headless_main(sys.argv[1:]))
+    
     app = QApplication(sys.argv)
-    widget = CryptoPriceWidget()
+    widget = CryptoPriceWidget(profile=PROFILE or '--profile' in sys.argv[1:])
     widget.show()
     sys.exit(app.exec_())
 
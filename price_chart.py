@@ -0,0 +1,162 @@
+"""Persistent matplotlib price chart, imported lazily by crypto_gui when the chart tab opens"""
+
+import time
+
+import matplotlib.style
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+
+from crypto_engine.downsample import downsample
+
+matplotlib.style.use('dark_background')
+
+
+class PriceChart:
+    """Keeps its artists between updates: new data goes through set_data, overlays are blitted"""
+
+    LINE_COLOR = '#00ff99'
+    # Series are reduced to about this many points per horizontal pixel of the axes
+    POINTS_PER_PIXEL = 1
+
+    def __init__(self):
+        self.figure = Figure(figsize=(12, 6), facecolor='#1e1e1e')
+        self.canvas = FigureCanvas(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_facecolor('#2d2d2d')
+
+        # Static styling is applied once instead of after every ax.clear()
+        self.title = self.ax.set_title('', color='white', fontsize=16, pad=20)
+        self.ax.set_xlabel('Date', color='white')
+        self.ax.set_ylabel('Price (USD)', color='white')
+        self.ax.tick_params(axis='both', colors='white')
+        self.ax.tick_params(axis='x', labelrotation=45)
+        self.ax.grid(True, alpha=0.3, color='white')
+        self.ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=4, maxticks=10))
+        self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d'))
+        self.ax.yaxis.set_major_formatter(FuncFormatter(self._format_price))
+
+        self.line, = self.ax.plot([], [], color=self.LINE_COLOR, linewidth=2)
+
+        # Overlays are animated: drawn on top of a cached background with blitting
+        self.last_price_line = self.ax.axhline(0, color='#ffb347', linewidth=1, linestyle='--',
+                                               animated=True, visible=False)
+        self.cross_v = self.ax.axvline(0, color='#aaaaaa', linewidth=0.8, animated=True, visible=False)
+        self.cross_h = self.ax.axhline(0, color='#aaaaaa', linewidth=0.8, animated=True, visible=False)
+        self.cross_label = self.ax.text(
+            0.01, 0.97, '', transform=self.ax.transAxes, color='white', va='top',
+            bbox={'facecolor': '#1e1e1e', 'edgecolor': '#00ff99', 'alpha': 0.8},
+            animated=True, visible=False
+        )
+        self.overlays = [self.last_price_line, self.cross_v, self.cross_h, self.cross_label]
+
+        self.full_x = np.empty(0)
+        self.full_y = np.empty(0)
+        self.price_scale = 1.0
+        self.layout_key = None
+        self.background = None
+
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('resize_event', self._on_resize)
+        self.canvas.mpl_connect('motion_notify_event', self._on_motion)
+        self.canvas.mpl_connect('axes_leave_event', self._on_leave)
+
+    def set_series(self, series, title):
+        """Replace the plotted PriceSeries; relayout only when the axes change shape"""
+        started = time.perf_counter()
+        self.full_x = series.date_numbers()
+        self.full_y = series.prices
+        # The cached background still shows the previous series; overlays wait for the next draw
+        self.background = None
+        self.title.set_text(title)
+        self.price_scale = self.full_y.max() if len(self.full_y) else 1.0
+        self.update_line()
+
+        # Tick label widths depend on the price format and the number of digits shown
+        layout_key = (self._price_format_class(), len(f'{self.price_scale:,.0f}'))
+        if layout_key != self.layout_key:
+            self.layout_key = layout_key
+            self.relayout()
+        else:
+            self.canvas.draw_idle()
+        return (time.perf_counter() - started) * 1000
+
+    def update_line(self):
+        """Plot the full series reduced to the current pixel width of the axes"""
+        target = max(16, int(self.ax.bbox.width * self.POINTS_PER_PIXEL))
+        x, y = downsample(self.full_x, self.full_y, target)
+        self.line.set_data(x, y)
+
+        # Limits come from the price line only, never from the overlay lines
+        self.ax.ignore_existing_data_limits = True
+        if len(x):
+            self.ax.update_datalim(np.column_stack((x, y)))
+        self.ax.autoscale_view()
+        return len(x)
+
+    def set_last_price(self, price):
+        """Move the dashed last-price line without redrawing the chart"""
+        self.last_price_line.set_ydata([price, price])
+        self.last_price_line.set_visible(price > 0)
+        self.blit_overlays()
+
+    def relayout(self):
+        for label in self.ax.get_xticklabels():
+            label.set_horizontalalignment('right')
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+
+    def blit_overlays(self):
+        if self.background is None:
+            return
+        self.canvas.restore_region(self.background)
+        for artist in self.overlays:
+            if artist.get_visible():
+                self.ax.draw_artist(artist)
+        self.canvas.blit(self.ax.bbox)
+
+    def _price_format_class(self):
+        if self.price_scale > 1000:
+            return 0
+        elif self.price_scale > 1:
+            return 1
+        return 2
+
+    def _format_price(self, x, pos):
+        format_class = self._price_format_class()
+        if format_class == 0:
+            return f'${x:,.0f}'
+        elif format_class == 1:
+            return f'${x:.2f}'
+        return f'${x:.4f}'
+
+    def _on_draw(self, event):
+        # A full draw just happened: cache the static background and put the overlays back
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for artist in self.overlays:
+            if artist.get_visible():
+                self.ax.draw_artist(artist)
+
+    def _on_resize(self, event):
+        # The pixel budget changed, so the reduced series has to be recomputed
+        self.background = None
+        self.update_line()
+        self.relayout()
+
+    def _on_motion(self, event):
+        if event.inaxes is not self.ax or event.xdata is None or not len(self.line.get_xdata()):
+            return
+        self.cross_v.set_xdata([event.xdata, event.xdata])
+        self.cross_h.set_ydata([event.ydata, event.ydata])
+        when = mdates.num2date(event.xdata).strftime('%Y-%m-%d %H:%M')
+        self.cross_label.set_text(f'{when}  {self._format_price(event.ydata, None)}')
+        for artist in (self.cross_v, self.cross_h, self.cross_label):
+            artist.set_visible(True)
+        self.blit_overlays()
+
+    def _on_leave(self, event):
+        for artist in (self.cross_v, self.cross_h, self.cross_label):
+            artist.set_visible(False)
+        self.blit_overlays()
@@ -0,0 +1,236 @@
+"""Tests for crypto_engine.alerts' indexed alert book"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from crypto_engine.alerts import AlertBook
+from crypto_engine.snapshot import MarketSnapshot
+
+
+def snapshot(prices, volumes=None):
+    """MarketSnapshot of {coin_id: price}, with {coin_id: 24h volume} (default 1e6)"""
+    volumes = volumes or {}
+    return MarketSnapshot.from_rows([
+        (coin_id, coin_id, coin_id.title(), price, 0, 1e9, volumes.get(coin_id, 1e6), '2024-01-01T00:00:00Z')
+        for coin_id, price in prices.items()
+    ])
+
+
+class AlertBookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.book = AlertBook(os.path.join(self.directory, 'alerts.db'))
+        self.now = 1000.0
+
+    def tearDown(self):
+        self.book.close()
+        shutil.rmtree(self.directory)
+
+    def check(self, prices, volumes=None, after=1):
+        """Messages of the alerts fired by a snapshot checked `after` seconds after the last one"""
+        self.now += after
+        return [event['message'] for event in self.book.check(snapshot(prices, volumes), self.now)]
+
+
+class LevelAlertTest(AlertBookTestCase):
+
+    def test_above_fires_when_crossed_upwards(self):
+        self.book.add('x', 'above', 100)
+        self.assertEqual(self.check({'x': 90}), [])
+        self.assertEqual(self.check({'x': 99}), [])
+        self.assertEqual(self.check({'x': 120}), ['X above $100.00'])
+
+    def test_above_fires_on_reaching_the_level(self):
+        self.book.add('x', 'above', 100)
+        self.check({'x': 90})
+        self.assertEqual(self.check({'x': 100}), ['X above $100.00'])
+
+    def test_above_does_not_fire_when_starting_at_or_over_the_level(self):
+        self.book.add('x', 'above', 100, repeat=True)
+        self.check({'x': 100})
+        self.assertEqual(self.check({'x': 110}), [])
+        self.assertEqual(self.check({'x': 95}), [])
+
+    def test_below_fires_when_crossed_downwards(self):
+        self.book.add('x', 'below', 100)
+        self.check({'x': 110})
+        self.assertEqual(self.check({'x': 101}), [])
+        self.assertEqual(self.check({'x': 80}), ['X below $100.00'])
+
+    def test_below_fires_on_reaching_the_level(self):
+        self.book.add('x', 'below', 100)
+        self.check({'x': 110})
+        self.assertEqual(self.check({'x': 100}), ['X below $100.00'])
+
+    def test_below_does_not_fire_when_starting_at_or_under_the_level(self):
+        self.book.add('x', 'below', 100, repeat=True)
+        self.check({'x': 100})
+        self.assertEqual(self.check({'x': 90}), [])
+        self.assertEqual(self.check({'x': 105}), [])
+
+    def test_first_price_never_fires(self):
+        self.book.add('x', 'above', 100)
+        self.assertEqual(self.check({'x': 150}), [])
+
+    def test_one_jump_fires_every_level_crossed(self):
+        for level in (100, 200, 300, 400):
+            self.book.add('x', 'above', level)
+        self.check({'x': 50})
+        self.assertEqual(self.check({'x': 350}),
+                         ['X above $100.00', 'X above $200.00', 'X above $300.00'])
+
+    def test_one_shot_alert_is_retired(self):
+        alert = self.book.add('x', 'above', 100)
+        self.check({'x': 90})
+        self.assertEqual(self.check({'x': 110}), ['X above $100.00'])
+        self.assertEqual(len(self.book), 0)
+        self.assertFalse(self.book.remove(alert.id))
+        self.check({'x': 90})
+        self.assertEqual(self.check({'x': 110}), [])
+
+    def test_repeating_alert_fires_on_every_crossing(self):
+        self.book.add('x', 'above', 100, repeat=True)
+        fired = [self.check({'x': price}) for price in (90, 110, 120, 90, 105)]
+        self.assertEqual(fired, [[], ['X above $100.00'], [], [], ['X above $100.00']])
+        self.assertEqual(len(self.book), 1)
+
+    def test_missing_coin_keeps_its_last_price(self):
+        self.book.add('x', 'above', 100)
+        self.check({'x': 90, 'y': 1})
+        self.assertEqual(self.check({'y': 1}), [])
+        self.assertEqual(self.check({'x': 110, 'y': 1}), ['X above $100.00'])
+
+    def test_event_fields(self):
+        alert = self.book.add('x', 'below', 50)
+        self.check({'x': 60})
+        event, = self.book.check(snapshot({'x': 40}), self.now + 1)
+        self.assertEqual((event['id'], event['coin_id'], event['symbol'], event['kind'], event['threshold']),
+                         (alert.id, 'x', 'X', 'below', 50))
+        self.assertEqual((event['value'], event['price'], event['time']), (40, 40, self.now + 1))
+
+
+class ChangeBetweenChecksTest(AlertBookTestCase):
+
+    def test_alert_added_between_checks_starts_from_the_last_check(self):
+        self.check({'x': 90})
+        self.book.add('x', 'above', 100)
+        self.assertEqual(self.check({'x': 110}), ['X above $100.00'])
+
+    def test_alert_removed_between_checks_does_not_fire(self):
+        alert = self.book.add('x', 'above', 100)
+        other = self.book.add('x', 'above', 105)
+        self.check({'x': 90})
+        self.assertTrue(self.book.remove(alert.id))
+        self.assertEqual(self.check({'x': 110}), ['X above $105.00'])
+        self.assertEqual(self.book.alerts(), [])
+        self.assertFalse(self.book.remove(other.id))
+
+    def test_new_coin_added_between_checks(self):
+        self.book.add('x', 'above', 100)
+        self.check({'x': 90, 'y': 10})
+        self.book.add('y', 'below', 5)
+        self.assertEqual(self.check({'x': 95, 'y': 4}), ['Y below $5.00'])
+        self.assertEqual(self.check({'x': 101, 'y': 4}), ['X above $100.00'])
+
+    def test_alerts_survive_a_reopen(self):
+        self.book.add('x', 'above', 100, repeat=True)
+        self.book.add('x', 'move', -5, 600)
+        self.book.close()
+        self.book = AlertBook(os.path.join(self.directory, 'alerts.db'))
+        self.assertEqual([(a.kind, a.threshold, a.window, a.repeat) for a in self.book.alerts()],
+                         [('above', 100, None, True), ('move', -5, 600, False)])
+        self.check({'x': 90})
+        self.assertEqual(self.check({'x': 110}), ['X above $100.00'])
+
+
+class WindowAlertTest(AlertBookTestCase):
+
+    def test_move_up_within_window(self):
+        self.book.add('x', 'move', 5, 60)
+        self.assertEqual(self.check({'x': 100}), [])
+        self.assertEqual(self.check({'x': 103}, after=30), [])
+        self.assertEqual(self.check({'x': 106}, after=30), ['X up 5% within 1m'])
+
+    def test_move_down_within_window(self):
+        self.book.add('x', 'move', -5, 60)
+        self.check({'x': 100})
+        self.assertEqual(self.check({'x': 110}, after=20), [])
+        self.assertEqual(self.check({'x': 94}, after=20), ['X down 5% within 1m'])
+
+    def test_move_is_measured_over_the_window_only(self):
+        self.book.add('x', 'move', 5, 60)
+        # +4% early on, then +3% more once that has left the window: 7% in all, never 5% within 60 s
+        fired = [self.check({'x': price}, after=10) for price in (100, 104, 104, 104, 104, 104, 104, 104, 107)]
+        self.assertEqual(fired, [[]] * 9)
+
+    def test_volume_growth_within_window(self):
+        self.book.add('x', 'volume', 2, 60)
+        self.check({'x': 100}, {'x': 1e6})
+        self.assertEqual(self.check({'x': 100}, {'x': 1.5e6}, after=30), [])
+        self.assertEqual(self.check({'x': 100}, {'x': 2e6}, after=30), ['X volume x2 within 1m'])
+
+    def test_one_shot_window_alert_is_retired(self):
+        self.book.add('x', 'move', 5, 60)
+        self.check({'x': 100})
+        self.assertEqual(self.check({'x': 110}, after=10), ['X up 5% within 1m'])
+        self.assertEqual(len(self.book), 0)
+        self.assertEqual(self.check({'x': 130}, after=10), [])
+
+    def test_repeating_window_alert_rests_for_one_window(self):
+        self.book.add('x', 'move', 5, 60, repeat=True)
+        self.check({'x': 100})
+        self.assertEqual(self.check({'x': 110}, after=10), ['X up 5% within 1m'])
+        # Resting: a further rise within the window does not fire again
+        self.assertEqual(self.check({'x': 120}, after=20), [])
+        self.assertEqual(self.book.stats()['resting'], 1)
+        # Rearmed once the window has passed, and fires on the next move
+        self.assertEqual(self.check({'x': 120}, after=40), [])
+        self.assertEqual(self.book.stats()['resting'], 0)
+        self.assertEqual(self.check({'x': 130}, after=30), ['X up 5% within 1m'])
+
+    def test_removing_a_resting_alert(self):
+        alert = self.book.add('x', 'move', 5, 60, repeat=True)
+        self.check({'x': 100})
+        self.check({'x': 110}, after=10)
+        self.assertTrue(self.book.remove(alert.id))
+        self.check({'x': 110}, after=60)
+        self.assertEqual(self.check({'x': 130}, after=10), [])
+
+    def test_window_alert_added_between_checks(self):
+        self.check({'x': 100})
+        self.book.add('x', 'move', 5, 60)
+        self.assertEqual(self.check({'x': 106}, after=10), ['X up 5% within 1m'])
+
+
+class RemovedLevelTest(AlertBookTestCase):
+
+    def test_new_level_starts_from_latest_price_after_empty_book(self):
+        alert = self.book.add('x', 'above', 1000)
+        self.check({'x': 100})
+        self.book.remove(alert.id)
+        for price in (150, 200, 300):
+            self.check({'x': price})
+        self.book.add('x', 'above', 250)
+        # 250 was crossed before the alert existed
+        self.assertEqual(self.check({'x': 310}), [])
+        self.assertEqual(self.check({'x': 240}), [])
+        self.assertEqual(self.check({'x': 260}), ['X above $250.00'])
+
+    def test_new_level_starts_from_latest_price_with_other_alerts(self):
+        self.book.add('y', 'move', 50, 60)
+        alert = self.book.add('x', 'above', 1000)
+        self.check({'x': 100, 'y': 1})
+        self.book.remove(alert.id)
+        for price in (150, 200, 300):
+            self.check({'x': price, 'y': 1})
+        self.book.add('x', 'above', 250)
+        self.assertEqual(self.check({'x': 310, 'y': 1}), [])
+        self.assertEqual(self.check({'x': 240, 'y': 1}), [])
+        self.assertEqual(self.check({'x': 260, 'y': 1}), ['X above $250.00'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Tests for crypto_engine.backtest: the vectorised rules must agree with analyze_coin_data"""
+
+import unittest
+
+import numpy as np
+
+from crypto_engine.analysis import DEFAULT_THRESHOLDS, analyze_coin_data
+from crypto_engine.backtest import BUY, HOLD, SELL, parse_grid, rule_signals
+
+ACTIONS = {'BUY': BUY, 'SELL': SELL, 'HOLD': HOLD}
+SYMBOLS = ['BTC', 'ETH', 'USDT', 'USDC', 'SOL', 'DOGE']
+
+
+class RuleSignalsTest(unittest.TestCase):
+
+    def assert_agree(self, rng, rows, thresholds=None):
+        """rule_signals over random (previous close, close) pairs against analyze_coin_data per row"""
+        before = rng.uniform(0.01, 1000, rows)
+        change = rng.uniform(-30, 30, rows)
+        closes = np.column_stack((before, before * (1 + change / 100)))
+        caps = np.exp(rng.uniform(np.log(1e7), np.log(1e12), (rows, 2)))
+        caps[rng.random(rows) < 0.05, 1] = 0  # no market cap reported
+        volumes = caps[:, [1]] * rng.uniform(0, 0.4, (rows, 2))
+        symbols = rng.choice(SYMBOLS, rows)
+
+        actions, confidence = rule_signals(closes, caps, volumes, symbols, thresholds)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes = (closes[:, 1] / closes[:, 0] - 1) * 100
+        for k in range(rows):
+            expected = analyze_coin_data('coin', symbols[k], closes[k, 1], changes[k], caps[k, 1], volumes[k, 1],
+                                         thresholds=thresholds)
+            with self.subTest(row=k, change=changes[k], cap=caps[k, 1], volume=volumes[k, 1], symbol=symbols[k]):
+                self.assertEqual(actions[k, 1], ACTIONS[expected['action']])
+                self.assertAlmostEqual(confidence[k, 1], expected['confidence'])
+
+    def test_defaults(self):
+        self.assert_agree(np.random.default_rng(1), 500)
+
+    def test_random_thresholds(self):
+        rng = np.random.default_rng(2)
+        for _ in range(20):
+            thresholds = {name: value * rng.uniform(0.5, 1.5) for name, value in DEFAULT_THRESHOLDS.items()}
+            # Volume ratios drawn independently, so the high and low ranges may overlap
+            for name in ('momentum_volume', 'high_volume', 'low_volume'):
+                thresholds[name] = rng.uniform(0, 0.4)
+            self.assert_agree(rng, 50, thresholds)
+
+    def test_first_day_has_no_signal(self):
+        closes = np.array([[100.0, 50.0]])
+        actions, confidence = rule_signals(closes, np.full((1, 2), 1e9), np.full((1, 2), 1e8), ['SOL'])
+        self.assertEqual(actions[0, 0], HOLD)
+        self.assertEqual(actions[0, 1], BUY)
+
+
+class ParseGridTest(unittest.TestCase):
+
+    def test_values(self):
+        self.assertEqual(parse_grid(['high_volume=0.1,0.2', 'drop_confidence=5, 10', 'horizon=3']),
+                         {'high_volume': [0.1, 0.2], 'drop_confidence': [5, 10], 'horizon': [3]})
+
+    def test_errors(self):
+        for spec in ('nope=1', 'gain=a', 'gain=', 'gain'):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                parse_grid([spec])
+
+
+if __name__ == '__main__':
+    unittest.main()
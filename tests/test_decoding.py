@@ -0,0 +1,78 @@
+"""Chunk-boundary tests for crypto_engine.decoding's incremental readers"""
+
+import json
+import unittest
+
+import numpy as np
+
+from crypto_engine.decoding import iter_array, read_market_chart
+
+
+class ChunkedResponse:
+    """Stand-in for a requests.Response whose body arrives in the given byte chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+
+def splits(body):
+    """The body split in two at every offset, then cut into chunks of 1 to 7 bytes"""
+    for i in range(len(body) + 1):
+        yield [body[:i], body[i:]]
+    for size in range(1, 8):
+        yield [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class IterArrayTest(unittest.TestCase):
+    ITEMS = [
+        1234567, -89.5e-3, 0, 12345678901234567890, True, False, None,
+        'plain', 'quote " and backslash \\', 'escapes \n\té€ 🚀', 'café',
+        {'id': 'bitcoin', 'current_price': 67123.456, 'name': 'Bit\\"coin'}, [1, [2.5, 'x']], {},
+    ]
+
+    def test_every_split(self):
+        body = json.dumps(self.ITEMS, ensure_ascii=False).encode('utf-8')
+        for chunks in splits(body):
+            with self.subTest(chunks=[len(chunk) for chunk in chunks]):
+                self.assertEqual(list(iter_array(ChunkedResponse(chunks), 'stream')), self.ITEMS)
+
+    def test_escaped_unicode_split(self):
+        body = json.dumps(self.ITEMS, ensure_ascii=True).encode('ascii')
+        for chunks in splits(body):
+            with self.subTest(chunks=[len(chunk) for chunk in chunks]):
+                self.assertEqual(list(iter_array(ChunkedResponse(chunks), 'stream')), self.ITEMS)
+
+    def test_number_split_at_boundary(self):
+        # '123' | '4567, 89]' must not decode as 123
+        body = b'[1234567, 89]'
+        self.assertEqual(list(iter_array(ChunkedResponse([body[i:i + 3] for i in range(0, len(body), 3)]),
+                                         'stream')), [1234567, 89])
+
+    def test_trailing_number_at_end_of_body(self):
+        self.assertEqual(list(iter_array(ChunkedResponse([b'[1, 2', b'3]']), 'stream')), [1, 23])
+
+
+class MarketChartTest(unittest.TestCase):
+    DATA = {
+        'prices': [[1700000000000, 37123.45], [1700003600000, None], [1700007200000, 37200.5]],
+        'market_caps': [[1700000000000, 7.2e11], [1700007200000, 7.3e11]],
+        'total_volumes': [[1700000000000, 1.5e10], [1700003600000, 1.6e10], [1700007200000, 1.7e10]],
+        'note': 'skipped "value" \\ here',
+    }
+
+    def test_every_split(self):
+        body = json.dumps(self.DATA).encode('utf-8')
+        for chunks in splits(body):
+            with self.subTest(chunks=[len(chunk) for chunk in chunks]):
+                series = read_market_chart(ChunkedResponse(chunks), 'stream')
+                np.testing.assert_array_equal(series.timestamps, [1700000000000, 1700007200000])
+                np.testing.assert_array_equal(series.prices, [37123.45, 37200.5])
+                np.testing.assert_array_equal(series.market_caps, [7.2e11, 7.3e11])
+                np.testing.assert_array_equal(series.volumes, [1.5e10, 1.7e10])
+
+
+if __name__ == '__main__':
+    unittest.main()
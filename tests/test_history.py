@@ -0,0 +1,135 @@
+"""Tests for crypto_engine.history.PriceHistoryStore: fetch planning, merging and loading"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from crypto_engine.config import DAY_MS
+from crypto_engine.history import HISTORY_STALE_AFTER_MS, PriceHistoryStore
+from crypto_engine.series import PriceSeries
+
+NOW = 1717200000000  # 2024-06-01, midnight UTC
+HOUR_MS = DAY_MS // 24
+
+
+def daily(days, end_ms=NOW, live=True, price=1.0):
+    """Daily series over the last `days` days ending at midnight, plus a live point at end_ms"""
+    timestamps = list(range(end_ms - days * DAY_MS - (end_ms % DAY_MS), end_ms - end_ms % DAY_MS + 1, DAY_MS))
+    if live and timestamps[-1] != end_ms:
+        timestamps.append(end_ms)
+    prices = price + np.arange(len(timestamps), dtype=np.float64)
+    return PriceSeries(timestamps, prices, prices * 1e9, prices * 1e6)
+
+
+class HistoryStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = PriceHistoryStore(os.path.join(self.directory, 'history.db'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+
+class PlanFetchTest(HistoryStoreTestCase):
+
+    def test_nothing_stored_fetches_the_whole_window(self):
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 30, NOW), 30)
+
+    def test_fresh_coverage_needs_no_fetch(self):
+        self.store.merge('bitcoin', 'daily', daily(30), 30, NOW)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 30, NOW), 0)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 7, NOW + HISTORY_STALE_AFTER_MS['daily'] - 1), 0)
+
+    def test_stale_tail_fetches_the_missing_days_plus_one(self):
+        self.store.merge('bitcoin', 'daily', daily(30), 30, NOW)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 30, NOW + 2 * HOUR_MS), 2)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 30, NOW + 3 * DAY_MS + HOUR_MS), 5)
+
+    def test_tail_fetch_never_exceeds_the_window(self):
+        self.store.merge('bitcoin', 'daily', daily(30), 30, NOW)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 7, NOW + 6 * DAY_MS + HOUR_MS), 7)
+
+    def test_missing_head_fetches_the_whole_window(self):
+        self.store.merge('bitcoin', 'daily', daily(30), 30, NOW)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 90, NOW), 90)
+
+    def test_coverage_ending_before_the_window_fetches_it_whole(self):
+        self.store.merge('bitcoin', 'daily', daily(7), 7, NOW)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 7, NOW + 10 * DAY_MS), 7)
+
+    def test_coverage_is_per_coin_and_interval(self):
+        self.store.merge('bitcoin', 'daily', daily(30), 30, NOW)
+        self.assertEqual(self.store.plan_fetch('ethereum', 'daily', 30, NOW), 30)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'hourly', 30, NOW), 30)
+
+
+class MergeTest(HistoryStoreTestCase):
+
+    def test_tail_merge_extends_coverage_and_replaces_the_live_point(self):
+        first = daily(30, NOW + 5 * HOUR_MS)
+        self.store.merge('bitcoin', 'daily', first, 30, NOW + 5 * HOUR_MS)
+        later = NOW + 2 * DAY_MS + 3 * HOUR_MS
+        tail_days = self.store.plan_fetch('bitcoin', 'daily', 30, later)
+        self.assertEqual(tail_days, 3)
+        tail = daily(tail_days, later, price=100)
+        self.assertEqual(self.store.merge('bitcoin', 'daily', tail, tail_days, later), len(tail))
+
+        series = self.store.load('bitcoin', 'daily', 40, later)
+        # The old live point (NOW + 5h) was inside the new tail and is gone
+        self.assertNotIn(NOW + 5 * HOUR_MS, series.timestamps.tolist())
+        np.testing.assert_array_equal(series.timestamps[-len(tail):], tail.timestamps)
+        np.testing.assert_array_equal(series.prices[-len(tail):], tail.prices)
+        self.assertTrue(np.all(np.diff(series.timestamps) > 0))
+        self.assertEqual(series.timestamps[0], first.timestamps[0])
+        # Coverage now runs from the first window to the tail fetch
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 31, later), 0)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 33, later), 33)
+
+    def test_market_caps_and_volumes_round_trip_with_gaps(self):
+        series = PriceSeries([NOW - DAY_MS, NOW], [1.0, 2.0], [np.nan, 2e9], [1e6, np.nan])
+        self.store.merge('bitcoin', 'daily', series, 1, NOW)
+        loaded = self.store.load('bitcoin', 'daily', 2, NOW)
+        np.testing.assert_array_equal(loaded.market_caps, [np.nan, 2e9])
+        np.testing.assert_array_equal(loaded.volumes, [1e6, np.nan])
+
+    def test_empty_series_changes_nothing(self):
+        self.assertEqual(self.store.merge('bitcoin', 'daily', PriceSeries.empty(), 30, NOW), 0)
+        self.assertEqual(self.store.plan_fetch('bitcoin', 'daily', 30, NOW), 30)
+        self.assertEqual(self.store.coin_ids('daily'), [])
+
+
+class LoadTest(HistoryStoreTestCase):
+
+    def test_load_keeps_the_requested_days(self):
+        self.store.merge('bitcoin', 'daily', daily(30), 30, NOW)
+        series = self.store.load('bitcoin', 'daily', 7, NOW)
+        self.assertEqual(len(series), 8)
+        self.assertGreaterEqual(series.timestamps[0], NOW - 7 * DAY_MS)
+        self.assertEqual(len(self.store.load('ethereum', 'daily', 7, NOW)), 0)
+
+    def test_load_many_matches_load(self):
+        for k, coin_id in enumerate(['bitcoin', 'ethereum', 'solana']):
+            self.store.merge(coin_id, 'daily', daily(10 + k, price=k * 100), 10 + k, NOW)
+        coin_ids = ['solana', 'dogecoin', 'bitcoin', 'ethereum']
+        loaded = self.store.load_many(coin_ids, 'daily', 10, NOW)
+        self.assertEqual(sorted(loaded), ['bitcoin', 'ethereum', 'solana'])
+        for coin_id, series in loaded.items():
+            expected = self.store.load(coin_id, 'daily', 10, NOW)
+            np.testing.assert_array_equal(series.timestamps, expected.timestamps)
+            np.testing.assert_array_equal(series.prices, expected.prices)
+        self.assertEqual(self.store.coin_ids('daily'), ['bitcoin', 'ethereum', 'solana'])
+
+    def test_load_many_beyond_the_parameter_limit(self):
+        coin_ids = [f'coin-{k}' for k in range(1200)]
+        for coin_id in coin_ids[::100]:
+            self.store.merge(coin_id, 'daily', daily(2), 2, NOW)
+        self.assertEqual(sorted(self.store.load_many(coin_ids, 'daily', 2, NOW)), sorted(coin_ids[::100]))
+
+
+if __name__ == '__main__':
+    unittest.main()
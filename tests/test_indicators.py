@@ -0,0 +1,71 @@
+"""Tests for crypto_engine.indicators' date-aligned price matrix and latest indicators"""
+
+import unittest
+
+import numpy as np
+
+from crypto_engine.config import DAY_MS
+from crypto_engine.indicators import coin_signals, price_matrix
+from crypto_engine.series import PriceSeries
+
+# Midnight UTC, 2024-03-01
+START = 1709251200000
+HOUR_MS = DAY_MS // 24
+
+
+def daily(prices, first_day=0, offset_ms=0):
+    """PriceSeries with one point per day from START + first_day days (plus offset_ms)"""
+    days = np.arange(len(prices)) + first_day
+    return PriceSeries(START + days * DAY_MS + offset_ms, prices)
+
+
+class PriceMatrixTest(unittest.TestCase):
+
+    def test_aligned_by_day_not_position(self):
+        matrix = price_matrix([daily([1, 2, 3, 4]), daily([10, 20], first_day=1)])
+        np.testing.assert_array_equal(matrix, [[1, 2, 3, 4], [np.nan, 10, 20, np.nan]])
+
+    def test_last_point_of_a_day_wins(self):
+        series = PriceSeries([START, START + DAY_MS, START + DAY_MS + 5 * HOUR_MS], [1, 2, 2.5])
+        np.testing.assert_array_equal(price_matrix([series]), [[1, 2.5]])
+
+    def test_gaps_carry_the_last_value(self):
+        series = PriceSeries([START, START + 3 * DAY_MS], [1, 4])
+        np.testing.assert_array_equal(price_matrix([series]), [[1, 1, 1, 4]])
+
+    def test_length_keeps_the_newest_days(self):
+        matrix = price_matrix([daily([1, 2, 3, 4]), daily([7], first_day=1)], 2)
+        np.testing.assert_array_equal(matrix, [[3, 4], [np.nan, np.nan]])
+
+    def test_empty_series_is_all_nan(self):
+        matrix = price_matrix([daily([1, 2]), PriceSeries.empty()])
+        np.testing.assert_array_equal(matrix, [[1, 2], [np.nan, np.nan]])
+
+
+class CoinSignalsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.03, 90)))
+
+    def test_history_ending_a_day_earlier(self):
+        # One coin fetched an hour before midnight, the other half an hour after it
+        stale = daily(self.prices, first_day=-89, offset_ms=23 * HOUR_MS)
+        fresh = daily(self.prices * 2, first_day=-88, offset_ms=30 * 60 * 1000)
+        signals = coin_signals(['stale', 'fresh'], {'stale': stale, 'fresh': fresh})
+        # The shared 90-day grid ends on the fresh coin's day, so it starts a day after the stale coin
+        trimmed = daily(self.prices[1:], first_day=-88, offset_ms=23 * HOUR_MS)
+        alone = coin_signals(['stale'], {'stale': trimmed})['stale']
+        self.assertEqual(signals['stale']['price'], self.prices[-1])
+        for name, value in alone.items():
+            with self.subTest(indicator=name):
+                self.assertFalse(np.isnan(signals['stale'][name]))
+                self.assertAlmostEqual(signals['stale'][name], value)
+
+    def test_coins_without_history_are_left_out(self):
+        signals = coin_signals(['a', 'b'], {'a': daily(self.prices), 'b': PriceSeries.empty()})
+        self.assertEqual(list(signals), ['a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+"""Tests for crypto_engine.network's rate limiter: priority lanes, refill and Retry-After back-off"""
+
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from crypto_engine.network import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RateLimiter,
+                                   RequestExecutor, parse_retry_after)
+
+HOST = 'api.changenow.io'
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {'Retry-After': retry_after} if retry_after is not None else {}
+        self.content = b''
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Hands out the queued responses in order and counts the requests"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def drain(limiter, priority=PRIORITY_INTERACTIVE):
+    """Take every token the lane can get right now; returns how many that was"""
+    taken = 0
+    while limiter.acquire(priority, timeout=0):
+        taken += 1
+    return taken
+
+
+class LaneTest(unittest.TestCase):
+
+    def test_burst_then_empty(self):
+        limiter = RateLimiter(1, 3, background_reserve=0)
+        self.assertEqual(drain(limiter, PRIORITY_BACKGROUND), 3)
+        self.assertFalse(limiter.acquire(PRIORITY_INTERACTIVE, timeout=0))
+
+    def test_background_leaves_the_reserve_for_interactive(self):
+        limiter = RateLimiter(1, 3)
+        self.assertEqual(drain(limiter, PRIORITY_BACKGROUND), 2)
+        self.assertTrue(limiter.acquire(PRIORITY_INTERACTIVE, timeout=0))
+        self.assertFalse(limiter.acquire(PRIORITY_INTERACTIVE, timeout=0))
+
+    def test_reserve_never_takes_the_whole_burst(self):
+        limiter = RateLimiter(1, 2, background_reserve=5)
+        self.assertEqual(limiter.background_reserve, 1)
+        self.assertEqual(drain(limiter, PRIORITY_BACKGROUND), 1)
+
+    def test_tokens_refill_at_the_configured_rate(self):
+        limiter = RateLimiter(600, 1)  # one token every 0.1 s
+        drain(limiter)
+        started = time.monotonic()
+        self.assertTrue(limiter.acquire(PRIORITY_INTERACTIVE, timeout=2))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_timeout_returns_false(self):
+        limiter = RateLimiter(1, 1)
+        drain(limiter)
+        started = time.monotonic()
+        self.assertFalse(limiter.acquire(PRIORITY_INTERACTIVE, timeout=0.1))
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_background_yields_to_waiting_interactive(self):
+        limiter = RateLimiter(600, 2, background_reserve=0)
+        drain(limiter)
+        order = []
+
+        def take(priority, name):
+            if limiter.acquire(priority, timeout=5):
+                order.append(name)
+
+        interactive = threading.Thread(target=take, args=(PRIORITY_INTERACTIVE, 'interactive'))
+        interactive.start()
+        while limiter._waiting[PRIORITY_INTERACTIVE] == 0:
+            time.sleep(0.001)
+        background = threading.Thread(target=take, args=(PRIORITY_BACKGROUND, 'background'))
+        background.start()
+        interactive.join()
+        background.join()
+        self.assertEqual(order, ['interactive', 'background'])
+
+    def test_headroom(self):
+        limiter = RateLimiter(1, 4)
+        self.assertEqual(limiter.headroom(), 1.0)
+        limiter.acquire(PRIORITY_INTERACTIVE, timeout=0)
+        self.assertAlmostEqual(limiter.headroom(), 0.75, places=2)
+
+
+class PenalizeTest(unittest.TestCase):
+
+    def test_retry_after_blocks_the_host(self):
+        limiter = RateLimiter(6000, 5)
+        self.assertEqual(limiter.penalize(5), 5)
+        self.assertEqual(limiter.tokens, 0)
+        self.assertEqual(limiter.headroom(), 0.0)
+        self.assertFalse(limiter.acquire(PRIORITY_INTERACTIVE, timeout=0.05))
+
+    def test_acquire_waits_out_the_block(self):
+        limiter = RateLimiter(6000, 5)
+        limiter.penalize(0.2)
+        started = time.monotonic()
+        self.assertTrue(limiter.acquire(PRIORITY_INTERACTIVE, timeout=2))
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    def test_exponential_backoff_without_retry_after(self):
+        limiter = RateLimiter(60, 5)
+        self.assertEqual([limiter.penalize() for _ in range(7)], [2, 4, 8, 16, 32, 60, 60])
+
+    def test_success_resets_the_backoff(self):
+        limiter = RateLimiter(60, 5)
+        limiter.penalize()
+        limiter.penalize()
+        limiter.succeeded()
+        self.assertEqual(limiter.failures, 0)
+        self.assertEqual(limiter.penalize(), 2)
+
+    def test_shorter_retry_after_does_not_lift_a_block(self):
+        limiter = RateLimiter(60, 5)
+        limiter.penalize(30)
+        blocked_until = limiter.blocked_until
+        limiter.penalize(0)
+        self.assertEqual(limiter.blocked_until, blocked_until)
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertEqual(parse_retry_after('1.5'), 1.5)
+        self.assertEqual(parse_retry_after('-3'), 0.0)
+
+    def test_http_date(self):
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=90)
+        self.assertAlmostEqual(parse_retry_after(format_datetime(retry_at, usegmt=True)), 90, delta=2)
+
+    def test_http_date_in_the_past(self):
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+
+    def test_missing_or_invalid(self):
+        for value in (None, '', 'soon', 'Someday, 99 Foo 2015'):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_retry_after(value))
+
+
+class SendRetryTest(unittest.TestCase):
+
+    def executor(self, *responses):
+        session = FakeSession(*responses)
+        executor = RequestExecutor(session)
+        self.addCleanup(executor.shutdown)
+        executor.limiters[HOST] = RateLimiter(6000, 5)
+        return executor, session
+
+    def test_retries_after_the_advertised_delay(self):
+        throttled = FakeResponse(429, retry_after='0.2')
+        executor, session = self.executor(throttled, FakeResponse(200))
+        started = time.monotonic()
+        response = executor.get(f'https://{HOST}/v1/currencies', priority=PRIORITY_INTERACTIVE)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.calls, 2)
+        self.assertTrue(throttled.closed)
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(executor.limiters[HOST].failures, 0)
+
+    def test_gives_up_when_retry_after_exceeds_the_wait_limit(self):
+        executor, session = self.executor(FakeResponse(429, retry_after='120'))
+        response = executor.get(f'https://{HOST}/v1/currencies')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(session.calls, 1)
+        self.assertEqual(executor.limiters[HOST].failures, 1)
+
+    def test_gives_up_after_max_retries(self):
+        executor, session = self.executor(*[FakeResponse(429, retry_after='0') for _ in range(3)])
+        response = executor.get(f'https://{HOST}/v1/currencies', priority=PRIORITY_INTERACTIVE, max_retries=2)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(session.calls, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""Tests for crypto_engine.portfolio: incremental valuation against a full recompute"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from crypto_engine.config import DAY_MS
+from crypto_engine.portfolio import Portfolio, parse_acquired, validate_lot
+from crypto_engine.series import PriceSeries
+from crypto_engine.snapshot import MarketSnapshot
+
+COINS = ['bitcoin', 'ethereum', 'solana', 'dogecoin', 'tether']
+
+
+def snapshot(prices):
+    return MarketSnapshot.from_rows([
+        (coin_id, coin_id[:3], coin_id.title(), price, 0, 1e9, 1e6, '2024-01-01T00:00:00Z')
+        for coin_id, price in prices.items()
+    ])
+
+
+class PortfolioTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.portfolio = self.open()
+
+    def tearDown(self):
+        self.portfolio.close()
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        return Portfolio(os.path.join(self.directory, 'portfolio.db'))
+
+
+class IncrementalValuationTest(PortfolioTestCase):
+
+    def test_random_operations_match_a_full_recompute(self):
+        rng = np.random.default_rng(5)
+        prices = {}       # coin -> price the portfolio should hold (NaN until priced)
+        latest = {}       # prices of the last snapshot applied
+        for step in range(400):
+            operation = rng.random()
+            if operation < 0.3:
+                specs = [(str(rng.choice(COINS)), float(rng.uniform(0.01, 5)), float(rng.uniform(1, 100)))
+                         for _ in range(int(rng.integers(1, 4)))]
+                for coin_id, _, _ in specs:
+                    prices.setdefault(coin_id, latest.get(coin_id, np.nan))
+                self.portfolio.add_lots(specs)
+            elif operation < 0.45 and len(self.portfolio):
+                lots = self.portfolio.lots()
+                chosen = rng.choice(len(lots), int(rng.integers(1, min(3, len(lots)) + 1)), replace=False)
+                self.portfolio.remove_lots([lots[i].id for i in chosen])
+            else:
+                # Some coins are missing from a snapshot and keep their last price
+                latest = {coin_id: float(rng.uniform(0.5, 2) * (k + 1) * 10)
+                          for k, coin_id in enumerate(COINS) if rng.random() < 0.8}
+                self.portfolio.update(snapshot(latest))
+                prices.update((coin_id, price) for coin_id, price in latest.items() if coin_id in prices)
+
+            with self.subTest(step=step):
+                self.assert_matches(prices)
+
+    def assert_matches(self, prices):
+        quantity, cost = {}, {}
+        for lot in self.portfolio.lots():
+            quantity[lot.coin_id] = quantity.get(lot.coin_id, 0) + lot.quantity
+            cost[lot.coin_id] = cost.get(lot.coin_id, 0) + lot.cost
+        value = sum(q * prices[c] for c, q in quantity.items() if prices[c] == prices[c])
+        priced_cost = sum(cost[c] for c in quantity if prices[c] == prices[c])
+
+        summary = self.portfolio.summary()
+        self.assertAlmostEqual(summary['value'], value, places=6)
+        self.assertAlmostEqual(summary['pnl'], value - priced_cost, places=6)
+        self.assertEqual(summary['positions'], len(quantity))
+        self.assertEqual(summary['unpriced'], sum(1 for c in quantity if prices[c] != prices[c]))
+
+        positions = self.portfolio.positions()
+        self.assertEqual(sorted(positions['coin_ids']), sorted(quantity))
+        for k, coin_id in enumerate(positions['coin_ids']):
+            self.assertAlmostEqual(positions['quantity'][k], quantity[coin_id])
+            self.assertAlmostEqual(positions['cost'][k], cost[coin_id])
+        self.assertEqual(self.portfolio.coin_ids(),
+                         [positions['coin_ids'][k] for k in np.argsort(-positions['value'], kind='stable')])
+
+    def test_new_position_is_priced_from_the_last_snapshot(self):
+        self.portfolio.update(snapshot({'bitcoin': 100.0, 'ethereum': 10.0}))
+        self.portfolio.add_lot('ethereum', 2, 5)
+        self.assertEqual(self.portfolio.summary()['value'], 20)
+        self.assertEqual(self.portfolio.summary()['pnl'], 10)
+
+    def test_unpriced_position_is_left_out_of_pnl(self):
+        self.portfolio.add_lot('bitcoin', 1, 50)
+        self.portfolio.add_lot('solana', 1, 10)
+        self.assertEqual(self.portfolio.summary()['unpriced'], 2)
+        self.portfolio.update(snapshot({'bitcoin': 80.0}))
+        summary = self.portfolio.summary()
+        self.assertEqual((summary['value'], summary['pnl'], summary['unpriced']), (80, 30, 1))
+
+    def test_update_reports_changes_only(self):
+        self.portfolio.add_lot('bitcoin', 1, 50)
+        self.assertTrue(self.portfolio.update(snapshot({'bitcoin': 60.0})))
+        self.assertFalse(self.portfolio.update(snapshot({'bitcoin': 60.0, 'ethereum': 5.0})))
+        self.assertFalse(self.portfolio.update(snapshot({'ethereum': 6.0})))
+
+    def test_layout_changes_when_positions_open_or_close(self):
+        lot = self.portfolio.add_lot('bitcoin', 1, 50)
+        layout = self.portfolio.layout
+        other = self.portfolio.add_lot('bitcoin', 1, 60)
+        self.assertEqual(self.portfolio.layout, layout)
+        self.portfolio.remove_lots([lot.id, other.id])
+        self.assertGreater(self.portfolio.layout, layout)
+        self.assertEqual(self.portfolio.summary()['positions'], 0)
+
+    def test_lots_survive_a_reopen(self):
+        self.portfolio.add_lot('bitcoin', 0.5, 42000, parse_acquired('2024-01-15'), 'first')
+        self.portfolio.close()
+        self.portfolio = self.open()
+        lot, = self.portfolio.lots()
+        self.assertEqual((lot.coin_id, lot.quantity, lot.unit_cost, lot.note), ('bitcoin', 0.5, 42000, 'first'))
+        self.assertEqual(lot.acquired, 1705276800000)
+        self.assertEqual(self.portfolio.summary()['cost'], 21000)
+
+
+class ValueHistoryTest(PortfolioTestCase):
+
+    def test_lots_count_from_their_acquisition(self):
+        start = parse_acquired('2024-01-01')
+        history = {
+            'bitcoin': PriceSeries(start + np.arange(5) * DAY_MS, [10, 20, 30, 40, 50]),
+            'ethereum': PriceSeries(start + np.arange(5) * DAY_MS, [1, 2, 3, 4, 5]),
+        }
+        self.portfolio.add_lot('bitcoin', 1, 10)
+        self.portfolio.add_lot('ethereum', 10, 1, start + 2 * DAY_MS)
+        self.portfolio.add_lot('solana', 3, 1)  # no stored history: left out
+        series = self.portfolio.value_history(history, start, start + 4 * DAY_MS, DAY_MS)
+        np.testing.assert_array_equal(series.timestamps, start + np.arange(5) * DAY_MS)
+        np.testing.assert_array_equal(series.prices, [10, 20, 60, 80, 100])
+
+    def test_no_history(self):
+        self.portfolio.add_lot('bitcoin', 1, 10)
+        self.assertEqual(len(self.portfolio.value_history({}, 0, DAY_MS, DAY_MS)), 0)
+
+
+class ValidateLotTest(unittest.TestCase):
+
+    def test_invalid_lots(self):
+        for spec in (('', 1, 1), ('btc', 0, 1), ('btc', -1, 1), ('btc', 1, -1), ('btc', 'x', 1),
+                     ('btc', float('nan'), 1), ('btc', 1, 1, 10 ** 15)):
+            with self.subTest(spec=spec), self.assertRaises(ValueError):
+                validate_lot(*spec)
+
+    def test_parse_acquired(self):
+        self.assertIsNone(parse_acquired(' '))
+        with self.assertRaises(ValueError):
+            parse_acquired('15/01/2024')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Tests for crypto_engine.providers.ProviderPool: ranking, hedging, failover and cooldown"""
+
+import threading
+import time
+import unittest
+
+from crypto_engine.providers import MarketProvider, ProviderError, ProviderPool
+
+
+class FakeProvider(MarketProvider):
+    """Answers fetch_markets with its name after `delay` seconds, or raises when failing"""
+
+    default_url = 'http://fake.invalid'
+
+    def __init__(self, name, delay=0.0, fail=False, supports_history=False):
+        super().__init__(None)
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.supports_history = supports_history
+        self.calls = 0
+        self.release = threading.Event()
+
+    def fetch_markets(self, universe, priority, known_coins=()):
+        self.calls += 1
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.fail:
+            raise ProviderError(f'{self.name} failed')
+        return self.name
+
+
+class ProviderPoolTestCase(unittest.TestCase):
+
+    def pool(self, *providers, **options):
+        pool = ProviderPool(providers, **options)
+        self.addCleanup(pool.shutdown)
+        for provider in providers:
+            self.addCleanup(provider.release.set)
+        return pool
+
+    @staticmethod
+    def names(providers):
+        return [provider.name for provider in providers]
+
+
+class RankedTest(ProviderPoolTestCase):
+
+    def test_configured_order_before_any_sample(self):
+        pool = self.pool(FakeProvider('a'), FakeProvider('b'), FakeProvider('c'))
+        self.assertEqual(self.names(pool.ranked()), ['a', 'b', 'c'])
+
+    def test_unsampled_providers_come_after_measured_ones(self):
+        a, b, c = FakeProvider('a'), FakeProvider('b'), FakeProvider('c')
+        pool = self.pool(a, b, c)
+        pool.latencies[id(b)].append(0.5)
+        self.assertEqual(self.names(pool.ranked()), ['b', 'a', 'c'])
+
+    def test_fastest_median_first(self):
+        a, b = FakeProvider('a'), FakeProvider('b')
+        pool = self.pool(a, b)
+        pool.latencies[id(a)].extend([0.9, 0.1, 0.8])
+        pool.latencies[id(b)].extend([0.3, 0.4, 0.5])
+        self.assertEqual(self.names(pool.ranked()), ['b', 'a'])
+
+    def test_cooling_off_providers_go_last(self):
+        a, b = FakeProvider('a'), FakeProvider('b')
+        pool = self.pool(a, b)
+        pool.latencies[id(a)].append(0.1)
+        pool.cooldown_until[id(a)] = time.monotonic() + 60
+        self.assertEqual(self.names(pool.ranked()), ['b', 'a'])
+
+    def test_history_calls_only_rank_history_providers(self):
+        pool = self.pool(FakeProvider('a'), FakeProvider('b', supports_history=True))
+        self.assertEqual(self.names(pool.ranked(history=True)), ['b'])
+
+    def test_one_sample_keeps_the_measured_provider_first(self):
+        primary, fallback = FakeProvider('primary'), FakeProvider('fallback')
+        pool = self.pool(primary, fallback)
+        self.assertEqual(pool.call('fetch_markets', None, 0), ('primary', primary))
+        self.assertEqual(self.names(pool.ranked()), ['primary', 'fallback'])
+        self.assertEqual(fallback.calls, 0)
+
+
+class CallTest(ProviderPoolTestCase):
+
+    def test_slow_provider_is_hedged(self):
+        slow, fast = FakeProvider('slow', delay=5), FakeProvider('fast')
+        pool = self.pool(slow, fast, default_hedge_delay=0.05)
+        started = time.monotonic()
+        result, provider = pool.call('fetch_markets', None, 0)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual((result, provider), ('fast', fast))
+        self.assertEqual(pool.hedged, 1)
+        self.assertEqual(pool.stats()['providers'][1]['wins'], 1)
+
+    def test_fast_provider_is_not_hedged(self):
+        primary, fallback = FakeProvider('primary'), FakeProvider('fallback')
+        pool = self.pool(primary, fallback, default_hedge_delay=1)
+        self.assertEqual(pool.call('fetch_markets', None, 0)[0], 'primary')
+        self.assertEqual((pool.hedged, fallback.calls), (0, 0))
+
+    def test_hedge_delay_follows_the_latency_percentile(self):
+        provider = FakeProvider('a')
+        pool = self.pool(provider, default_hedge_delay=2.0, min_hedge_delay=0.25)
+        pool.latencies[id(provider)].extend([0.1] * (ProviderPool.MIN_SAMPLES - 1))
+        self.assertEqual(pool.hedge_delay(provider), 2.0)
+        pool.latencies[id(provider)].extend([0.5] * 10)
+        self.assertAlmostEqual(pool.hedge_delay(provider), 0.5)
+        pool.latencies[id(provider)].clear()
+        pool.latencies[id(provider)].extend([0.01] * 10)
+        self.assertEqual(pool.hedge_delay(provider), 0.25)
+
+    def test_failover_on_error(self):
+        broken, working = FakeProvider('broken', fail=True), FakeProvider('working')
+        pool = self.pool(broken, working, default_hedge_delay=5)
+        self.assertEqual(pool.call('fetch_markets', None, 0), ('working', working))
+        self.assertEqual(self.names(pool.ranked()), ['working', 'broken'])
+
+    def test_every_provider_failing_raises_the_last_error(self):
+        pool = self.pool(FakeProvider('a', fail=True), FakeProvider('b', fail=True))
+        with self.assertRaises(ProviderError):
+            pool.call('fetch_markets', None, 0)
+
+    def test_no_provider(self):
+        with self.assertRaises(ProviderError):
+            self.pool().call('fetch_markets', None, 0)
+
+
+class CooldownTest(ProviderPoolTestCase):
+
+    def test_backoff_doubles_and_resets_on_success(self):
+        provider = FakeProvider('a', fail=True)
+        pool = self.pool(provider, max_cooldown=30)
+        remaining = []
+        for _ in range(5):
+            with self.assertRaises(ProviderError):
+                pool.call('fetch_markets', None, 0)
+            remaining.append(round(pool.cooldown_until[id(provider)] - time.monotonic()))
+        self.assertEqual(remaining, [5, 10, 20, 30, 30])
+
+        provider.fail = False
+        self.assertEqual(pool.call('fetch_markets', None, 0)[0], 'a')
+        self.assertEqual((pool.failures[id(provider)], pool.cooldown_until[id(provider)]), (0, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
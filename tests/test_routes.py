@@ -0,0 +1,88 @@
+"""Tests for crypto_engine.routes.RateMatrix.best_route against a brute-force search"""
+
+import itertools
+import math
+import unittest
+
+import numpy as np
+
+from crypto_engine.routes import RateMatrix
+
+
+def brute_force(matrix, from_ticker, to_ticker, max_hops):
+    """Best overall rate over every simple route of at most max_hops conversions"""
+    others = [t for t in matrix.tickers if t not in (from_ticker, to_ticker)]
+    best = math.nan
+    for hops in range(1, max_hops + 1):
+        for middle in itertools.permutations(others, hops - 1):
+            route = (from_ticker,) + middle + (to_ticker,)
+            rate = math.prod(matrix.rate(a, b) for a, b in zip(route, route[1:]))
+            if rate > 0 and not rate <= best:
+                best = rate
+    return best
+
+
+def random_matrix(rng, n, arbitrage, missing=0.2):
+    """RateMatrix of n tickers; without arbitrage every rate follows one set of prices"""
+    matrix = RateMatrix([f't{i}' for i in range(n)])
+    prices = rng.uniform(0.1, 10, n)
+    for i, j in itertools.permutations(range(n), 2):
+        if rng.random() < missing:
+            continue
+        rate = prices[i] / prices[j] * (rng.uniform(0.3, 3) if arbitrage else rng.uniform(0.97, 1.0))
+        matrix.update(matrix.tickers[i], matrix.tickers[j], rate, now=0)
+    return matrix
+
+
+class BestRouteTest(unittest.TestCase):
+
+    def assert_matches_brute_force(self, arbitrage):
+        rng = np.random.default_rng(11 if arbitrage else 12)
+        for trial in range(200):
+            n = int(rng.integers(3, 7))
+            matrix = random_matrix(rng, n, arbitrage)
+            from_ticker, to_ticker = rng.choice(matrix.tickers, 2, replace=False)
+            max_hops = int(rng.integers(1, 4))
+            route, rate = matrix.best_route(from_ticker, to_ticker, max_hops)
+            expected = brute_force(matrix, from_ticker, to_ticker, max_hops)
+            with self.subTest(trial=trial, route=route):
+                if math.isnan(expected):
+                    self.assertIsNone(route)
+                    continue
+                self.assertAlmostEqual(rate, expected, delta=expected * 1e-9)
+                self.assertEqual((route[0], route[-1]), (from_ticker, to_ticker))
+                self.assertEqual(len(set(route)), len(route))
+                self.assertLessEqual(len(route) - 1, max_hops)
+                self.assertAlmostEqual(math.prod(matrix.rate(a, b) for a, b in zip(route, route[1:])), rate)
+
+    def test_matches_brute_force_with_consistent_rates(self):
+        self.assert_matches_brute_force(arbitrage=False)
+
+    def test_matches_brute_force_with_profitable_cycles(self):
+        self.assert_matches_brute_force(arbitrage=True)
+
+    def test_profitable_cycle_through_the_source(self):
+        matrix = RateMatrix(['t0', 't1', 't2'])
+        for pair, rate in {('t0', 't1'): 2.0, ('t1', 't0'): 2.0, ('t1', 't2'): 1.43, ('t0', 't2'): 1.98}.items():
+            matrix.update(*pair, rate, now=0)
+        route, rate = matrix.best_route('t0', 't2')
+        self.assertEqual(route, ['t0', 't1', 't2'])
+        self.assertAlmostEqual(rate, 2.86)
+
+    def test_fewer_hops_win_a_tie(self):
+        matrix = RateMatrix(['a', 'b', 'c'])
+        for pair, rate in {('a', 'c'): 4.0, ('a', 'b'): 2.0, ('b', 'c'): 2.0}.items():
+            matrix.update(*pair, rate, now=0)
+        self.assertEqual(matrix.best_route('a', 'c'), (['a', 'c'], 4.0))
+
+    def test_no_route(self):
+        matrix = RateMatrix(['a', 'b', 'c'])
+        matrix.update('a', 'b', 2.0, now=0)
+        route, rate = matrix.best_route('a', 'c')
+        self.assertIsNone(route)
+        self.assertTrue(math.isnan(rate))
+        self.assertIsNone(matrix.best_route('a', 'a')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()